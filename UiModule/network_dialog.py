@@ -1,10 +1,10 @@
-from PySide6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton
+from PySide6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QCheckBox
 from PySide6.QtCore import Qt, Signal
 from PySide6.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QGridLayout, 
                              QWidget, QPushButton, QFileDialog, QMenu, QLabel)
 class NetworkDialog(QDialog):
 
-    connect_requested = Signal(str, int)
+    connect_requested = Signal(str, int, bool)
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -20,6 +20,9 @@ class NetworkDialog(QDialog):
         self.port_input = QLineEdit(self)
         self.port_input.setText("5558")
 
+        # 消息按 [topic, 数据] 分帧时, 一个端口可以同时传输多种传感器数据
+        self.topic_frame_checkbox = QCheckBox("Topic framed", self)
+
         # 按钮布局
         connect_button = QPushButton("Connect")
         connect_button.clicked.connect(self.on_connect)
@@ -37,6 +40,7 @@ class NetworkDialog(QDialog):
         port_layout.addWidget(port_label)
         port_layout.addWidget(self.port_input)
         layout.addLayout(port_layout)
+        layout.addWidget(self.topic_frame_checkbox)
 
         button_layout = QHBoxLayout()
         button_layout.addWidget(connect_button)
@@ -49,7 +53,7 @@ class NetworkDialog(QDialog):
         ip_address = self.ip_input.text()
         try:
             port = int(self.port_input.text())
-            self.connect_requested.emit(ip_address, port)
+            self.connect_requested.emit(ip_address, port, self.topic_frame_checkbox.isChecked())
             self.accept()
         except ValueError:
             print("Invalid port number")
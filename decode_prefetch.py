@@ -0,0 +1,93 @@
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+import numpy as np
+
+class DecodePrefetcher:
+    """
+    播放光标前方的预解码流水线
+
+    播放线程顺序读取记录并提交给解码线程池, 已提交的帧按帧号顺序保存在有界缓冲区中,
+    解码可以乱序完成, 取帧时仍按顺序返回. 播放节奏只取已解码好的帧, 单帧解码变慢不会
+    直接表现为播放抖动. workers 为 0 时在取帧时同步解码.
+    numpy 和 OpenCV 解码时会释放 GIL, 数据又是 mmap 上的零拷贝视图, 因此使用线程池
+    """
+    def __init__(self, decode_func, depth=8, workers=2, stats_size=1000):
+        self.decode_func = decode_func
+        self.depth = max(1, depth)
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='decode') if workers > 0 else None
+        # (frame_no, timestamp, data, future), future 为 None 表示尚未提交解码
+        self.buffer = deque()
+        self.decode_times = deque(maxlen=stats_size)
+        self.fill_samples = deque(maxlen=stats_size)
+        self.stall_count = 0
+        self.taken_count = 0
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def is_full(self):
+        return len(self.buffer) >= self.depth
+
+    def submit(self, frame_no, timestamp, data, frame=None, decode=True):
+        # frame 不为空时表示已有解码结果 (如缓存命中); decode 为 False 时推迟到取帧时再决定是否解码
+        if frame is not None:
+            future = Future()
+            future.set_result(frame)
+        elif decode and self.executor:
+            future = self.executor.submit(self._decode, data)
+        else:
+            future = None
+        self.buffer.append((frame_no, timestamp, data, future))
+
+    def _decode(self, data):
+        start = time.perf_counter()
+        frame = self.decode_func(data)
+        self.decode_times.append(time.perf_counter() - start)
+        return frame
+
+    def peek(self):
+        # 返回缓冲区头部的 (frame_no, timestamp)
+        if not self.buffer:
+            return None
+        frame_no, timestamp, _, _ = self.buffer[0]
+        return frame_no, timestamp
+
+    def take(self):
+        frame_no, timestamp, data, future = self.buffer.popleft()
+        self.fill_samples.append(1 + sum(1 for item in self.buffer if item[3] is not None and item[3].done()))
+        self.taken_count += 1
+        if future is None:
+            return frame_no, timestamp, self._decode(data)
+        if not future.done():
+            self.stall_count += 1
+        return frame_no, timestamp, future.result()
+
+    def drop(self):
+        _, _, _, future = self.buffer.popleft()
+        if future is not None:
+            future.cancel()
+
+    def clear(self):
+        while self.buffer:
+            self.drop()
+
+    def close(self):
+        self.clear()
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def get_stats(self):
+        decode_ms = np.asarray(self.decode_times) * 1000
+        return {
+            'depth': self.depth,
+            'workers': self.workers,
+            'buffered': len(self.buffer),
+            'mean_fill': float(np.mean(self.fill_samples)) if self.fill_samples else 0.0,
+            'decode_mean_ms': float(decode_ms.mean()) if len(decode_ms) else 0.0,
+            'decode_p99_ms': float(np.percentile(decode_ms, 99)) if len(decode_ms) else 0.0,
+            'stalls': self.stall_count,
+            'taken': self.taken_count
+        }
@@ -0,0 +1,44 @@
+import threading
+from collections import OrderedDict
+
+class FrameCache:
+    """
+    按帧号缓存解码后的帧, 超出容量时淘汰最久未使用的帧
+
+    在光标附近来回拖动、单步和倒放时, 已解码过的帧直接从缓存取出, 不需要重新读取和解码
+    """
+    def __init__(self, capacity=32):
+        self.capacity = capacity
+        self.frames = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    def get(self, frame_no):
+        with self.lock:
+            frame = self.frames.get(frame_no)
+            if frame is None:
+                self.misses += 1
+                return None
+            self.frames.move_to_end(frame_no)
+            self.hits += 1
+            return frame
+
+    def put(self, frame_no, frame):
+        if self.capacity <= 0:
+            return
+        with self.lock:
+            self.frames[frame_no] = frame
+            self.frames.move_to_end(frame_no)
+            while len(self.frames) > self.capacity:
+                self.frames.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.frames.clear()
+
+    def get_stats(self):
+        return {'size': len(self.frames), 'hits': self.hits, 'misses': self.misses}
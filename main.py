@@ -1,11 +1,16 @@
 import sys
 import os
+import time
 import numpy as np
 import open3d as o3d
 from PySide6.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QGridLayout, 
                              QWidget, QPushButton, QFileDialog, QMenu, QLabel, QSplitter)
+from PySide6.QtCore import QTimer, QPoint
 from logger_manager import LoggerManager
 from window_view import WindowView
+from playback_clock import PlaybackClock
+from record_writer import RecordWriter
+from view_play_state import PlayStateMachine, PlayStateEnum
 import pyqtgraph as pg
 
 class MainWindow(QMainWindow):
@@ -39,10 +44,117 @@ class MainWindow(QMainWindow):
         self.view_control_layout.addWidget(self.remove_group_button)
         self.remove_group_button.clicked.connect(lambda: self.remove_window_view(self.view_group_layout))
 
+        self.init_master_control(self.view_control_layout)
+        self.init_record_control(self.view_control_layout)
+
         self.add_window_view(self.view_group_layout)
 
+    # 主时钟: 所有视图的文件回放都跟随它, 统一播放、暂停和倍速
+    def init_master_control(self, control_layout):
+        self.master_clock = PlaybackClock()
+        self.state_machine = PlayStateMachine()
+
+        self.master_play_button = QPushButton("全部播放")
+        control_layout.addWidget(self.master_play_button)
+        self.master_play_button.clicked.connect(self.master_play_control)
+
+        self.master_speed_button = QPushButton("1.0x")
+        control_layout.addWidget(self.master_speed_button)
+        self.master_speed_button.clicked.connect(self.show_master_speed_menu)
+        self.master_speed_menu = QMenu(self)
+        for label, factor in [("0.5x", 0.5), ("1.0x", 1.0), ("1.5x", 1.5), ("2.0x", 2.0)]:
+            action = self.master_speed_menu.addAction(label)
+            action.triggered.connect(lambda checked, l=label, s=factor: self.set_master_speed(s, l))
+
+        self.master_clock_label = QLabel()
+        control_layout.addWidget(self.master_clock_label)
+        self.master_clock_timer = QTimer()
+        self.master_clock_timer.timeout.connect(self.update_master_clock_label)
+        self.master_clock_timer.start(200)
+
+    def master_play_control(self):
+        if self.state_machine.state.state_enum == PlayStateEnum.PLAYING:
+            self.master_clock.pause()
+            for view in self.view:
+                view.pause_view()
+            self.master_play_button.setText("全部播放")
+        else:
+            self.master_clock.resume()
+            for view in self.view:
+                view.play_view()
+            self.master_play_button.setText("全部暂停")
+        self.state_machine.play_control()
+
+    def show_master_speed_menu(self):
+        self.master_speed_menu.exec(self.master_speed_button.mapToGlobal(QPoint(0, self.master_speed_button.height())))
+
+    def set_master_speed(self, factor, text):
+        self.master_speed_button.setText(text)
+        self.master_clock.set_speed(factor)
+        for view in self.view:
+            view.set_speed(factor, text)
+
+    def update_master_clock_label(self):
+        media_time = self.master_clock.media_time()
+        if media_time is None:
+            self.master_clock_label.setText("主时钟 --")
+        else:
+            self.master_clock_label.setText(f"主时钟 {media_time:.3f}s")
+
+    # 录制: 把所有视图收到的网络数据写入 data 目录下的 .record 文件
+    def init_record_control(self, control_layout):
+        self.recorder = None
+        self.record_button = QPushButton("开始录制")
+        control_layout.addWidget(self.record_button)
+        self.record_button.clicked.connect(self.record_control)
+
+        self.record_label = QLabel()
+        control_layout.addWidget(self.record_label)
+        self.record_timer = QTimer()
+        self.record_timer.timeout.connect(self.update_record_label)
+
+    def record_control(self):
+        if self.recorder is None:
+            self.start_record()
+        else:
+            self.stop_record()
+
+    def start_record(self):
+        os.makedirs('data', exist_ok=True)
+        filename = os.path.join('data', time.strftime('record_%Y%m%d_%H%M%S.record'))
+        try:
+            self.recorder = RecordWriter(filename)
+        except OSError as e:
+            self.logger.error(f'无法创建录制文件 {filename}: {e}')
+            return
+        for view in self.view:
+            view.set_recorder(self.recorder)
+        self.record_button.setText("停止录制")
+        self.record_timer.start(500)
+
+    def stop_record(self):
+        if self.recorder is None:
+            return
+        for view in self.view:
+            view.set_recorder(None)
+        recorder, self.recorder = self.recorder, None
+        stats = recorder.close()
+        self.record_timer.stop()
+        self.record_button.setText("开始录制")
+        self.record_label.setText(f"已录制 {stats['written']} 条 {stats['written_mb']:.1f}MB, 丢弃 {stats['dropped']} 条")
+
+    def update_record_label(self):
+        if self.recorder is None:
+            return
+        stats = self.recorder.get_stats()
+        self.record_label.setText(f"录制 {stats['written_mb']:.1f}MB {stats['rate_mb_s']:.1f}MB/s "
+                                  f"队列 {stats['queue_mb']:.1f}MB 丢弃 {stats['dropped']}")
+
     def add_window_view(self, central_layout):
         window_view = WindowView(self)
+        window_view.set_master_clock(self.master_clock)
+        window_view.set_recorder(self.recorder)
+        window_view.speed_requested.connect(self.set_master_speed)
         self.view.append(window_view)
 
         row = (len(self.view) - 1) // 2  # 每行最多放两个视图
@@ -57,6 +169,7 @@ class MainWindow(QMainWindow):
             return
 
         window_view = self.view.pop()
+        window_view.release()
         widget = window_view.get_widget()
 
         widget.setParent(None)
@@ -88,6 +201,8 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         event.accept()
+        self.master_clock_timer.stop()
+        self.stop_record()
         for view in self.view:
             view.closeEvent(event)
 
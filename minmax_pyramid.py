@@ -0,0 +1,79 @@
+import numpy as np
+from ring_buffer import RingBuffer
+
+class MinMaxPyramid:
+    """
+    多分辨率的最小/最大值包络
+
+    第 0 层是原始样本 (时间戳 + 各通道数值), 第 k 层每个桶汇总 factor**k 个原始样本,
+    记录桶内首尾时间戳以及各通道的最小/最大值. 新样本到达时逐层增量合并,
+    每层容量固定, 越粗的层覆盖的时间越长. 绘制时按可见范围和像素宽度选择层级,
+    缩小查看很长的历史也只绘制与像素数量相当的点, 同时保留尖峰
+    """
+    def __init__(self, channels, raw_capacity, factor=4, levels=6, level_capacity=4096):
+        self.channels = channels
+        self.factor = factor
+        self.raw = RingBuffer(raw_capacity, 1 + channels)
+        # 桶的列: 首时间戳, 尾时间戳, 各通道最小值, 各通道最大值
+        self.levels = [RingBuffer(level_capacity, 2 + 2 * channels) for _ in range(levels)]
+        self.pending = [np.zeros((2 + 2 * channels, 0)) for _ in range(levels)]
+
+    def clear(self):
+        self.raw.clear()
+        for level, buffer in enumerate(self.levels):
+            buffer.clear()
+            self.pending[level] = self.pending[level][:, :0]
+
+    def extend(self, samples):
+        # samples: (1 + channels, n), 第一行为时间戳
+        self.raw.extend(samples)
+        rows = np.vstack([samples[:1], samples[:1], samples[1:], samples[1:]])
+        c = self.channels
+        for level, buffer in enumerate(self.levels):
+            rows = np.concatenate([self.pending[level], rows], axis=1)
+            complete = rows.shape[1] // self.factor * self.factor
+            self.pending[level] = rows[:, complete:].copy()
+            if complete == 0:
+                break
+            groups = rows[:, :complete].reshape(rows.shape[0], -1, self.factor)
+            buckets = np.empty((rows.shape[0], groups.shape[1]))
+            buckets[0] = groups[0, :, 0]
+            buckets[1] = groups[1, :, -1]
+            buckets[2:2 + c] = groups[2:2 + c].min(axis=2)
+            buckets[2 + c:] = groups[2 + c:].max(axis=2)
+            buffer.extend(buckets)
+            rows = buckets
+
+    def get_envelope(self, t0, t1, max_points):
+        """
+        返回 [t0, t1] 范围内的曲线数据 (level, x, [各通道 y])
+
+        从最细的层开始选择第一个覆盖 t0 且点数不超过 max_points 的层级,
+        第 0 层返回缓存上的视图, 其余层把每个桶展开为 (首时间戳, 最小值), (尾时间戳, 最大值) 两个点
+        """
+        if len(self.raw) == 0:
+            return 0, np.zeros(0), [np.zeros(0)] * self.channels
+        candidates = [self.raw] + [buffer for buffer in self.levels if len(buffer)]
+        for level, buffer in enumerate(candidates):
+            first = buffer.get_column(0)
+            last = first if level == 0 else buffer.get_column(1)
+            i0 = max(0, int(np.searchsorted(last, t0)) - 1)
+            i1 = min(len(buffer), int(np.searchsorted(first, t1, side='right')) + 1)
+            points = (i1 - i0) * (1 if level == 0 else 2)
+            covers = first[0] <= t0 or level == len(candidates) - 1
+            if covers and points <= max_points or level == len(candidates) - 1:
+                break
+
+        if level == 0:
+            return 0, first[i0:i1], [buffer.get_column(1 + i)[i0:i1] for i in range(self.channels)]
+
+        x = np.empty((i1 - i0) * 2)
+        x[0::2] = first[i0:i1]
+        x[1::2] = last[i0:i1]
+        ys = []
+        for i in range(self.channels):
+            y = np.empty_like(x)
+            y[0::2] = buffer.get_column(2 + i)[i0:i1]
+            y[1::2] = buffer.get_column(2 + self.channels + i)[i0:i1]
+            ys.append(y)
+        return level, x, ys
@@ -0,0 +1,139 @@
+import time
+import threading
+from collections import deque
+import numpy as np
+
+class PlaybackClock:
+    """
+    回放时钟, 把录制时间戳映射到 time.monotonic()
+
+    每一帧的发送时刻都由起始锚点直接计算, 而不是累加两帧之间的 sleep,
+    解码和发送耗时会被自动扣除, 误差不会累积. 调速和暂停时重新设置锚点, 保证时间连续.
+    离发送时刻不足 resolution 的帧直接发送, 高频数据因此按批发出, 不受 sleep 精度限制
+    """
+    def __init__(self, speed=1.0, resolution=0.002, stats_size=1000):
+        self.lock = threading.Lock()
+        self.speed = speed
+        self.resolution = resolution
+        self.wall_anchor = None
+        self.media_anchor = None
+        self.paused_media_time = None
+        # 最近若干帧的迟到时间 (秒), 负数表示提前发送
+        self.lateness = deque(maxlen=stats_size)
+        self.late_count = 0
+        # 正在跟随该时钟播放的任务数, 全部结束后重新计时
+        self.followers = 0
+
+    def is_started(self):
+        return self.media_anchor is not None
+
+    def is_paused(self):
+        return self.paused_media_time is not None
+
+    def start(self, media_time):
+        with self.lock:
+            self._start(media_time)
+
+    def ensure_started(self, media_time):
+        # 多个任务共用一个时钟时, 由第一个到达的帧设置起点
+        with self.lock:
+            if self.media_anchor is None:
+                self._start(media_time)
+
+    def _start(self, media_time):
+        self.media_anchor = media_time
+        self.wall_anchor = time.monotonic()
+        self.paused_media_time = None
+
+    def reset(self):
+        # 跳转后由下一帧重新设置锚点
+        with self.lock:
+            self._reset()
+
+    def _reset(self):
+        self.media_anchor = None
+        self.wall_anchor = None
+        self.paused_media_time = None
+
+    def rebase(self, media_time):
+        # 跳转后把当前回放时间设为 media_time, 保持暂停状态不变
+        with self.lock:
+            if self.paused_media_time is not None:
+                self.media_anchor = media_time
+                self.paused_media_time = media_time
+            else:
+                self._start(media_time)
+
+    def attach(self):
+        with self.lock:
+            self.followers += 1
+
+    def detach(self):
+        with self.lock:
+            self.followers -= 1
+            if self.followers <= 0:
+                self.followers = 0
+                self._reset()
+
+    def media_time(self):
+        with self.lock:
+            return self._media_time()
+
+    def _media_time(self):
+        if self.media_anchor is None:
+            return None
+        if self.paused_media_time is not None:
+            return self.paused_media_time
+        return self.media_anchor + (time.monotonic() - self.wall_anchor) * self.speed
+
+    def set_speed(self, speed):
+        with self.lock:
+            # 以当前回放时间为新锚点, 调速前后时间连续
+            media_time = self._media_time()
+            if media_time is not None and self.paused_media_time is None:
+                self.media_anchor = media_time
+                self.wall_anchor = time.monotonic()
+            self.speed = speed
+
+    def pause(self):
+        with self.lock:
+            if self.media_anchor is not None and self.paused_media_time is None:
+                self.paused_media_time = self._media_time()
+
+    def resume(self):
+        with self.lock:
+            if self.paused_media_time is not None:
+                self.media_anchor = self.paused_media_time
+                self.wall_anchor = time.monotonic()
+                self.paused_media_time = None
+
+    def delay_until(self, media_time):
+        # 距离 media_time 的发送时刻还有多少秒, 负数表示已经迟到, 暂停时为无穷大
+        with self.lock:
+            if self.media_anchor is None:
+                return 0.0
+            if self.paused_media_time is not None:
+                return float('inf')
+            target = self.wall_anchor + (media_time - self.media_anchor) / self.speed
+            return target - time.monotonic()
+
+    def is_due(self, media_time):
+        return self.delay_until(media_time) <= self.resolution
+
+    def record_sent(self, media_time):
+        lateness = -self.delay_until(media_time)
+        self.lateness.append(lateness)
+        if lateness > self.resolution:
+            self.late_count += 1
+
+    def get_lateness_stats(self):
+        if not self.lateness:
+            return {'count': 0, 'late': 0, 'mean_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+        lateness = np.asarray(self.lateness) * 1000
+        return {
+            'count': len(lateness),
+            'late': self.late_count,
+            'mean_ms': float(lateness.mean()),
+            'p99_ms': float(np.percentile(lateness, 99)),
+            'max_ms': float(lateness.max())
+        }
@@ -0,0 +1,172 @@
+import queue
+import threading
+import multiprocessing
+from thread_task import BasePubTask, LocalPlyPubTask, LocalImgPubTask
+from record_convert import LIDAR_MAX_POINTS, IMG_HEIGHT, IMG_WIDTH
+from view_play_state import PlayStateEnum
+from shm_ring import SharedFrameRing
+from logger_manager import LoggerManager
+
+# 可以放到独立进程中运行的发布任务, 以及每个槽位需要的共享内存大小
+PROCESS_TASKS = {
+    'lidar': (LocalPlyPubTask, LIDAR_MAX_POINTS * 3 * 4 * 2 + 1024),
+    'image': (LocalImgPubTask, IMG_HEIGHT * IMG_WIDTH * 3 + 1024),
+}
+
+class ShmRingMailbox:
+    """子进程中代替 FrameMailbox, 把发布的帧写入共享内存并把槽位号发给界面进程"""
+    def __init__(self, task, ring, frame_queue, free_queue):
+        self.task = task
+        self.ring = ring
+        self.frame_queue = frame_queue
+        self.free_queue = free_queue
+        self.dropped_count = 0
+        self.closed = False
+
+    def put(self, frame):
+        if self.closed:
+            return False
+        try:
+            slot = self.free_queue.get_nowait()
+        except queue.Empty:
+            # 界面还占用着所有槽位, 丢弃这一帧
+            self.dropped_count += 1
+            return False
+        layout = self.ring.write_frame(slot, frame)
+        self.frame_queue.put((slot, layout, self.task.get_position(), self.dropped_count))
+        return False
+
+    def close(self):
+        self.closed = True
+
+def _run_control(task, control_queue):
+    while True:
+        command, *args = control_queue.get()
+        if command == 'stop':
+            task.stop()
+            return
+        getattr(task, command)(*args)
+
+def run_pub_task_process(task_name, filename, ring_name, slots, slot_size, frame_queue, free_queue, control_queue):
+    # 子进程入口: 在本进程的主线程中直接运行发布任务, 控制命令由后台线程转发
+    task_class, _ = PROCESS_TASKS[task_name]
+    ring = SharedFrameRing(slots, slot_size, ring_name)
+    task = task_class(filename)
+    mailbox = ShmRingMailbox(task, ring, frame_queue, free_queue)
+    task.set_mailbox(mailbox)
+    threading.Thread(target=_run_control, args=(task, control_queue), daemon=True).start()
+    try:
+        task.run()
+    finally:
+        task.logger.info(f'共享内存槽位不足丢弃 {mailbox.dropped_count} 帧')
+        frame_queue.put(None)
+        ring.close()
+
+class ProcessPubTask(BasePubTask):
+    """
+    在独立进程中运行的本地文件发布任务
+
+    读取、解码、着色和异常检测都在子进程中完成, 不与界面争用 GIL.
+    解码结果经 SharedFrameRing 传回, 界面进程只接收槽位号并在共享内存上直接构造帧.
+    播放状态、倍速、跳转等控制命令通过队列转发给子进程中的任务;
+    子进程使用自己的回放时钟, 不跟随主窗口的主时钟
+    """
+    def __init__(self, task_name, filename, slots=4):
+        super().__init__()
+        self.logger = LoggerManager.get_logger(self.__class__.__name__)
+        self.task_name = task_name
+        self.filename = filename
+        self.position = None
+        self.ring_dropped = 0
+        _, slot_size = PROCESS_TASKS[task_name]
+        self.ring = SharedFrameRing(slots, slot_size)
+        # Windows 下只有 spawn, 其他平台也用 spawn, 避免 fork 带上界面进程的 Qt 状态
+        context = multiprocessing.get_context('spawn')
+        self.frame_queue = context.Queue()
+        self.free_queue = context.Queue()
+        self.control_queue = context.Queue()
+        for slot in range(slots):
+            self.free_queue.put(slot)
+        self.released = False
+        self.process = context.Process(
+            target=run_pub_task_process,
+            args=(task_name, filename, self.ring.name, slots, slot_size,
+                  self.frame_queue, self.free_queue, self.control_queue),
+            daemon=True)
+
+    def _send(self, command, *args):
+        if not self.released:
+            self.control_queue.put((command, *args))
+
+    def set_play_state(self, play_state):
+        super().set_play_state(play_state)
+        if play_state != PlayStateEnum.TERMINATE:
+            self._send('set_play_state', play_state)
+
+    def set_speed(self, speed):
+        super().set_speed(speed)
+        self._send('set_speed', speed)
+
+    def set_clock(self, clock):
+        # 子进程无法共享主时钟, 只同步倍速
+        super().set_clock(clock)
+        self._send('set_speed', clock.speed)
+
+    def seek_frame(self, frame_no):
+        self._send('seek_frame', frame_no)
+
+    def seek_timestamp(self, timestamp):
+        self._send('seek_timestamp', timestamp)
+
+    def step_frame(self, delta):
+        self._send('step_frame', delta)
+
+    def get_position(self):
+        return self.position
+
+    def get_delivery_stats(self):
+        return dict(self.mailbox.get_stats(), ring_dropped=self.ring_dropped)
+
+    def stop(self):
+        self._send('stop')
+        super().stop()
+
+    def _release_slot(self, slot):
+        # 帧释放时在界面线程中调用, 任务结束后不再归还
+        if not self.released:
+            try:
+                self.free_queue.put(slot)
+            except ValueError:
+                pass
+
+    def _run_impl(self):
+        self.process.start()
+        self.logger.info(f'发布进程已启动: {self.task_name} pid={self.process.pid}')
+        try:
+            while self._is_running:
+                try:
+                    message = self.frame_queue.get(timeout=0.1)
+                except queue.Empty:
+                    if not self.process.is_alive():
+                        break
+                    continue
+                if message is None:
+                    break
+                slot, layout, self.position, self.ring_dropped = message
+                self.publish(*self.ring.read_frame(slot, layout, self._release_slot))
+        finally:
+            self._cleanup()
+
+    def _cleanup(self):
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.logger.error('发布进程未能正常退出, 强制结束')
+            self.process.terminate()
+            self.process.join()
+        self.released = True
+        for q in (self.frame_queue, self.free_queue, self.control_queue):
+            q.cancel_join_thread()
+            q.close()
+        self.ring.close()
+        self.ring.unlink()
+        self.logger.info(f'发布进程已结束: {self.task_name}')
@@ -0,0 +1,364 @@
+import io
+import os
+import zlib
+import lzma
+import struct
+import argparse
+import threading
+import numpy as np
+from ctypes import sizeof
+from record_convert import (RecordReader, RECORD_HEAD_STRUCT, RECORD_TOPIC_MAX_LEN, LIDAR_TOPIC,
+                            LIDAR_HEAD_STRUCT, LIDAR_DATA_OFFSET, LIDAR_MAX_POINTS, sensor_point_dtype,
+                            sensorPointCloudData)
+from frame_cache import FrameCache
+from logger_manager import LoggerManager
+
+# v2 文件布局: 文件头 (魔数, 版本, 压缩方式), 若干数据块, 尾部索引 (npz), 文件尾 (索引偏移, 魔数)
+# 每个数据块为块头 (压缩后长度, 原始长度) 加压缩后的数据, 解压后就是 v1 格式的连续记录,
+# 一条记录不会跨越两个数据块. 把所有数据块解压后首尾相接得到的字节流称为逻辑流,
+# 索引中的偏移都是逻辑流上的偏移, 与 v1 文件中的偏移含义相同
+RECORD_V2_MAGIC = b'SVREC2\x00\x00'
+RECORD_V2_VERSION = 2
+V2_HEAD_STRUCT = struct.Struct('<8sII')
+V2_TAIL_STRUCT = struct.Struct('<Q8s')
+CHUNK_HEAD_STRUCT = struct.Struct('<II')
+LIDAR_FULL_SIZE = sizeof(sensorPointCloudData)
+
+CODECS = {'none': 0, 'zlib': 1, 'lzma': 2}
+CODEC_NAMES = {codec_id: name for name, codec_id in CODECS.items()}
+DEFAULT_LEVELS = {'none': 0, 'zlib': 3, 'lzma': 1}
+
+def _compress(codec, data, level):
+    if codec == 'zlib':
+        return zlib.compress(data, level)
+    if codec == 'lzma':
+        return lzma.compress(data, preset=level)
+    return bytes(data)
+
+def _decompress(codec, data):
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    if codec == 'lzma':
+        return lzma.decompress(data)
+    return bytes(data)
+
+def compact_payload(topic_name, data):
+    # 点云结构体固定 30000 个点, 只保留头部和前 width 个有效点
+    if topic_name != LIDAR_TOPIC or len(data) < LIDAR_DATA_OFFSET:
+        return data
+    _, _, width = LIDAR_HEAD_STRUCT.unpack_from(data, 0)
+    size = LIDAR_DATA_OFFSET + min(width, LIDAR_MAX_POINTS) * sensor_point_dtype.itemsize
+    return data[:min(size, len(data))]
+
+def expand_payload(topic_name, data):
+    # compact_payload 的逆操作, 转回 v1 时把点云补齐为完整的结构体
+    if topic_name != LIDAR_TOPIC or len(data) >= LIDAR_FULL_SIZE:
+        return data
+    return bytes(data) + bytes(LIDAR_FULL_SIZE - len(data))
+
+def is_chunked_record(filename):
+    with open(filename, 'rb') as f:
+        return f.read(len(RECORD_V2_MAGIC)) == RECORD_V2_MAGIC
+
+def open_record_reader(filename):
+    # 按文件头选择读取方式, v1 和 v2 的读取接口一致
+    if is_chunked_record(filename):
+        return ChunkedRecordReader(filename)
+    return RecordReader(filename)
+
+class ChunkedRecordWriter:
+    """
+    写入分块压缩的 v2 录制文件
+
+    记录按 v1 格式追加到当前数据块, 数据块原始大小达到 chunk_size 后整体压缩写入文件.
+    每个数据块独立压缩, 读取时跳转只需要解压目标记录所在的数据块
+    """
+    def __init__(self, filename, codec='zlib', level=None, chunk_size=1 << 20, compact=True):
+        if codec not in CODECS:
+            raise ValueError(f'不支持的压缩方式: {codec}')
+        self.filename = filename
+        self.codec = codec
+        self.level = DEFAULT_LEVELS[codec] if level is None else level
+        self.chunk_size = chunk_size
+        self.compact = compact
+        self.file = open(filename, 'wb')
+        self.file.write(V2_HEAD_STRUCT.pack(RECORD_V2_MAGIC, RECORD_V2_VERSION, CODECS[codec]))
+        self.chunk = bytearray()
+        self.virtual_offset = 0
+        self.topic_ids = {}
+        self.topic_heads = {}
+        self.chunks = ([], [], [], [])
+        self.records = ([], [], [], [])
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def write(self, topic_name, timestamp, data):
+        if self.compact:
+            data = compact_payload(topic_name, data)
+        topic_id = self.topic_ids.get(topic_name)
+        if topic_id is None:
+            topic_id = self.topic_ids[topic_name] = len(self.topic_ids)
+            self.topic_heads[topic_name] = topic_name.encode('utf-8') + b'\x00'
+        size = len(data)
+        self.chunk += self.topic_heads[topic_name]
+        self.chunk += RECORD_HEAD_STRUCT.pack(timestamp, size)
+        topic_ids, timestamps, offsets, sizes = self.records
+        topic_ids.append(topic_id)
+        timestamps.append(timestamp)
+        offsets.append(self.virtual_offset + len(self.chunk))
+        sizes.append(size)
+        self.chunk += data
+        if len(self.chunk) >= self.chunk_size:
+            self._flush_chunk()
+
+    def _flush_chunk(self):
+        if not self.chunk:
+            return
+        compressed = _compress(self.codec, self.chunk, self.level)
+        file_offsets, compressed_sizes, raw_sizes, virtual_offsets = self.chunks
+        file_offsets.append(self.file.tell())
+        compressed_sizes.append(len(compressed))
+        raw_sizes.append(len(self.chunk))
+        virtual_offsets.append(self.virtual_offset)
+        self.file.write(CHUNK_HEAD_STRUCT.pack(len(compressed), len(self.chunk)))
+        self.file.write(compressed)
+        self.virtual_offset += len(self.chunk)
+        self.chunk = bytearray()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._flush_chunk()
+        footer_offset = self.file.tell()
+        np.savez(self.file, **_footer_arrays(self.topic_ids, self.chunks, self.records))
+        self.file.write(V2_TAIL_STRUCT.pack(footer_offset, RECORD_V2_MAGIC))
+        self.file.close()
+
+def _footer_arrays(topic_ids, chunks, records):
+    file_offsets, compressed_sizes, raw_sizes, virtual_offsets = chunks
+    record_topics, timestamps, offsets, sizes = records
+    return {
+        'topics': np.asarray(list(topic_ids.keys()), dtype=np.str_),
+        'chunk_file_offset': np.asarray(file_offsets, dtype=np.int64),
+        'chunk_size': np.asarray(compressed_sizes, dtype=np.uint32),
+        'chunk_raw_size': np.asarray(raw_sizes, dtype=np.uint32),
+        'chunk_offset': np.asarray(virtual_offsets, dtype=np.int64),
+        'record_topic': np.asarray(record_topics, dtype=np.uint16),
+        'record_timestamp': np.asarray(timestamps, dtype=np.float64),
+        'record_offset': np.asarray(offsets, dtype=np.int64),
+        'record_size': np.asarray(sizes, dtype=np.uint32)
+    }
+
+class ChunkedRecordReader:
+    """
+    读取分块压缩的 v2 录制文件, 接口与 RecordReader 一致
+
+    偏移均为逻辑流上的偏移, 遍历记录头和跳转只查尾部索引, 不解压数据;
+    读取数据时才解压所在的数据块, 最近用过的数据块缓存在 chunk_cache 中.
+    返回的数据是解压结果上的 memoryview, 不依赖 reader 保持打开
+    """
+    def __init__(self, filename, cache_chunks=4):
+        self.logger = LoggerManager.get_logger(self.__class__.__name__)
+        self.filename = filename
+        self.file_handle = open(filename, 'rb')
+        head = self.file_handle.read(V2_HEAD_STRUCT.size)
+        if len(head) < V2_HEAD_STRUCT.size:
+            raise ValueError(f'不是 v2 录制文件: {filename}')
+        magic, version, codec_id = V2_HEAD_STRUCT.unpack(head)
+        if magic != RECORD_V2_MAGIC or version != RECORD_V2_VERSION or codec_id not in CODEC_NAMES:
+            raise ValueError(f'不是 v2 录制文件: {filename}')
+        self.codec = CODEC_NAMES[codec_id]
+        self.chunk_cache = FrameCache(cache_chunks)
+        # 回放线程和预解码线程可能同时读取, 文件的 seek 和 read 需要加锁
+        self.lock = threading.Lock()
+        self.decompressed_count = 0
+        self.offset = 0
+        footer = self._load_footer()
+        if footer is None:
+            self.logger.warning(f'{filename} 缺少尾部索引 (录制未正常结束), 逐块扫描恢复')
+            footer = self._scan_chunks()
+        self.topic_names = [str(topic_name) for topic_name in footer['topics']]
+        self.chunk_file_offset = footer['chunk_file_offset']
+        self.chunk_size = footer['chunk_size']
+        self.chunk_raw_size = footer['chunk_raw_size']
+        self.chunk_offset = footer['chunk_offset']
+        self.record_topic = footer['record_topic']
+        self.record_timestamp = footer['record_timestamp']
+        self.record_offset = footer['record_offset']
+        self.record_size = footer['record_size']
+        # 逻辑流的长度, 与 RecordReader.file_size 含义一致
+        self.file_size = int(self.chunk_offset[-1] + self.chunk_raw_size[-1]) if len(self.chunk_offset) else 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def __iter__(self):
+        return self.records()
+
+    def close(self):
+        self.chunk_cache.clear()
+        self.file_handle.close()
+
+    def _load_footer(self):
+        file_size = os.fstat(self.file_handle.fileno()).st_size
+        if file_size < V2_HEAD_STRUCT.size + V2_TAIL_STRUCT.size:
+            return None
+        self.file_handle.seek(file_size - V2_TAIL_STRUCT.size)
+        footer_offset, magic = V2_TAIL_STRUCT.unpack(self.file_handle.read(V2_TAIL_STRUCT.size))
+        if magic != RECORD_V2_MAGIC or not V2_HEAD_STRUCT.size <= footer_offset < file_size:
+            return None
+        self.file_handle.seek(footer_offset)
+        footer = self.file_handle.read(file_size - V2_TAIL_STRUCT.size - footer_offset)
+        try:
+            with np.load(io.BytesIO(footer), allow_pickle=False) as npz:
+                return {key: npz[key] for key in npz.files}
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _scan_chunks(self):
+        # 按块头依次解压完整的数据块并解析其中的记录, 末尾不完整的数据块丢弃
+        topic_ids = {}
+        chunks = ([], [], [], [])
+        records = ([], [], [], [])
+        file_offset = V2_HEAD_STRUCT.size
+        virtual_offset = 0
+        while True:
+            self.file_handle.seek(file_offset)
+            head = self.file_handle.read(CHUNK_HEAD_STRUCT.size)
+            if len(head) < CHUNK_HEAD_STRUCT.size:
+                break
+            compressed_size, raw_size = CHUNK_HEAD_STRUCT.unpack(head)
+            try:
+                chunk = _decompress(self.codec, self.file_handle.read(compressed_size))
+            except (zlib.error, lzma.LZMAError):
+                break
+            if len(chunk) != raw_size:
+                break
+            for values, value in zip(chunks, (file_offset, compressed_size, raw_size, virtual_offset)):
+                values.append(value)
+            for topic_name, timestamp, data_offset, data_size in _parse_records(chunk):
+                topic_id = topic_ids.setdefault(topic_name, len(topic_ids))
+                for values, value in zip(records, (topic_id, timestamp, virtual_offset + data_offset, data_size)):
+                    values.append(value)
+            file_offset += CHUNK_HEAD_STRUCT.size + compressed_size
+            virtual_offset += raw_size
+        return _footer_arrays(topic_ids, chunks, records)
+
+    def _load_chunk(self, chunk_no):
+        chunk = self.chunk_cache.get(chunk_no)
+        if chunk is None:
+            with self.lock:
+                self.file_handle.seek(int(self.chunk_file_offset[chunk_no]) + CHUNK_HEAD_STRUCT.size)
+                compressed = self.file_handle.read(int(self.chunk_size[chunk_no]))
+            chunk = memoryview(_decompress(self.codec, compressed))
+            self.decompressed_count += 1
+            self.chunk_cache.put(chunk_no, chunk)
+        return chunk
+
+    def scan(self, offset=0):
+        # 只遍历尾部索引, 返回 topic, 时间戳, 数据偏移, 数据长度
+        for i in range(int(np.searchsorted(self.record_offset, offset)), len(self.record_offset)):
+            yield (self.topic_names[self.record_topic[i]], float(self.record_timestamp[i]),
+                   int(self.record_offset[i]), int(self.record_size[i]))
+
+    def records(self, topic_name=None, offset=None):
+        # 依次返回 topic, 时间戳, 数据; 只解压返回的记录所在的数据块
+        if offset is not None:
+            self.offset = offset
+        for name, timestamp, data_offset, data_size in self.scan(self.offset):
+            self.offset = data_offset + data_size
+            if topic_name is None or name == topic_name:
+                data = self.read_at(data_offset, data_size)
+                if data is None:
+                    return
+                yield name, timestamp, data
+
+    def read_record_head_a_data(self, name):
+        for _, timestamp, data in self.records(name):
+            return timestamp, len(data), data
+        return None, None, None
+
+    def read_at(self, data_offset, data_size):
+        chunk_no = int(np.searchsorted(self.chunk_offset, data_offset, side='right')) - 1
+        if chunk_no < 0:
+            return None
+        start = data_offset - int(self.chunk_offset[chunk_no])
+        chunk = self._load_chunk(chunk_no)
+        if start + data_size > len(chunk):
+            return None
+        return chunk[start:start + data_size]
+
+    def get_stats(self):
+        return {
+            'codec': self.codec,
+            'chunks': len(self.chunk_offset),
+            'records': len(self.record_offset),
+            'decompressed': self.decompressed_count,
+            'cache': self.chunk_cache.get_stats()
+        }
+
+def _parse_records(chunk):
+    # 解析数据块中连续的 v1 记录, 返回 topic, 时间戳, 块内数据偏移, 数据长度
+    offset = 0
+    chunk = bytes(chunk)
+    while True:
+        end = chunk.find(b'\x00', offset, offset + RECORD_TOPIC_MAX_LEN + 1)
+        if end < 0:
+            # 数据块是完整解压的, 剩余数据中找不到 topic 结尾说明数据已损坏
+            if offset < len(chunk):
+                raise ValueError(f'数据块偏移 {offset} 处的 topic 超过 {RECORD_TOPIC_MAX_LEN} 字节或没有结尾')
+            return
+        if end + 1 + RECORD_HEAD_STRUCT.size > len(chunk):
+            return
+        timestamp, data_size = RECORD_HEAD_STRUCT.unpack_from(chunk, end + 1)
+        data_offset = end + 1 + RECORD_HEAD_STRUCT.size
+        if data_offset + data_size > len(chunk):
+            return
+        yield chunk[offset:end].decode('utf-8'), timestamp, data_offset, data_size
+        offset = data_offset + data_size
+
+def convert_to_v2(src, dst, codec='zlib', level=None, chunk_size=1 << 20, compact=True):
+    with open_record_reader(src) as reader, ChunkedRecordWriter(dst, codec, level, chunk_size, compact) as writer:
+        for topic_name, timestamp, data in reader.records():
+            writer.write(topic_name, timestamp, data)
+
+def convert_to_v1(src, dst):
+    topic_heads = {}
+    with open_record_reader(src) as reader, open(dst, 'wb', buffering=8 << 20) as f:
+        for topic_name, timestamp, data in reader.records():
+            topic_head = topic_heads.get(topic_name)
+            if topic_head is None:
+                topic_head = topic_heads[topic_name] = topic_name.encode('utf-8') + b'\x00'
+            data = expand_payload(topic_name, data)
+            f.write(topic_head + RECORD_HEAD_STRUCT.pack(timestamp, len(data)))
+            f.write(data)
+
+def main():
+    parser = argparse.ArgumentParser(description='.record 文件在 v1 (原始) 与 v2 (分块压缩) 格式之间转换')
+    parser.add_argument('src')
+    parser.add_argument('dst')
+    parser.add_argument('--to', choices=['v1', 'v2'], default='v2')
+    parser.add_argument('--codec', choices=list(CODECS), default='zlib')
+    parser.add_argument('--level', type=int, default=None, help='压缩等级, 默认 zlib 3, lzma 1')
+    parser.add_argument('--chunk-mb', type=float, default=1.0, help='数据块压缩前的大小 (MB)')
+    parser.add_argument('--no-compact', action='store_true', help='保留点云结构体中未使用的点')
+    args = parser.parse_args()
+    if args.to == 'v2':
+        convert_to_v2(args.src, args.dst, args.codec, args.level, int(args.chunk_mb * (1 << 20)), not args.no_compact)
+    else:
+        convert_to_v1(args.src, args.dst)
+    src_size, dst_size = os.path.getsize(args.src), os.path.getsize(args.dst)
+    print(f'{args.src} ({src_size / (1 << 20):.1f}MB) -> {args.dst} ({dst_size / (1 << 20):.1f}MB), '
+          f'{dst_size / max(src_size, 1):.1%}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+import os
+import shutil
+import argparse
+import numpy as np
+from record_convert import (LidarData, ImuData, LIDAR_TOPIC, IMU_TOPIC, LIDAR_HEAD_STRUCT, LIDAR_DATA_OFFSET,
+                            LIDAR_MAX_POINTS, sensor_point_dtype)
+from record_chunked import open_record_reader
+from record_index import RecordIndex, FrameCursor, find_nearest_frame
+from logger_manager import LoggerManager
+
+class ColumnarCache:
+    """
+    录制文件按 topic 解析后的列式缓存, 保存在录制文件旁边的 <文件名>.cols 目录中
+
+    每个 topic 一个子目录, 每一列是一个 .npy 文件, 打开时用 mmap_mode='r' 映射, 不读取数据:
+    点云为所有帧拼接的 xyz/intensity/ring 列和帧起始偏移表 (帧数 + 1 项),
+    IMU 为 acc/gyro/stamp 连续列, 各 topic 都有录制时间戳列 timestamp.
+    缓存只需生成一次, 之后打开和跳转不再解析 .record; 录制文件变化后缓存失效.
+    图像没有列式表示, 仍从 .record 读取
+    """
+    VERSION = 1
+    CACHE_SUFFIX = '.cols'
+
+    def __init__(self, filename, topics):
+        self.filename = filename
+        # topic -> {列名: 映射的数组}
+        self.topics = topics
+
+    @classmethod
+    def cache_path(cls, filename):
+        return filename + cls.CACHE_SUFFIX
+
+    @classmethod
+    def load(cls, filename):
+        # 缓存不存在或与录制文件不一致时返回 None
+        path = cls.cache_path(filename)
+        meta_path = os.path.join(path, 'meta.npy')
+        if not os.path.exists(meta_path):
+            return None
+        stat = os.stat(filename)
+        try:
+            version, file_size, file_mtime_ns = (int(v) for v in np.load(meta_path))
+            if version != cls.VERSION or file_size != stat.st_size or file_mtime_ns != stat.st_mtime_ns:
+                return None
+            topics = {}
+            for topic_name in os.listdir(path):
+                topic_path = os.path.join(path, topic_name)
+                if not os.path.isdir(topic_path):
+                    continue
+                topics[topic_name] = {
+                    column[:-4]: np.load(os.path.join(topic_path, column), mmap_mode='r', allow_pickle=False)
+                    for column in os.listdir(topic_path) if column.endswith('.npy')
+                }
+        except (OSError, ValueError):
+            return None
+        return cls(filename, topics)
+
+    @classmethod
+    def build(cls, filename):
+        # 先写到临时目录, 全部完成后再替换旧缓存, 避免其他视图读到写了一半的缓存
+        logger = LoggerManager.get_logger(cls.__name__)
+        logger.info(f'生成列式缓存: {filename}')
+        stat = os.stat(filename)
+        path = cls.cache_path(filename)
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        with open_record_reader(filename) as reader:
+            index = RecordIndex.load_or_build(filename, reader)
+            for topic_name, build_func in COLUMN_BUILDERS.items():
+                if index.frame_count(topic_name) == 0:
+                    continue
+                topic_path = os.path.join(tmp_path, topic_name)
+                os.makedirs(topic_path)
+                np.save(os.path.join(topic_path, 'timestamp.npy'), index.get_timestamps(topic_name))
+                build_func(reader, index.topics[topic_name], topic_path)
+        np.save(os.path.join(tmp_path, 'meta.npy'),
+                np.asarray([cls.VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64))
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        return cls.load(filename)
+
+    def has_topic(self, topic_name):
+        return topic_name in self.topics
+
+    def frame_count(self, topic_name):
+        columns = self.topics.get(topic_name)
+        return 0 if columns is None else len(columns['timestamp'])
+
+    def get_columns(self, topic_name):
+        # 整个 topic 的列, 例如 np.array(get_columns(IMU_TOPIC)['acc']) 一次读入全部 IMU 数据
+        return self.topics[topic_name]
+
+    def get_timestamps(self, topic_name):
+        return self.topics[topic_name]['timestamp']
+
+    def find_frame(self, topic_name, timestamp):
+        # 与 RecordIndex.find_frame 一致, 返回时间戳最接近的帧号
+        return find_nearest_frame(self.topics[topic_name]['timestamp'], timestamp)
+
+    def read(self, topic_name, frame_no):
+        # 返回时间戳和该帧各列的切片 (映射内存上的视图)
+        columns = self.topics[topic_name]
+        return float(columns['timestamp'][frame_no]), COLUMN_READERS[topic_name](columns, frame_no)
+
+    def cursor(self, topic_name):
+        return ColumnarCursor(self, topic_name)
+
+    def get_decoder(self, topic_name):
+        # 把 read 返回的切片转换为与 .record 解码结果相同的帧
+        return COLUMN_DECODERS[topic_name]
+
+class ColumnarCursor(FrameCursor):
+    """按帧读取列式缓存中某个 topic 的数据"""
+    def read(self, frame_no):
+        return self.index.read(self.topic_name, frame_no)
+
+def _build_lidar_columns(reader, entries, topic_path):
+    # 第一遍只读点云头部得到每帧的点数, 第二遍把点直接写入映射的输出文件
+    offsets, sizes = entries['offset'], entries['size']
+    counts = np.empty(len(offsets), dtype=np.int64)
+    for i, (offset, size) in enumerate(zip(offsets, sizes)):
+        _, _, width = LIDAR_HEAD_STRUCT.unpack_from(reader.read_at(int(offset), LIDAR_HEAD_STRUCT.size))
+        available = (int(size) - LIDAR_DATA_OFFSET) // sensor_point_dtype.itemsize
+        counts[i] = max(0, min(width, LIDAR_MAX_POINTS, available))
+    point_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=point_offsets[1:])
+    total = int(point_offsets[-1])
+    open_memmap = np.lib.format.open_memmap
+    xyz = open_memmap(os.path.join(topic_path, 'xyz.npy'), mode='w+', dtype=np.float32, shape=(total, 3))
+    intensity = open_memmap(os.path.join(topic_path, 'intensity.npy'), mode='w+', dtype=np.uint8, shape=(total,))
+    ring = open_memmap(os.path.join(topic_path, 'ring.npy'), mode='w+', dtype=np.int16, shape=(total,))
+    stamp = np.empty(len(counts), dtype=np.float64)
+    for i, (offset, size) in enumerate(zip(offsets, sizes)):
+        st, points, intensities, rings, _ = LidarData.get_lidar_columns(reader.read_at(int(offset), int(size)))
+        start, end = point_offsets[i], point_offsets[i + 1]
+        xyz[start:end] = points
+        intensity[start:end] = intensities
+        ring[start:end] = rings
+        stamp[i] = st
+    for column in (xyz, intensity, ring):
+        column.flush()
+    np.save(os.path.join(topic_path, 'point_offset.npy'), point_offsets)
+    np.save(os.path.join(topic_path, 'stamp.npy'), stamp)
+
+def _build_imu_columns(reader, entries, topic_path):
+    count = len(entries['offset'])
+    acc = np.empty((count, 3), dtype=np.float64)
+    gyro = np.empty((count, 3), dtype=np.float64)
+    stamp = np.empty(count, dtype=np.float64)
+    for i, (offset, size) in enumerate(zip(entries['offset'], entries['size'])):
+        ax, ay, az, gx, gy, gz, stamp[i] = ImuData.get_imu_data(reader.read_at(int(offset), int(size)))
+        acc[i] = ax, ay, az
+        gyro[i] = gx, gy, gz
+    np.save(os.path.join(topic_path, 'acc.npy'), acc)
+    np.save(os.path.join(topic_path, 'gyro.npy'), gyro)
+    np.save(os.path.join(topic_path, 'stamp.npy'), stamp)
+
+def _read_lidar_columns(columns, frame_no):
+    start, end = columns['point_offset'][frame_no:frame_no + 2]
+    return columns['xyz'][start:end], columns['intensity'][start:end], float(columns['stamp'][frame_no])
+
+def _read_imu_columns(columns, frame_no):
+    return columns['acc'][frame_no], columns['gyro'][frame_no], float(columns['stamp'][frame_no])
+
+def _decode_lidar_columns(data):
+    points, intensities, st = data
+    return points, LidarData.get_intensity_colors(intensities), st
+
+def _decode_imu_columns(data):
+    acc, gyro, stamp = data
+    return acc.tolist(), gyro.tolist(), stamp
+
+COLUMN_BUILDERS = {LIDAR_TOPIC: _build_lidar_columns, IMU_TOPIC: _build_imu_columns}
+COLUMN_READERS = {LIDAR_TOPIC: _read_lidar_columns, IMU_TOPIC: _read_imu_columns}
+COLUMN_DECODERS = {LIDAR_TOPIC: _decode_lidar_columns, IMU_TOPIC: _decode_imu_columns}
+
+def main():
+    parser = argparse.ArgumentParser(description='为 .record 文件生成列式缓存, 回放时自动使用')
+    parser.add_argument('files', nargs='+')
+    args = parser.parse_args()
+    for filename in args.files:
+        cache = ColumnarCache.build(filename)
+        counts = {topic_name: cache.frame_count(topic_name) for topic_name in cache.topics}
+        print(f'{filename} -> {ColumnarCache.cache_path(filename)}: {counts}')
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,12 @@
+import os
+import mmap
 import struct
 import traceback
 import numpy as np
 from ctypes import *
 import cv2
 from PySide6.QtGui import QImage
+from logger_manager import LoggerManager
 
 class imuMetaData(LittleEndianStructure):
     _fields_ = [
@@ -38,6 +41,25 @@ class sensorPointCloudData(LittleEndianStructure):
         ('data', sensorPointData * 30000)
     ]
 
+# 与 sensorPointData 内存布局一致的 numpy 结构化类型, 偏移量直接取自 ctypes 定义
+# x/y/z 连续存放, 合并成一个 (3,) 的 float32 字段, 取出来就是 (N, 3) 的点坐标视图
+sensor_point_dtype = np.dtype({
+    'names': ['timestamp', 'intensity', 'ring', 'xyz'],
+    'formats': ['<f8', 'u1', '<i2', ('<f4', (3,))],
+    'offsets': [
+        sensorPointData.timestamp.offset,
+        sensorPointData.intensity.offset,
+        sensorPointData.ring.offset,
+        sensorPointData.x.offset
+    ],
+    'itemsize': sizeof(sensorPointData)
+})
+
+# 点云头部: stamp, height, width
+LIDAR_HEAD_STRUCT = struct.Struct('<dII')
+LIDAR_DATA_OFFSET = sensorPointCloudData.data.offset
+LIDAR_MAX_POINTS = 30000
+
 HB_VIO_BUFFER_MAX_PLANES = 3
 VIO_DATA_TYPE_E = c_int
 buffer_state_e = c_int
@@ -100,40 +122,153 @@ class shm_img_t(LittleEndianStructure):
         ("right_img", img_data_t)
     ]
 
+# 记录头: topic 名称以 \x00 结尾, 后接 double 时间戳和 uint32 数据长度
+RECORD_HEAD_STRUCT = struct.Struct('<dI')
+RECORD_TOPIC_MAX_LEN = 256
+
+LIDAR_TOPIC = 'lidar_data'
+IMU_TOPIC = 'dds_imu'
+# 双目图像 (shm_img_t) 的 topic 名称
+IMG_TOPIC = 'shm_img'
+
 class RecordHeader:
     def __init__(self):
         return
 
-    def read_record_head_a_data(file_handle, name):
+    @staticmethod
+    def scan_records(file_handle):
+        # 只解析记录头, 跳过数据部分, 依次返回 topic, 时间戳, 数据偏移, 数据长度
+        offset = file_handle.tell()
         while True:
+            file_handle.seek(offset)
+            head = file_handle.read(RECORD_TOPIC_MAX_LEN + RECORD_HEAD_STRUCT.size)
+            end = head.find(b'\x00', 0, RECORD_TOPIC_MAX_LEN + 1)
+            if end < 0:
+                if len(head) > RECORD_TOPIC_MAX_LEN:
+                    raise ValueError(f'偏移 {offset} 处的 topic 超过 {RECORD_TOPIC_MAX_LEN} 字节, 文件可能已损坏')
+                if head:
+                    LoggerManager.get_logger('RecordHeader').warning(f'文件在偏移 {offset} 处的 topic 中间结束')
+                return
+            if len(head) < end + 1 + RECORD_HEAD_STRUCT.size:
+                return
+            topic_name = head[:end].decode('utf-8')
+            timestamp, data_size = RECORD_HEAD_STRUCT.unpack_from(head, end + 1)
+            data_offset = offset + end + 1 + RECORD_HEAD_STRUCT.size
+            offset = data_offset + data_size
+            yield topic_name, timestamp, data_offset, data_size
+
+    @staticmethod
+    def read_record_at(file_handle, data_offset, data_size):
+        file_handle.seek(data_offset)
+        data = memoryview(file_handle.read(data_size))
+        if len(data) != data_size:
+            return None
+        return data
+
+    def read_record_head_a_data(file_handle, name):
+        try:
+            for topic_name, timestamp, data_offset, data_size in RecordHeader.scan_records(file_handle):
+                if name != topic_name:
+                    continue
+                data = RecordHeader.read_record_at(file_handle, data_offset, data_size)
+                if data is None:
+                    break
+                return timestamp, data_size, data
+        except Exception as e:
+            traceback.print_exc()
+        return None, None, None
+
+class RecordReader:
+    """
+    以 mmap 方式读取 .record 文件
+
+    返回的数据是映射内存上的 memoryview 切片, 不做拷贝, 只在 reader 打开期间保证有效,
+    需要长期保存的数据请自行拷贝
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.file_handle = open(filename, 'rb')
+        self.file_size = os.fstat(self.file_handle.fileno()).st_size
+        self.mmap = None
+        self.buffer = memoryview(b'')
+        if self.file_size > 0:
+            self.mmap = mmap.mmap(self.file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+            self.buffer = memoryview(self.mmap)
+        self.offset = 0
+        self._topic_names = {}
+        self.logger = LoggerManager.get_logger(self.__class__.__name__)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def __iter__(self):
+        return self.records()
+
+    def close(self):
+        self.buffer.release()
+        if self.mmap is not None:
             try:
-                topic_name_bytes = bytearray()
-                while True:
-                    byte = file_handle.read(1)
-                    if not byte:
-                        return None, None, None
-                    if byte == b'\x00':
-                        break
-                    topic_name_bytes.extend(byte)
-                topic_name = topic_name_bytes.decode('utf-8')
-
-                # 读取 double st (8 bytes) 和 uint32 size (4 bytes)
-                st_data = file_handle.read(12)
-                if len(st_data) < 12:
-                    return None, None, None
-                timestamp, data_size = struct.unpack('dI', st_data)
-
-                # 读取剩余数据，不拷贝，直接返回 memoryview
-                data = memoryview(file_handle.read(data_size))
-
-                if len(data) != data_size:
-                    return None, None, None
-
-                if name == topic_name:
-                    return timestamp, data_size, data
-            except Exception as e:
-                traceback.print_exc()
-                break
+                self.mmap.close()
+            except BufferError:
+                # 仍有数据视图在使用映射, 由垃圾回收负责释放
+                pass
+            self.mmap = None
+        self.file_handle.close()
+
+    def _parse_head(self, offset):
+        # 解析 offset 处的记录头, 返回 topic, 时间戳, 数据偏移, 数据长度; 数据不完整时返回 None
+        end = self.mmap.find(b'\x00', offset, offset + RECORD_TOPIC_MAX_LEN + 1)
+        if end < 0:
+            if offset + RECORD_TOPIC_MAX_LEN < self.file_size:
+                raise ValueError(f'{self.filename} 偏移 {offset} 处的 topic 超过 {RECORD_TOPIC_MAX_LEN} 字节, 文件可能已损坏')
+            if offset < self.file_size:
+                self.logger.warning(f'{self.filename} 在偏移 {offset} 处的 topic 中间结束')
+            return None
+        if end + 1 + RECORD_HEAD_STRUCT.size > self.file_size:
+            return None
+        topic_bytes = self.buffer[offset:end].tobytes()
+        topic_name = self._topic_names.get(topic_bytes)
+        if topic_name is None:
+            topic_name = self._topic_names.setdefault(topic_bytes, topic_bytes.decode('utf-8'))
+        timestamp, data_size = RECORD_HEAD_STRUCT.unpack_from(self.buffer, end + 1)
+        data_offset = end + 1 + RECORD_HEAD_STRUCT.size
+        if data_offset + data_size > self.file_size:
+            return None
+        return topic_name, timestamp, data_offset, data_size
+
+    def scan(self, offset=0):
+        # 只遍历记录头, 返回 topic, 时间戳, 数据偏移, 数据长度
+        if self.mmap is None:
+            return
+        while True:
+            head = self._parse_head(offset)
+            if head is None:
+                return
+            yield head
+            offset = head[2] + head[3]
+
+    def records(self, topic_name=None, offset=None):
+        # 依次返回 topic, 时间戳, 数据; topic_name 不为空时只返回该 topic
+        if offset is not None:
+            self.offset = offset
+        for name, timestamp, data_offset, data_size in self.scan(self.offset):
+            self.offset = data_offset + data_size
+            if topic_name is None or name == topic_name:
+                yield name, timestamp, self.buffer[data_offset:self.offset]
+
+    def read_record_head_a_data(self, name):
+        # 与 RecordHeader.read_record_head_a_data 返回值一致, 从当前位置读取下一条 name 记录
+        for _, timestamp, data in self.records(name):
+            return timestamp, len(data), data
+        return None, None, None
+
+    def read_at(self, data_offset, data_size):
+        if data_offset + data_size > self.file_size:
+            return None
+        return self.buffer[data_offset:data_offset + data_size]
 
 
 class LidarData(RecordHeader):
@@ -156,15 +291,40 @@ class LidarData(RecordHeader):
         return cloud_data.stamp, points, intensities
 
     @staticmethod
-    def get_lidar_points_np(points_data):
-        st, points, intensities = LidarData.get_lidar_points(points_data)
+    def get_lidar_frame(points_data):
+        # 直接把负载映射成结构化数组, 只取前 width 个有效点, 不做逐点处理也不拷贝
+        stamp, height, width = LIDAR_HEAD_STRUCT.unpack_from(points_data, 0)
+        available = (memoryview(points_data).nbytes - LIDAR_DATA_OFFSET) // sensor_point_dtype.itemsize
+        count = max(0, min(width, LIDAR_MAX_POINTS, available))
+        cloud = np.frombuffer(points_data, dtype=sensor_point_dtype, count=count, offset=LIDAR_DATA_OFFSET)
+        return stamp, cloud
+
+    @staticmethod
+    def get_lidar_columns(points_data):
+        # 返回 float32 的 (N, 3) 坐标以及强度/线号/时间戳列, 均为原缓冲区上的视图
+        stamp, cloud = LidarData.get_lidar_frame(points_data)
+        return stamp, cloud['xyz'], cloud['intensity'], cloud['ring'], cloud['timestamp']
 
-        points = np.array(points)
-        colors = np.ones_like(points) * 0.5
+    @staticmethod
+    def get_intensity_colors(intensities):
+        colors = np.full((len(intensities), 3), 0.5, dtype=np.float32)
         colors[:, 2] = intensities
+        return colors
+
+    @staticmethod
+    def get_lidar_stamp(points_data):
+        # 只读取消息头中的 stamp, 不解码点
+        return LIDAR_HEAD_STRUCT.unpack_from(points_data, 0)[0]
 
+    @staticmethod
+    def get_lidar_points_np(points_data):
+        st, points, intensities, _, _ = LidarData.get_lidar_columns(points_data)
+        colors = LidarData.get_intensity_colors(intensities)
         return points, colors, st
 
+# imuMetaData.id, IMU 的序号
+IMU_ID_STRUCT = struct.Struct('<I')
+
 class ImuData(RecordHeader):
     def __init__(self):
         super().__init__()
@@ -182,6 +342,36 @@ class ImuData(RecordHeader):
         stamp = imu_data.stamp
         return ax, ay, az, gx, gy, gz, stamp
 
+    @staticmethod
+    def get_imu_id(data):
+        return IMU_ID_STRUCT.unpack_from(data, imuMetaData.id.offset)[0]
+
+# 图像尺寸及 NV12 数据在 shm_img_t 中的偏移, Y 与 UV 平面连续存放
+IMG_HEIGHT, IMG_WIDTH = 480, 640
+NV12_SIZE = IMG_WIDTH * IMG_HEIGHT * 3 // 2
+LEFT_CAMERA, RIGHT_CAMERA = 0, 1
+NV12_OFFSETS = {
+    LEFT_CAMERA: shm_img_t.left_img.offset + img_data_t.yuv_data.offset + yuv_data_t.y.offset,
+    RIGHT_CAMERA: shm_img_t.right_img.offset + img_data_t.yuv_data.offset + yuv_data_t.y.offset
+}
+IMG_TIMESTAMP_OFFSET = (shm_img_t.left_img.offset + img_data_t.hb_vio_buffer.offset +
+                        hb_vio_buffer_t.img_info.offset + image_info_t.time_stamp.offset)
+IMG_TIMESTAMP_STRUCT = struct.Struct('<d')
+IMG_FRAME_ID_OFFSET = (shm_img_t.left_img.offset + img_data_t.hb_vio_buffer.offset +
+                       hb_vio_buffer_t.img_info.offset + image_info_t.frame_id.offset)
+IMG_FRAME_ID_STRUCT = struct.Struct('<I')
+
+def new_rgb_image(height, width):
+    """
+    分配一张 RGB888 的 QImage, 同时返回其像素内存上的 (height, width, 3) 数组视图
+
+    内存由 QImage 自己持有: QPixmap.fromImage、跨线程信号等产生的隐式共享拷贝按引用计数
+    保持数据有效, 不会在 Python 对象释放后被复用改写
+    """
+    image = QImage(width, height, QImage.Format_RGB888)
+    rows = np.frombuffer(image.bits(), dtype=np.uint8).reshape(height, image.bytesPerLine())
+    return image, rows[:, :width * 3].reshape(height, width, 3)
+
 class SensorImgData(RecordHeader):
     def __init__(self):
         super().__init__()
@@ -202,22 +392,41 @@ class SensorImgData(RecordHeader):
         return l_img, r_img, st
 
     @staticmethod
-    def get_sensor_img_data(data):
-        double_img_obj = shm_img_t.from_buffer_copy(bytearray(data))
-        left_img = SensorImgData.convert_img(double_img_obj.left_img.yuv_data)
-        right_img = SensorImgData.convert_img(double_img_obj.right_img.yuv_data)
-        st = double_img_obj.left_img.hb_vio_buffer.img_info.time_stamp
-        return left_img, right_img, st
+    def get_nv12_plane(data, camera):
+        # 直接在接收缓冲区上取 NV12 视图 (Y 在上, UV 在下), 不拷贝
+        return np.frombuffer(data, dtype=np.uint8, count=NV12_SIZE,
+                             offset=NV12_OFFSETS[camera]).reshape(IMG_HEIGHT * 3 // 2, IMG_WIDTH)
+
+    @staticmethod
+    def get_img_timestamp(data):
+        return IMG_TIMESTAMP_STRUCT.unpack_from(data, IMG_TIMESTAMP_OFFSET)[0]
+
+    @staticmethod
+    def get_img_frame_id(data):
+        return IMG_FRAME_ID_STRUCT.unpack_from(data, IMG_FRAME_ID_OFFSET)[0]
+
+    @staticmethod
+    def get_sensor_img_data(data, cameras=(LEFT_CAMERA, RIGHT_CAMERA)):
+        # 只转换 cameras 中指定的相机, 未请求的相机返回 None
+        images = [None, None]
+        for camera in cameras:
+            images[camera] = SensorImgData.convert_nv12(SensorImgData.get_nv12_plane(data, camera))
+        st = SensorImgData.get_img_timestamp(data)
+        return images[LEFT_CAMERA], images[RIGHT_CAMERA], st
+
+    @staticmethod
+    def convert_nv12(nv12):
+        # 直接转换到 QImage 的像素内存中, 行尾有对齐填充时 cv2 另行分配, 再拷贝进去
+        image, rgb = new_rgb_image(nv12.shape[0] * 2 // 3, nv12.shape[1])
+        out = cv2.cvtColor(nv12, cv2.COLOR_YUV2RGB_NV12, dst=rgb)
+        if out is not rgb:
+            rgb[...] = out
+        return image
 
     @staticmethod
     def convert_img(data):
-        yuv = np.frombuffer(data, dtype=np.uint8)
-        height, width = 480, 640
-        yuv_img = np.zeros((int(height * 1.5), width), dtype=np.uint8)
-        yuv_img[:height] = yuv[:width * height].reshape(height, width)
-        yuv_img[height:] = yuv[width * height:width * height * 3 // 2].reshape(height // 2, width)
-        rgb = cv2.cvtColor(yuv_img, cv2.COLOR_YUV2RGB_NV12)
-        return QImage(rgb.data, width, height, width * 3, QImage.Format_RGB888)
+        yuv = np.frombuffer(data, dtype=np.uint8, count=NV12_SIZE)
+        return SensorImgData.convert_nv12(yuv.reshape(IMG_HEIGHT * 3 // 2, IMG_WIDTH))
 
 
 # 测试代码
@@ -0,0 +1,75 @@
+import os
+import threading
+from record_chunked import open_record_reader
+from record_index import RecordIndex, RecordCursor
+from logger_manager import LoggerManager
+
+class RecordDemux:
+    """
+    同一个 .record 文件的共享读取器
+
+    所有订阅者共用一个 RecordReader (一份 mmap 或一份数据块缓存) 和一份 RecordIndex,
+    每个订阅者按索引中本 topic 的偏移维护自己的读取位置, 各 topic 互不影响:
+    稀疏的 topic 读到下一帧时不需要先读出中间所有其他 topic 的记录, 也不会丢失记录.
+    慢的视图只落后自己的位置, 不会拖住其他视图; 跳转只作用于发起跳转的订阅者
+    """
+    _demuxes = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, filename):
+        self.logger = LoggerManager.get_logger(self.__class__.__name__)
+        self.filename = filename
+        self.reader = open_record_reader(filename)
+        self.index = RecordIndex.load_or_build(filename, self.reader)
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+        self.ref_count = 0
+
+    @classmethod
+    def subscribe(cls, filename, topic_name):
+        key = os.path.abspath(filename)
+        with cls._registry_lock:
+            demux = cls._demuxes.get(key)
+            if demux is None:
+                demux = cls(filename)
+                cls._demuxes[key] = demux
+            demux.ref_count += 1
+        return demux._add_subscription(topic_name)
+
+    def _add_subscription(self, topic_name):
+        subscription = DemuxSubscription(self, topic_name)
+        with self.lock:
+            self.subscriptions.setdefault(topic_name, []).append(subscription)
+        self.logger.info(f'订阅 {topic_name}: {self.filename}, 当前订阅数 {self.ref_count}')
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.topic_name, [])
+            if subscription in subscriptions:
+                subscriptions.remove(subscription)
+        key = os.path.abspath(self.filename)
+        with self._registry_lock:
+            self.ref_count -= 1
+            if self.ref_count > 0:
+                return
+            self._demuxes.pop(key, None)
+        self.logger.info(f'关闭共享读取器: {self.filename}')
+        self.reader.close()
+
+class DemuxSubscription(RecordCursor):
+    """RecordDemux 的订阅者: 在共享的 reader 和索引上按帧读取一个 topic 的 RecordCursor"""
+    def __init__(self, demux, topic_name):
+        super().__init__(demux.reader, demux.index, topic_name)
+        self.demux = demux
+        self.closed = False
+
+    def next(self):
+        if self.closed:
+            return None, None
+        return super().next()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.demux.unsubscribe(self)
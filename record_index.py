@@ -0,0 +1,198 @@
+import os
+import numpy as np
+from record_chunked import ChunkedRecordReader, open_record_reader, is_chunked_record
+from logger_manager import LoggerManager
+
+def find_nearest_frame(timestamps, timestamp):
+    # 返回升序时间戳数组中与 timestamp 最接近的下标, 数组为空时返回 -1
+    if len(timestamps) == 0:
+        return -1
+    pos = int(np.searchsorted(timestamps, timestamp))
+    if pos >= len(timestamps):
+        return len(timestamps) - 1
+    if pos > 0 and timestamp - timestamps[pos - 1] <= timestamps[pos] - timestamp:
+        return pos - 1
+    return pos
+
+class RecordIndex:
+    """
+    .record 文件的 topic 索引, 记录每一帧数据的偏移、长度和时间戳
+
+    v1 文件的索引在第一次打开时单遍扫描生成, 保存在录制文件旁边的 <文件名>.idx 中,
+    文件大小或修改时间变化后会自动重建; v2 文件的尾部已有索引, 直接由它生成, 不写 .idx
+    """
+    VERSION = 1
+    INDEX_SUFFIX = '.idx'
+
+    def __init__(self, filename, file_size, file_mtime_ns, topics):
+        self.filename = filename
+        self.file_size = file_size
+        self.file_mtime_ns = file_mtime_ns
+        # topic -> {'offset': int64[], 'size': uint32[], 'timestamp': float64[]}
+        self.topics = topics
+
+    @classmethod
+    def index_path(cls, filename):
+        return filename + cls.INDEX_SUFFIX
+
+    @classmethod
+    def build(cls, filename):
+        stat = os.stat(filename)
+        entries = {}
+        # 文件尾部不完整的记录不会被 scan 返回
+        with open_record_reader(filename) as reader:
+            for topic_name, timestamp, data_offset, data_size in reader.scan():
+                offsets, sizes, timestamps = entries.setdefault(topic_name, ([], [], []))
+                offsets.append(data_offset)
+                sizes.append(data_size)
+                timestamps.append(timestamp)
+
+        topics = {}
+        for topic_name, (offsets, sizes, timestamps) in entries.items():
+            topics[topic_name] = {
+                'offset': np.asarray(offsets, dtype=np.int64),
+                'size': np.asarray(sizes, dtype=np.uint32),
+                'timestamp': np.asarray(timestamps, dtype=np.float64)
+            }
+        return cls(filename, stat.st_size, stat.st_mtime_ns, topics)
+
+    @classmethod
+    def from_chunked_reader(cls, reader):
+        # 按 topic 拆分 v2 文件的尾部索引
+        stat = os.stat(reader.filename)
+        topics = {}
+        for topic_id, topic_name in enumerate(reader.topic_names):
+            mask = reader.record_topic == topic_id
+            topics[topic_name] = {
+                'offset': reader.record_offset[mask],
+                'size': reader.record_size[mask],
+                'timestamp': reader.record_timestamp[mask]
+            }
+        return cls(reader.filename, stat.st_size, stat.st_mtime_ns, topics)
+
+    @classmethod
+    def load(cls, filename):
+        path = cls.index_path(filename)
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(filename)
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                version, file_size, file_mtime_ns = (int(v) for v in npz['meta'])
+                if version != cls.VERSION or file_size != stat.st_size or file_mtime_ns != stat.st_mtime_ns:
+                    return None
+                topics = {}
+                for i, topic_name in enumerate(npz['topics']):
+                    topics[str(topic_name)] = {
+                        'offset': npz[f'{i}_offset'],
+                        'size': npz[f'{i}_size'],
+                        'timestamp': npz[f'{i}_timestamp']
+                    }
+        except (OSError, KeyError, ValueError):
+            return None
+        return cls(filename, file_size, file_mtime_ns, topics)
+
+    @classmethod
+    def load_or_build(cls, filename, reader=None):
+        # reader 为已打开的同一文件, v2 文件可以直接使用它读出的尾部索引
+        if reader is None and is_chunked_record(filename):
+            with ChunkedRecordReader(filename) as reader:
+                return cls.from_chunked_reader(reader)
+        if isinstance(reader, ChunkedRecordReader):
+            return cls.from_chunked_reader(reader)
+        logger = LoggerManager.get_logger(cls.__name__)
+        index = cls.load(filename)
+        if index is not None:
+            return index
+        logger.info(f'生成索引: {filename}')
+        index = cls.build(filename)
+        try:
+            index.save()
+        except OSError as e:
+            logger.warning(f'索引保存失败: {e}')
+        return index
+
+    def save(self):
+        arrays = {
+            'meta': np.asarray([self.VERSION, self.file_size, self.file_mtime_ns], dtype=np.int64),
+            'topics': np.asarray(list(self.topics.keys()), dtype=np.str_)
+        }
+        for i, columns in enumerate(self.topics.values()):
+            for key, value in columns.items():
+                arrays[f'{i}_{key}'] = value
+        # 先写临时文件再替换, 避免其他视图读到写了一半的索引
+        path = self.index_path(self.filename)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    def get_topics(self):
+        return list(self.topics.keys())
+
+    def frame_count(self, topic_name):
+        columns = self.topics.get(topic_name)
+        return 0 if columns is None else len(columns['offset'])
+
+    def get_frame(self, topic_name, frame_no):
+        columns = self.topics[topic_name]
+        return (float(columns['timestamp'][frame_no]),
+                int(columns['offset'][frame_no]),
+                int(columns['size'][frame_no]))
+
+    def get_timestamps(self, topic_name):
+        return self.topics[topic_name]['timestamp']
+
+    def find_frame(self, topic_name, timestamp):
+        # 返回时间戳最接近的帧号
+        return find_nearest_frame(self.topics[topic_name]['timestamp'], timestamp)
+
+class FrameCursor:
+    """
+    按帧顺序读取某个 topic, 支持直接跳转到指定帧或时间戳
+
+    index 提供 frame_count 和 find_frame (RecordIndex 或 ColumnarCache), 子类实现 read
+    """
+    def __init__(self, index, topic_name):
+        self.index = index
+        self.topic_name = topic_name
+        self.frame_no = 0
+
+    def frame_count(self):
+        return self.index.frame_count(self.topic_name)
+
+    def seek(self, frame_no):
+        self.frame_no = max(0, min(frame_no, self.frame_count()))
+
+    def seek_timestamp(self, timestamp):
+        # 跳到时间戳最接近的帧, 没有该 topic 时不移动
+        if self.frame_count() == 0:
+            return
+        self.seek(self.index.find_frame(self.topic_name, timestamp))
+
+    def read(self, frame_no):
+        raise NotImplementedError
+
+    def next(self):
+        if self.frame_no >= self.frame_count():
+            return None, None
+        timestamp, data = self.read(self.frame_no)
+        # 索引中的记录超出文件 (文件被截断) 时视为读完
+        if data is None:
+            return None, None
+        self.frame_no += 1
+        return timestamp, data
+
+    def close(self):
+        pass
+
+class RecordCursor(FrameCursor):
+    """按 RecordIndex 中的偏移从 reader 读取 .record 中某个 topic 的帧"""
+    def __init__(self, reader, index, topic_name):
+        super().__init__(index, topic_name)
+        self.reader = reader
+
+    def read(self, frame_no):
+        timestamp, data_offset, data_size = self.index.get_frame(self.topic_name, frame_no)
+        data = self.reader.read_at(data_offset, data_size)
+        return timestamp, data
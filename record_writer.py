@@ -0,0 +1,138 @@
+import os
+import time
+import threading
+from collections import deque
+import numpy as np
+from record_convert import RECORD_HEAD_STRUCT
+from record_index import RecordIndex
+from logger_manager import LoggerManager
+
+class RecordWriter:
+    """
+    把收到的消息按 .record 格式 (topic, NUL, 时间戳, 长度, 数据) 写入文件
+
+    接收线程只把消息放入有界队列, 由独立的写入线程成批取出并通过大缓冲区写盘,
+    磁盘变慢时只会让队列变长, 超过 max_queue_bytes 后丢弃新消息并计数, 不会阻塞接收.
+    写入时同步记录每帧的偏移和时间戳, 关闭时直接生成索引文件, 回放时不需要重新扫描
+    """
+    def __init__(self, filename, max_queue_bytes=256 << 20, buffer_size=8 << 20):
+        self.logger = LoggerManager.get_logger(self.__class__.__name__)
+        self.filename = filename
+        self.max_queue_bytes = max_queue_bytes
+        self.file = open(filename, 'wb', buffering=buffer_size)
+        self.condition = threading.Condition()
+        self.queue = deque()
+        # 队列中以及正在写入的数据量
+        self.queue_bytes = 0
+        self.closed = False
+        self.offset = 0
+        self.topic_heads = {}
+        self.entries = {}
+        self.written_count = 0
+        self.written_bytes = 0
+        self.dropped_count = 0
+        self.start_time = time.monotonic()
+        self.rate_samples = deque(maxlen=64)
+        self.thread = threading.Thread(target=self._run, name='RecordWriter', daemon=True)
+        self.thread.start()
+        self.logger.info(f'开始录制: {filename}')
+
+    def write(self, topic_name, timestamp, data) -> bool:
+        size = len(data)
+        with self.condition:
+            if self.closed:
+                return False
+            if self.queue_bytes + size > self.max_queue_bytes:
+                self.dropped_count += 1
+                return False
+            self.queue.append((topic_name, timestamp, data))
+            self.queue_bytes += size
+            self.condition.notify()
+        return True
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.queue and not self.closed:
+                    self.condition.wait()
+                if not self.queue:
+                    break
+                batch = list(self.queue)
+                self.queue.clear()
+            try:
+                batch_bytes = self._write_batch(batch)
+            except OSError as e:
+                self.logger.error(f'录制文件写入失败: {e}')
+                with self.condition:
+                    self.closed = True
+                    self.dropped_count += len(batch) + len(self.queue)
+                    self.queue.clear()
+                    self.queue_bytes = 0
+                break
+            with self.condition:
+                self.queue_bytes -= batch_bytes
+        self.file.close()
+
+    def _write_batch(self, batch):
+        batch_bytes = 0
+        for topic_name, timestamp, data in batch:
+            topic_head = self.topic_heads.get(topic_name)
+            if topic_head is None:
+                topic_head = self.topic_heads[topic_name] = topic_name.encode('utf-8') + b'\x00'
+            size = len(data)
+            self.file.write(topic_head + RECORD_HEAD_STRUCT.pack(timestamp, size))
+            self.file.write(data)
+            data_offset = self.offset + len(topic_head) + RECORD_HEAD_STRUCT.size
+            offsets, sizes, timestamps = self.entries.setdefault(topic_name, ([], [], []))
+            offsets.append(data_offset)
+            sizes.append(size)
+            timestamps.append(timestamp)
+            self.offset = data_offset + size
+            batch_bytes += size
+        self.file.flush()
+        self.written_count += len(batch)
+        self.written_bytes += batch_bytes
+        self.rate_samples.append((time.monotonic(), self.offset))
+        return batch_bytes
+
+    def close(self):
+        # 写完队列中剩余的消息, 生成索引并返回统计
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+        self._save_index()
+        stats = self.get_stats()
+        self.logger.info(f'结束录制: {self.filename}, {stats}')
+        return stats
+
+    def _save_index(self):
+        topics = {}
+        for topic_name, (offsets, sizes, timestamps) in self.entries.items():
+            topics[topic_name] = {
+                'offset': np.asarray(offsets, dtype=np.int64),
+                'size': np.asarray(sizes, dtype=np.uint32),
+                'timestamp': np.asarray(timestamps, dtype=np.float64)
+            }
+        stat = os.stat(self.filename)
+        try:
+            RecordIndex(self.filename, stat.st_size, stat.st_mtime_ns, topics).save()
+        except OSError as e:
+            self.logger.warning(f'索引保存失败: {e}')
+
+    def get_stats(self):
+        # 写入速度取最近约 1 秒内的样本计算
+        now = time.monotonic()
+        recent = [(t, offset) for t, offset in self.rate_samples if now - t <= 1.0]
+        rate = 0.0
+        if len(recent) >= 2 and recent[-1][0] > recent[0][0]:
+            rate = (recent[-1][1] - recent[0][1]) / (recent[-1][0] - recent[0][0])
+        elapsed = max(now - self.start_time, 1e-6)
+        return {
+            'written': self.written_count,
+            'written_mb': self.written_bytes / (1 << 20),
+            'dropped': self.dropped_count,
+            'queue_mb': self.queue_bytes / (1 << 20),
+            'rate_mb_s': rate / (1 << 20),
+            'mean_rate_mb_s': self.written_bytes / elapsed / (1 << 20)
+        }
@@ -0,0 +1,49 @@
+from PySide6.QtCore import QTimer
+from logger_manager import LoggerManager
+
+class RenderScheduler:
+    """
+    按固定的最大帧率刷新视图
+
+    发布线程只负责把数据放入视图的邮箱并把视图标记为有新数据,
+    定时器到期时只绘制有新数据的视图, 两次刷新之间到达的多帧只绘制最新的一帧
+    """
+    def __init__(self, max_fps=30):
+        self.logger = LoggerManager.get_logger(self.__class__.__name__)
+        self.views = []
+        self.max_fps = max_fps
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.tick)
+        self.set_max_fps(max_fps)
+
+    def set_max_fps(self, max_fps):
+        self.max_fps = max_fps
+        self.timer.setInterval(max(1, int(1000 / max_fps)))
+        self.logger.info(f'最大刷新帧率: {max_fps}')
+
+    def get_max_fps(self):
+        return self.max_fps
+
+    def register(self, view):
+        if view not in self.views:
+            self.views.append(view)
+            view.set_render_scheduler(self)
+
+    def unregister(self, view):
+        if view in self.views:
+            self.views.remove(view)
+            view.set_render_scheduler(None)
+
+    def start(self):
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def tick(self):
+        for view in self.views:
+            if view.is_dirty():
+                view.render()
+
+    def get_stats(self):
+        return {view.get_title(): view.get_render_stats() for view in self.views}
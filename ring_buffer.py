@@ -0,0 +1,59 @@
+import numpy as np
+
+class RingBuffer:
+    """
+    固定容量的多列环形缓冲区
+
+    每个样本同时写在 i 和 i + capacity 两个位置, 因此任意时刻最近的 n 个样本
+    在内存中都是连续的, get_column 返回的是不拷贝的连续视图
+    """
+    def __init__(self, capacity, columns, dtype=np.float64):
+        self.capacity = max(1, int(capacity))
+        self.columns = columns
+        self.data = np.zeros((columns, self.capacity * 2), dtype=dtype)
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def clear(self):
+        self.start = 0
+        self.size = 0
+
+    def append(self, row):
+        self.extend(np.asarray(row, dtype=self.data.dtype).reshape(self.columns, 1))
+
+    def extend(self, rows):
+        # rows: (columns, n)
+        count = rows.shape[1]
+        if count == 0:
+            return
+        if count > self.capacity:
+            rows = rows[:, -self.capacity:]
+            count = self.capacity
+        end = (self.start + self.size) % self.capacity
+        first = min(count, self.capacity - end)
+        for base in (end, end + self.capacity):
+            self.data[:, base:base + first] = rows[:, :first]
+        if first < count:
+            rest = count - first
+            self.data[:, :rest] = rows[:, first:]
+            self.data[:, self.capacity:self.capacity + rest] = rows[:, first:]
+        overflow = self.size + count - self.capacity
+        if overflow > 0:
+            self.start = (self.start + overflow) % self.capacity
+            self.size = self.capacity
+        else:
+            self.size += count
+
+    def drop_front(self, count):
+        count = min(count, self.size)
+        self.start = (self.start + count) % self.capacity
+        self.size -= count
+
+    def get_column(self, column):
+        return self.data[column, self.start:self.start + self.size]
+
+    def get_last(self, column):
+        return self.data[column, self.start + self.size - 1]
@@ -2,18 +2,25 @@ from enum import Enum
 from PySide6.QtCore import QObject, Signal, Slot, QTimer
 from PySide6.QtGui import QPixmap
 from PySide6.QtWidgets import QLabel, QWidget, QVBoxLayout
-from view_play_state import PlayStateMachine, PlayingState, PausedState, TerminateState, PlayStateEnum
+from view_play_state import PlayStateMachine, PlayingState, PausedState, TerminateState, ReversePlayingState, PlayStateEnum
 import pyqtgraph.opengl as gl
-from thread_task import LocalPlyPubTask, ZmqPlyPubTask, LocalImgPubTask, ZmqImgPubTask, LocalImuPubTask, ZmqImuPubTask
+from thread_task import LocalPlyPubTask, ZmqPlyPubTask, LocalImgPubTask, ZmqImgPubTask, ShmImgPubTask, LocalImuPubTask, ZmqImuPubTask
+from thread_task import DeliveryPolicy, FrameMailbox
+from process_task import ProcessPubTask
+from record_convert import LIDAR_TOPIC, IMG_TOPIC, IMU_TOPIC
 from enum import Enum
 from logger_manager import LoggerManager
 from typing import Dict, Optional
 import pyqtgraph as pg
+import numpy as np
 import time
+from collections import deque
+from minmax_pyramid import MinMaxPyramid
 
 class DataOriginType(Enum):
     FILE = 0
     NETWORK = 1
+    SHM = 2
 
 class SensorView:
     def __init__(self):
@@ -25,19 +32,99 @@ class SensorView:
         self.data_origin_type = DataOriginType.FILE
         self.ip = ""
         self.port = 0
+        # 本机共享内存数据源的名称, shm_supported 表示视图能否解码该数据源
+        self.shm_name = ""
+        self.shm_supported = False
         self.open_file_title = None
         self.open_file_filter = None
         self.logger = None
         self.view = None
         self.title = None
+        self.topic_name = None
+        # 网络数据是否按 [topic, 数据] 分帧, 分帧时只订阅本视图的 topic
+        self.use_topic_frame = False
         self.terminate_cb = None
+        self.update_func = None
+        # 发布线程到界面的投递策略, 默认只保留最新一帧
+        self.delivery_policy = DeliveryPolicy.LATEST_ONLY
+        self.mailbox_capacity = 1
+        self.mailbox = FrameMailbox(self.delivery_policy, self.mailbox_capacity)
+        # 绘制由 RenderScheduler 统一调度, 未注册时收到数据立即绘制
+        self.render_scheduler = None
+        self.dirty = False
+        self.render_times = deque(maxlen=120)
+        self.skipped_frames = 0
+        self.redraw_requested = False
+        # 主窗口的主时钟, 设置后文件回放任务都跟随它播放
+        self.master_clock = None
+        self.reverse_supported = True
+        # 本地文件的发布任务是否放到独立进程中运行, process_task_name 为空表示不支持
+        self.process_task_name = None
+        self.use_process = False
+        # 录制网络数据的 RecordWriter, 为 None 表示未录制
+        self.recorder = None
+
+    def set_master_clock(self, master_clock):
+        # 对下一次创建的发布任务生效
+        self.master_clock = master_clock
+        if master_clock:
+            self.speed = master_clock.speed
+
+    def set_recorder(self, recorder):
+        # 只录制网络数据, 本地文件和共享内存数据源不录制
+        self.recorder = recorder
+        if self.pub_task and self.data_origin_type == DataOriginType.NETWORK:
+            self.pub_task.set_recorder(recorder, self.topic_name)
+
+    def set_process_mode(self, enabled):
+        # 对下一次创建的发布任务生效
+        if enabled and self.process_task_name is None:
+            self.logger.error('当前视图不支持独立进程解码')
+            return False
+        self.use_process = enabled
+        return True
+
+    def create_local_task(self, task_class, filename):
+        if self.use_process:
+            return ProcessPubTask(self.process_task_name, filename)
+        return task_class(filename)
+
+    def set_render_scheduler(self, render_scheduler):
+        self.render_scheduler = render_scheduler
+
+    def is_dirty(self):
+        return self.dirty
+
+    def get_render_stats(self):
+        # 最近一秒内的绘制次数即为当前绘制帧率
+        now = time.monotonic()
+        fps = sum(1 for t in self.render_times if now - t <= 1.0)
+        # 跳过的帧: 一次取出多帧时没有绘制的、邮箱满时被挤掉的、回放迟到被丢弃的
+        skipped = self.skipped_frames + self.mailbox.dropped_count
+        if self.pub_task is not None:
+            skipped += self.pub_task.late_dropped
+        return {'fps': fps, 'skipped': skipped}
+
+    def get_stream_stats(self):
+        # 只有网络数据源统计端到端延迟和丢帧
+        if self.pub_task is None or self.data_origin_type != DataOriginType.NETWORK:
+            return None
+        return self.pub_task.get_stream_stats()
+
+    def set_delivery_policy(self, policy, capacity=1):
+        # 对下一次创建的发布任务生效
+        self.delivery_policy = policy
+        self.mailbox_capacity = capacity
+
+    def get_delivery_stats(self):
+        return self.mailbox.get_stats()
 
     def get_file_title_filter(self):
         return self.open_file_title, self.open_file_filter
 
     def set_speed(self, speed):
+        self.speed = speed
         if self.pub_task:
-            self.speed = speed
             self.pub_task.set_speed(speed)
 
     def get_speed_options(self):
@@ -80,6 +167,10 @@ class SensorView:
             if not self.ip or not self.port:
                 self.logger.error('网络连接信息不完整')
                 return False
+        elif self.data_origin_type == DataOriginType.SHM:
+            if not self.shm_name:
+                self.logger.error('共享内存名称为空')
+                return False
         else:
             self.logger.error('数据源类型不正确')
             return False
@@ -90,6 +181,34 @@ class SensorView:
         self.pub_task.set_play_state(PlayStateEnum.PLAYING)
         return True
 
+    def reverse(self):
+        # 倒放只支持本地文件, 倒放中再次调用切换回正向播放
+        if self.data_origin_type != DataOriginType.FILE or not self.reverse_supported:
+            self.logger.error('当前视图不支持倒放')
+            return False
+        if self.pub_task is None:
+            if not self.filename:
+                self.logger.error('文件路径不正确')
+                return False
+            self.init_pub_task(DataOriginType.FILE)
+        self.state_machine.reverse_control()
+        self.pub_task.set_play_state(self.state_machine.state.state_enum)
+        return True
+
+    # 时间轴跳转和单步, 只对本地文件有效
+    def seek_frame(self, frame_no):
+        if self.pub_task and self.data_origin_type == DataOriginType.FILE:
+            self.pub_task.seek_frame(frame_no)
+
+    def step_frame(self, delta):
+        if self.pub_task and self.data_origin_type == DataOriginType.FILE:
+            self.pub_task.step_frame(delta)
+
+    def get_position(self):
+        if self.pub_task and self.data_origin_type == DataOriginType.FILE:
+            return self.pub_task.get_position()
+        return None
+
     def terminate_cb_register(self, cb):
         self.terminate_cb = cb
 
@@ -110,17 +229,62 @@ class SensorView:
 
     def init_pub_task(self, data_origin_type):
         if data_origin_type == DataOriginType.FILE:
-            self.load_local_file(self.filename)
             self.set_data_origin_type(DataOriginType.FILE)
+            self.load_local_file(self.filename)
         elif data_origin_type == DataOriginType.NETWORK:
-            self.connect_network(self.ip, self.port)
             self.set_data_origin_type(DataOriginType.NETWORK)
+            self.connect_network(self.ip, self.port)
+        elif data_origin_type == DataOriginType.SHM:
+            self.set_data_origin_type(DataOriginType.SHM)
+            self.connect_shm(self.shm_name)
 
     def _init_pub_task(self, task, update_func):
         self.pub_task = task
-        self.pub_task.start()
-        self.pub_task.data_ready.connect(update_func)
+        self.update_func = update_func
+        if self.master_clock and self.data_origin_type == DataOriginType.FILE:
+            self.pub_task.set_clock(self.master_clock)
+        if self.recorder and self.data_origin_type == DataOriginType.NETWORK:
+            self.pub_task.set_recorder(self.recorder, self.topic_name)
+        self.mailbox = FrameMailbox(self.delivery_policy, self.mailbox_capacity)
+        self.pub_task.set_mailbox(self.mailbox)
+        self.pub_task.data_ready.connect(self.sig_data_ready_func)
         self.pub_task.task_finished.connect(self.sig_task_finished_func)
+        self.pub_task.start()
+
+    def sig_data_ready_func(self):
+        self.dirty = True
+        if self.render_scheduler is None:
+            self.render()
+
+    def request_redraw(self):
+        # 没有新数据但显示需要刷新时 (如平移缩放), 在下一次调度时重绘
+        self.redraw_requested = True
+        self.sig_data_ready_func()
+
+    def render(self):
+        # 一次取空邮箱, 之后再放入的数据会重新触发通知
+        self.dirty = False
+        frames = []
+        frame = self.mailbox.take()
+        while frame is not None:
+            frames.append(frame)
+            frame = self.mailbox.take()
+        if frames:
+            self.render_frames(frames)
+        elif self.redraw_requested:
+            self.redraw()
+        else:
+            return
+        self.redraw_requested = False
+        self.render_times.append(time.monotonic())
+
+    def redraw(self):
+        pass
+
+    def render_frames(self, frames):
+        # 默认只绘制最新的一帧, 其余帧计入跳过数
+        self.skipped_frames += len(frames) - 1
+        self.update_func(*frames[-1])
 
     def set_data_origin_type(self, data_origin_type):
         self.data_origin_type = data_origin_type
@@ -128,13 +292,27 @@ class SensorView:
     def get_current_state(self):
         return self.state_machine.state
 
-    def start_connect_network(self, host, port):
+    def start_connect_network(self, host, port, use_topic_frame=False):
         if self.pub_task:
             self.terminate()
         self.ip = host
         self.port = port
+        self.use_topic_frame = use_topic_frame
         self.init_pub_task(DataOriginType.NETWORK)
 
+    def start_connect_shm(self, shm_name):
+        if not self.shm_supported:
+            self.logger.error('当前视图不支持共享内存数据源')
+            return False
+        if self.pub_task:
+            self.terminate()
+        self.shm_name = shm_name
+        self.init_pub_task(DataOriginType.SHM)
+        return True
+
+    def get_network_topic(self):
+        return self.topic_name if self.use_topic_frame else None
+
     def get_view(self):
         return self.view
 
@@ -147,6 +325,9 @@ class SensorView:
     def connect_network(self, host, port):
         raise NotImplementedError
 
+    def connect_shm(self, shm_name):
+        raise NotImplementedError
+
     def load_local_file(self, filename):
         raise NotImplementedError
 
@@ -157,45 +338,68 @@ class SensorPointCloudView(SensorView):
         self.view = gl.GLViewWidget()
         self.grid = gl.GLGridItem()
         self.view.addItem(self.grid)
+
+        # 散点图元只创建一次, 每帧通过 setData 更新, 坐标和颜色写入预分配的缓冲区
+        self.scatter = gl.GLScatterPlotItem(pos=np.zeros((0, 3), dtype=np.float32), size=0.5, pxMode=True)
+        self.view.addItem(self.scatter)
+        self.pos_buffer = np.zeros((0, 3), dtype=np.float32)
+        self.color_buffer = np.zeros((0, 3), dtype=np.float32)
+
+        # 最近若干帧的绘制耗时 (秒)
+        self.frame_times = deque(maxlen=100)
         self.open_file_title = "打开点云文件"
         self.open_file_filter = "点云文件 (*.pcd *.ply);;所有文件 (*.*)"
         self.title = "point_cloud"
+        self.process_task_name = 'lidar'
+        self.topic_name = LIDAR_TOPIC
         self.speed_options = [("0.5x", 0.5), ("1.0x", 1.0), ("1.5x", 1.5), ("2.0x", 2.0)]
 
     def load_local_file(self, filename):
         try:
-            self._init_pub_task(LocalPlyPubTask(filename), self.update_point_cloud)
+            self._init_pub_task(self.create_local_task(LocalPlyPubTask, filename), self.update_point_cloud)
         except Exception as e:
             self.logger.error(f'加载本地文件失败: {e}')
 
     def connect_network(self, host, port):
         try:
-            self._init_pub_task(ZmqPlyPubTask(host, port), self.update_point_cloud)
+            self._init_pub_task(ZmqPlyPubTask(host, port, self.get_network_topic()), self.update_point_cloud)
         except Exception as e:
             self.logger.error(f'连接网络失败: {e}')
 
     def clear_view(self):
-        # self.view.clear()
-        # self.view.addItem(self.grid)
-        pass
+        self.scatter.setData(pos=self.pos_buffer[:0], color=self.color_buffer[:0])
+        self.frame_times.clear()
+
+    def _reserve_buffers(self, count):
+        # 容量不足时按 1.5 倍扩容, 点数变化不大时一直复用同一块内存
+        if count <= len(self.pos_buffer):
+            return
+        capacity = max(count, int(len(self.pos_buffer) * 1.5))
+        self.pos_buffer = np.zeros((capacity, 3), dtype=np.float32)
+        self.color_buffer = np.zeros((capacity, 3), dtype=np.float32)
 
     def update_point_cloud(self, points, colors, st):
         try:
-            self.view.clear()
-            self.view.addItem(self.grid)
-            scatter = gl.GLScatterPlotItem(
-                pos=points,
-                color=colors,
-                size=0.5,
-                pxMode=True
-            )
-            self.view.addItem(scatter)
+            start = time.perf_counter()
+            count = len(points)
+            self._reserve_buffers(count)
+            pos = self.pos_buffer[:count]
+            color = self.color_buffer[:count]
+            np.copyto(pos, points, casting='unsafe')
+            np.copyto(color, colors, casting='unsafe')
+            self.scatter.setData(pos=pos, color=color)
 
             # 调整视角
             # self.view.setCameraPosition(distance=40)
+            self.frame_times.append(time.perf_counter() - start)
         except Exception as e:
             self.logger.error(f'绘制点云失败: {e}')
 
+    def get_frame_time_ms(self):
+        if not self.frame_times:
+            return 0.0
+        return sum(self.frame_times) / len(self.frame_times) * 1000
+
 class SensorImageView(SensorView):
     def __init__(self):
         super().__init__()
@@ -205,20 +409,29 @@ class SensorImageView(SensorView):
         self.view = QLabel()
         self.view.setStyleSheet("background-color: black;")
         self.title = "image"
+        self.shm_supported = True
+        self.process_task_name = 'image'
+        self.topic_name = IMG_TOPIC
         self.speed_options = [("0.5x", 0.5), ("1.0x", 1.0), ("1.5x", 1.5), ("2.0x", 2.0)]
 
     def load_local_file(self, filename):
         try:
-            self._init_pub_task(LocalImgPubTask(filename), self.update_image)
+            self._init_pub_task(self.create_local_task(LocalImgPubTask, filename), self.update_image)
         except Exception as e:
             self.logger.error(f'加载本地文件失败: {e}')
 
     def connect_network(self, host, port):
         try:
-            self._init_pub_task(ZmqImgPubTask(host, port), self.update_image)
+            self._init_pub_task(ZmqImgPubTask(host, port, self.get_network_topic()), self.update_image)
         except Exception as e:
             self.logger.error(f'连接网络失败: {e}')
 
+    def connect_shm(self, shm_name):
+        try:
+            self._init_pub_task(ShmImgPubTask(shm_name), self.update_image)
+        except Exception as e:
+            self.logger.error(f'连接共享内存失败: {e}')
+
     def clear_view(self):
         pass
 
@@ -247,17 +460,17 @@ class SensorImuView(SensorView):
         self.layout.addWidget(self.acc_plot)
         self.layout.addWidget(self.gyro_plot)
 
-        # 数据缓存
-        self.timestamps = []
-        self.acc_data = [[], [], []]  # x, y, z
-        self.gyro_data = [[], [], []]  # x, y, z
-
-        # 更新计数器
-        self.update_counter = 0
-        self.max_update_counter = 20
-
         # 设置显示的时间范围（例如最近10秒的数据）
         self.display_time_range = 5  # 单位：秒
+        # 显示范围之外额外保留的历史数据时长, 以及按最高采样率估算的缓存容量
+        self.history_time_range = 5  # 单位：秒
+        self.max_sample_rate = 1000  # 单位：Hz
+
+        # 数据缓存: 时间戳, 加速度 x/y/z, 角速度 x/y/z; 原始样本之外按多级最小/最大值包络保留长时间历史
+        self.imu_pyramid = None
+        self.imu_buffer = None
+        self._init_imu_buffer()
+        self._updating_plots = False
 
         # 自动范围调整标志位
         self.auto_range_enabled = True
@@ -271,10 +484,19 @@ class SensorImuView(SensorView):
         self.open_file_title = "打开IMU数据文件"
         self.open_file_filter = "IMU数据文件 (*.record);;所有文件 (*.*)"
         self.title = "imu"
+        self.topic_name = IMU_TOPIC
         self.speed_options = [("0.5x", 0.5), ("1.0x", 1.0), ("1.5x", 1.5), ("2.0x", 2.0)]
 
+        # IMU 每个样本都要画出来, 保留一段队列, 只有界面长时间跟不上时才丢弃最旧的样本
+        self.set_delivery_policy(DeliveryPolicy.DROP_OLDEST, 2000)
+        # 曲线按时间追加, 倒放没有意义
+        self.reverse_supported = False
+
         self.acc_plot.getPlotItem().vb.sigRangeChangedManually.connect(self.auto_range_disable)
         self.gyro_plot.getPlotItem().vb.sigRangeChangedManually.connect(self.auto_range_disable)
+        # 平移缩放后按新的可见范围重新选择包络层级
+        self.acc_plot.getPlotItem().vb.sigXRangeChanged.connect(self.sig_x_range_changed_func)
+        self.gyro_plot.getPlotItem().vb.sigXRangeChanged.connect(self.sig_x_range_changed_func)
 
     def _create_plot(self, title, labels):
         plot = pg.PlotWidget(title=title)
@@ -298,15 +520,23 @@ class SensorImuView(SensorView):
 
     def connect_network(self, host, port):
         try:
-            self._init_pub_task(ZmqImuPubTask(host, port), self.update_imu_data)
+            self._init_pub_task(ZmqImuPubTask(host, port, self.get_network_topic()), self.update_imu_data)
         except Exception as e:
             self.logger.error(f'连接网络失败: {e}')
 
+    def _init_imu_buffer(self):
+        capacity = int((self.display_time_range + self.history_time_range) * self.max_sample_rate)
+        self.imu_pyramid = MinMaxPyramid(6, capacity)
+        self.imu_buffer = self.imu_pyramid.raw
+
+    def set_history_time_range(self, history_time_range, max_sample_rate=None):
+        self.history_time_range = history_time_range
+        if max_sample_rate:
+            self.max_sample_rate = max_sample_rate
+        self._init_imu_buffer()
+
     def clear_view(self):
-        self.timestamps.clear()
-        for data_list in [self.acc_data, self.gyro_data]:
-            for sublist in data_list:
-                sublist.clear()
+        self.imu_pyramid.clear()
 
     def auto_range_enable(self):
         self.auto_range_enabled = True
@@ -317,37 +547,61 @@ class SensorImuView(SensorView):
         self.auto_range_timer.start(3000)
 
     def update_imu_data(self, acc, gyro, st):
+        self._append_imu_samples(np.array([[st], [acc[0]], [acc[1]], [acc[2]], [gyro[0]], [gyro[1]], [gyro[2]]]))
+
+    def _append_imu_samples(self, samples):
+        # samples: (7, n), 依次为时间戳、加速度、角速度
         try:
-            self.timestamps.append(st)
-            for i in range(3):
-                self.acc_data[i].append(acc[i])
-                self.gyro_data[i].append(gyro[i])
-
-            self.update_counter += 1
-            # 每收到 10 次数据更新一次图表
-            if self.update_counter >= self.max_update_counter:
-                self._update_plots()
-                self.update_counter = 0  # 重置计数器
+            # 时间戳回退 (跳转或重新播放) 时丢弃旧数据
+            if len(self.imu_buffer) and samples[0, 0] < self.imu_buffer.get_last(0):
+                self.imu_pyramid.clear()
+            self.imu_pyramid.extend(samples)
+
+            # 只保留显示范围加历史时长内的数据
+            timestamps = self.imu_buffer.get_column(0)
+            oldest = timestamps[-1] - self.display_time_range - self.history_time_range
+            self.imu_buffer.drop_front(int(np.searchsorted(timestamps, oldest)))
         except Exception as e:
             self.logger.error(f'更新IMU数据失败: {e}')
 
-    def _update_plots(self):
-        try:
-            for i, plot_item in enumerate(self.acc_plot.listDataItems()):
-                plot_item.setData(self.timestamps, self.acc_data[i])
+    def render_frames(self, frames):
+        # IMU 的每个样本都要保留, 全部写入缓存后只重绘一次图表
+        samples = np.array([[st, *acc, *gyro] for acc, gyro, st in frames], dtype=np.float64).T
+        self._append_imu_samples(samples)
+        self._update_plots()
+
+    def sig_x_range_changed_func(self, *args):
+        if not self._updating_plots:
+            self.request_redraw()
+
+    def redraw(self):
+        self._update_plots()
 
-            for i, plot_item in enumerate(self.gyro_plot.listDataItems()):
-                plot_item.setData(self.timestamps, self.gyro_data[i])
+    def _update_plot(self, plot, channel_offset):
+        # 只绘制可见范围内的数据, 层级按像素宽度选择, 每个像素最多两个点
+        vb = plot.getPlotItem().vb
+        (t0, t1), _ = vb.viewRange()
+        level, x, ys = self.imu_pyramid.get_envelope(t0, t1, max(2, int(vb.width()) * 2))
+        for i, plot_item in enumerate(plot.listDataItems()):
+            plot_item.setData(x, ys[channel_offset + i])
 
+    def _update_plots(self):
+        self._updating_plots = True
+        try:
             # 设置x轴显示范围为最近的 display_time_range 秒
-            if self.timestamps and self.auto_range_enabled:
-                self.acc_plot.setXRange(max(self.timestamps[-1] - self.display_time_range, 0), self.timestamps[-1])
-                self.gyro_plot.setXRange(max(self.timestamps[-1] - self.display_time_range, 0), self.timestamps[-1])
+            timestamps = self.imu_buffer.get_column(0)
+            if len(timestamps) and self.auto_range_enabled:
+                self.acc_plot.setXRange(max(timestamps[-1] - self.display_time_range, 0), timestamps[-1])
+                self.gyro_plot.setXRange(max(timestamps[-1] - self.display_time_range, 0), timestamps[-1])
                 self.acc_plot.enableAutoRange(axis='y')
                 self.gyro_plot.enableAutoRange(axis='y')
 
+            self._update_plot(self.acc_plot, 0)
+            self._update_plot(self.gyro_plot, 3)
         except Exception as e:
             self.logger.error(f'更新图表失败: {e}')
+        finally:
+            self._updating_plots = False
 
 class SensorViewManager:
     def __init__(self):
@@ -368,6 +622,9 @@ class SensorViewManager:
         for view in self._views:
             view.terminate_cb_register(cb)
 
+    def get_views(self) -> list:
+        return list(self._views)
+
     def get_view_names(self) -> list:
         return [view.get_title() for view in self._views]
 
@@ -384,6 +641,14 @@ class SensorViewManager:
     def get_current_view(self) -> Optional[SensorView]:
         return self._current_view
 
+    def set_master_clock(self, master_clock):
+        for view in self._views:
+            view.set_master_clock(master_clock)
+
+    def set_recorder(self, recorder):
+        for view in self._views:
+            view.set_recorder(recorder)
+
     def terminate_all(self):
         for view in self._views:
             view.terminate()
\ No newline at end of file
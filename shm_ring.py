@@ -0,0 +1,107 @@
+import weakref
+import numpy as np
+from multiprocessing import shared_memory
+from PySide6.QtGui import QImage
+
+SLOT_ALIGN = 64
+
+class _SlotHandle:
+    # 同一槽位的所有数组和图像共同引用它, 全部释放后它才被回收
+    pass
+
+def _keep_alive(*args):
+    pass
+
+class SharedFrameRing:
+    """
+    跨进程传递解码结果的共享内存环
+
+    共享内存按固定大小划分为若干槽位, 生产进程把一帧中的数组 (点、颜色、RGB 图像)
+    写入一个空闲槽位, 只通过队列发送槽位号和数组布局. 读取端直接在共享内存上构造
+    numpy 数组, 不拷贝; 这些数组全部释放后槽位才交还给生产进程复用.
+    QImage 从槽位拷贝一份自己持有的内存, 它的隐式共享拷贝不受槽位复用的影响.
+    不是数组的值 (时间戳、相机号等) 以及放不下的数组随布局一起经队列传递
+    """
+    def __init__(self, slots, slot_size, name=None):
+        self.slots = slots
+        self.slot_size = slot_size
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_size)
+        else:
+            # spawn 出的子进程与创建方共用 resource_tracker, 由创建方负责删除
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+
+    def write_frame(self, slot, frame):
+        """
+        把一帧写入槽位, 返回布局列表
+
+        写入共享内存的数组为 ('shared', 类型, dtype, shape, 偏移, 附加信息),
+        槽位放不下的数组为 ('copy', 类型, 数组, 附加信息), 其余值为 ('value', 值)
+        """
+        buffer = self.shm.buf
+        base = slot * self.slot_size
+        layout = []
+        offset = 0
+        for item in frame:
+            kind, extra = 'array', None
+            if isinstance(item, QImage):
+                kind, extra = 'qimage', (item.width(), item.format().value)
+                item = np.frombuffer(item.constBits(), dtype=np.uint8,
+                                     count=item.sizeInBytes()).reshape(item.height(), item.bytesPerLine())
+            if not isinstance(item, np.ndarray):
+                layout.append(('value', item))
+            elif offset + item.nbytes > self.slot_size:
+                layout.append(('copy', kind, item.copy(), extra))
+            else:
+                target = np.ndarray(item.shape, dtype=item.dtype, buffer=buffer, offset=base + offset)
+                target[...] = item
+                layout.append(('shared', kind, item.dtype.str, item.shape, offset, extra))
+                offset += -(-item.nbytes // SLOT_ALIGN) * SLOT_ALIGN
+        return layout
+
+    def read_frame(self, slot, layout, release):
+        """
+        按布局在槽位上构造帧, 帧中共享内存上的数组全部释放后调用 release(slot)
+
+        numpy 数组通过 base 引用槽位上的视图, 引用计数能覆盖所有派生的数组;
+        QImage 的拷贝 (QPixmap、跨线程信号等) 在 Python 之外, 不能依赖 Python 对象的生命周期,
+        因此图像拷贝到 QImage 自己的内存中, 不占用槽位
+        """
+        buffer = self.shm.buf
+        base = slot * self.slot_size
+        handle = _SlotHandle()
+        frame = []
+        for entry in layout:
+            if entry[0] == 'value':
+                frame.append(entry[1])
+                continue
+            if entry[0] == 'copy':
+                _, kind, array, extra = entry
+            else:
+                _, kind, dtype, shape, offset, extra = entry
+                array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=buffer, offset=base + offset)
+            if kind == 'qimage':
+                width, image_format = extra
+                item = QImage(array.data, width, array.shape[0], array.shape[1], QImage.Format(image_format)).copy()
+            else:
+                item = array
+                weakref.finalize(item, _keep_alive, handle)
+            frame.append(item)
+        weakref.finalize(handle, release, slot)
+        return tuple(frame)
+
+    def close(self):
+        try:
+            self.shm.close()
+        except BufferError:
+            # 仍有帧在显示, 映射在这些数组释放后由系统回收
+            pass
+
+    def unlink(self):
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,85 @@
+import os
+import sys
+import struct
+from contextlib import contextmanager
+from multiprocessing import shared_memory, resource_tracker
+
+# 共享内存段布局: 64 字节头 (序号 u64, 数据长度 u64), 之后是一帧数据 (如 shm_img_t)
+SHM_HEAD_STRUCT = struct.Struct('<QQ')
+SHM_HEAD_SIZE = 64
+
+class ShmFrameReader:
+    """
+    共享内存数据源的读取端, 按顺序锁 (seqlock) 保证读到完整的一帧
+
+    写入端写数据前把序号加一变为奇数, 写完再加一变为偶数. 读取端记下偶数序号后直接在
+    共享内存上解码, 解码完成后序号未变才说明这一帧没有被改写, 否则丢弃结果重试.
+    整个过程不拷贝原始数据, 也不需要跨进程的锁
+    """
+    def __init__(self, name, retries=3):
+        self.name = name
+        self.retries = retries
+        # 共享内存段由数据源创建和删除. Python 3.13 之前 POSIX 上只是打开已有的段也会登记到本进程的
+        # resource_tracker, 本进程退出时它会把段删除 (数据源之后的帧就没人能读到) 并报告泄漏,
+        # 因此读取端不登记或打开后立即取消登记
+        if sys.version_info >= (3, 13):
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            if os.name == 'posix':
+                # 登记的是带前导 '/' 的系统名称, shm.name 中已去掉
+                resource_tracker.unregister('/' + self.shm.name.lstrip('/'), 'shared_memory')
+        _, self.payload_size = SHM_HEAD_STRUCT.unpack_from(self.shm.buf, 0)
+        self.payload = self.shm.buf[SHM_HEAD_SIZE:SHM_HEAD_SIZE + self.payload_size]
+        self.last_seq = 0
+        self.torn_count = 0
+
+    def read_seq(self):
+        return SHM_HEAD_STRUCT.unpack_from(self.shm.buf, 0)[0]
+
+    def has_new_frame(self):
+        seq = self.read_seq()
+        return seq != self.last_seq and seq % 2 == 0
+
+    def read(self, decode_func):
+        # 有新的一帧时返回 decode_func(数据) 的结果, 没有新帧或多次重试仍被改写时返回 None
+        for _ in range(self.retries):
+            seq = self.read_seq()
+            if seq == self.last_seq or seq % 2:
+                return None
+            result = decode_func(self.payload)
+            if self.read_seq() == seq:
+                self.last_seq = seq
+                return result
+            self.torn_count += 1
+        return None
+
+    def close(self):
+        self.payload.release()
+        self.shm.close()
+
+class ShmFrameWriter:
+    """共享内存数据源的写入端, 用于本地测试的模拟数据源"""
+    def __init__(self, name, payload_size):
+        self.name = name
+        self.payload_size = payload_size
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=SHM_HEAD_SIZE + payload_size)
+        self.seq = 0
+        SHM_HEAD_STRUCT.pack_into(self.shm.buf, 0, self.seq, payload_size)
+        self.payload = self.shm.buf[SHM_HEAD_SIZE:SHM_HEAD_SIZE + payload_size]
+
+    @contextmanager
+    def frame(self):
+        # with writer.frame() as payload: 在 payload 上就地写入一帧
+        self.seq += 1
+        SHM_HEAD_STRUCT.pack_into(self.shm.buf, 0, self.seq, self.payload_size)
+        try:
+            yield self.payload
+        finally:
+            self.seq += 1
+            SHM_HEAD_STRUCT.pack_into(self.shm.buf, 0, self.seq, self.payload_size)
+
+    def close(self):
+        self.payload.release()
+        self.shm.close()
+        self.shm.unlink()
@@ -0,0 +1,100 @@
+import time
+import threading
+import numpy as np
+from collections import deque
+
+class StreamStats:
+    """
+    网络数据流的端到端延迟和丢帧统计
+
+    延迟为接收端解码完成的时刻减去消息中的 stamp, 只有发送端用同一台机器的 time.time()
+    填写 stamp 时才有意义 (例如 test/zmq_sensor_publisher.py).
+    消息带序号 (IMU 的 id, 图像的 frame_id) 时按序号的跳变计算丢帧;
+    没有序号时 (点云) 按相邻 stamp 的间隔估计: 间隔超过近期间隔中位数的 gap_factor 倍时,
+    按间隔与中位数之比计算中间丢失的帧数, 要求发送端的帧间隔比较均匀.
+    收到但按投递策略不解码的消息以 decoded=False 计入, 不算丢帧; 接收端开启 CONFLATE 时
+    zmq 只保留最新一条, 跳变分不清是网络丢帧还是主动合并, 计为 conflated, 不再统计丢帧
+    """
+    def __init__(self, stats_size=1000, interval_size=100, gap_factor=1.5):
+        self.latencies = deque(maxlen=stats_size)
+        self.intervals = deque(maxlen=interval_size)
+        self.gap_factor = gap_factor
+        self.lock = threading.Lock()
+        self.received = 0
+        self.lost = 0
+        self.skipped = 0
+        self.conflated = 0
+        self.conflate = False
+        self.last_stamp = None
+        self.last_seq = None
+
+    def set_conflate(self, conflate):
+        with self.lock:
+            self.conflate = conflate
+
+    def reset(self):
+        with self.lock:
+            self.latencies.clear()
+            self.intervals.clear()
+            self.received = 0
+            self.lost = 0
+            self.skipped = 0
+            self.conflated = 0
+            self.last_stamp = None
+            self.last_seq = None
+
+    def add(self, stamp, seq=None, receive_time=None, decoded=True):
+        if receive_time is None:
+            receive_time = time.time()
+        with self.lock:
+            self.received += 1
+            # 延迟只统计解码完成的消息
+            if decoded:
+                self.latencies.append(receive_time - stamp)
+            else:
+                self.skipped += 1
+            if seq is not None:
+                last_seq, self.last_seq = self.last_seq, seq
+                # 序号回退时 (发送端重启或计数回绕) 重新开始计数
+                if last_seq is not None and seq > last_seq:
+                    self._add_gap(seq - last_seq - 1)
+                return
+            last_stamp, self.last_stamp = self.last_stamp, stamp
+            if last_stamp is None:
+                return
+            interval = stamp - last_stamp
+            # 时间戳回退或重复时 (发送端重启等) 重新估计帧间隔
+            if interval <= 0:
+                self.intervals.clear()
+                return
+            if len(self.intervals) >= 10:
+                median = float(np.median(self.intervals))
+                if interval > median * self.gap_factor:
+                    self._add_gap(int(round(interval / median)) - 1)
+                    return
+            self.intervals.append(interval)
+
+    def _add_gap(self, count):
+        # 调用方需持有 self.lock
+        if self.conflate:
+            self.conflated += count
+        else:
+            self.lost += count
+
+    def get_stats(self):
+        with self.lock:
+            latencies = np.asarray(self.latencies) * 1000
+            received, lost = self.received, self.lost
+            skipped, conflated, conflate = self.skipped, self.conflated, self.conflate
+        stats = {
+            'received': received,
+            'lost': lost,
+            'loss_rate': lost / (received + lost) if received + lost else 0.0,
+            'loss_measured': not conflate,
+            'skipped': skipped,
+            'conflated': conflated
+        }
+        if len(latencies) == 0:
+            return dict(stats, p50_ms=0.0, p90_ms=0.0, p99_ms=0.0, max_ms=0.0)
+        p50, p90, p99 = np.percentile(latencies, (50, 90, 99))
+        return dict(stats, p50_ms=float(p50), p90_ms=float(p90), p99_ms=float(p99), max_ms=float(latencies.max()))
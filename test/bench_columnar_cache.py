@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+import shutil
+import struct
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from record_convert import (LidarData, ImuData, sensorPointCloudData, imuMetaData, LIDAR_TOPIC, IMU_TOPIC,
+                            LIDAR_HEAD_STRUCT)
+from record_chunked import open_record_reader
+from record_index import RecordIndex
+from record_columnar import ColumnarCache
+
+def write_record(f, topic_name, timestamp, payload):
+    f.write(topic_name.encode('utf-8') + b'\x00' + struct.pack('<dI', timestamp, len(payload)) + payload)
+
+# 生成测试用的录制文件: 点云 10Hz, IMU 200Hz
+def make_record_file(filename, seconds, points):
+    lidar_payload = bytearray(sensorPointCloudData())
+    imu_payload = bytes(imuMetaData())
+    with open(filename, 'wb') as f:
+        for i in range(int(seconds * 200)):
+            timestamp = i / 200
+            if i % 20 == 0:
+                LIDAR_HEAD_STRUCT.pack_into(lidar_payload, 0, timestamp, 1, points)
+                write_record(f, LIDAR_TOPIC, timestamp, lidar_payload)
+            write_record(f, IMU_TOPIC, timestamp, imu_payload)
+
+def bench_record(filename, seeks, rng):
+    # 打开 (读取已有索引) 后随机跳转解码点云, 再逐条解析全部 IMU
+    t0 = time.perf_counter()
+    index = RecordIndex.load_or_build(filename)
+    reader = open_record_reader(filename)
+    open_time = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for frame_no in rng.integers(0, index.frame_count(LIDAR_TOPIC), seeks):
+        _, offset, size = index.get_frame(LIDAR_TOPIC, frame_no)
+        LidarData.get_lidar_points_np(reader.read_at(offset, size))
+    seek_time = (time.perf_counter() - t0) / seeks
+    t0 = time.perf_counter()
+    entries = index.topics[IMU_TOPIC]
+    imu = np.array([ImuData.get_imu_data(reader.read_at(int(offset), int(size)))
+                    for offset, size in zip(entries['offset'], entries['size'])])
+    imu_time = time.perf_counter() - t0
+    reader.close()
+    return open_time, seek_time, imu_time, len(imu)
+
+def bench_cache(filename, seeks, rng):
+    t0 = time.perf_counter()
+    cache = ColumnarCache.load(filename)
+    open_time = time.perf_counter() - t0
+    decoder = cache.get_decoder(LIDAR_TOPIC)
+    t0 = time.perf_counter()
+    for frame_no in rng.integers(0, cache.frame_count(LIDAR_TOPIC), seeks):
+        _, data = cache.read(LIDAR_TOPIC, int(frame_no))
+        decoder(data)
+    seek_time = (time.perf_counter() - t0) / seeks
+    t0 = time.perf_counter()
+    columns = cache.get_columns(IMU_TOPIC)
+    acc, gyro = np.array(columns['acc']), np.array(columns['gyro'])
+    imu_time = time.perf_counter() - t0
+    return open_time, seek_time, imu_time, len(acc)
+
+def main():
+    parser = argparse.ArgumentParser(description='对比直接读取 .record 与读取列式缓存的打开、跳转和 IMU 加载耗时')
+    parser.add_argument('--file', help='已有的 .record 文件, 不指定时生成临时文件')
+    parser.add_argument('--seconds', type=float, default=60.0, help='生成的录制时长')
+    parser.add_argument('--points', type=int, default=15000)
+    parser.add_argument('--seeks', type=int, default=100)
+    args = parser.parse_args()
+
+    tmp_dir = None
+    filename = args.file
+    if not filename:
+        tmp_dir = tempfile.mkdtemp()
+        filename = os.path.join(tmp_dir, 'bench.record')
+        make_record_file(filename, args.seconds, args.points)
+    RecordIndex.load_or_build(filename)
+    t0 = time.perf_counter()
+    ColumnarCache.build(filename)
+    print(f'生成列式缓存耗时 {time.perf_counter() - t0:.2f}s')
+
+    for name, bench_func in (('.record', bench_record), ('列式缓存', bench_cache)):
+        open_time, seek_time, imu_time, imu_count = bench_func(filename, args.seeks, np.random.default_rng(0))
+        print(f'{name:<10} 打开 {open_time * 1000:8.2f}ms  跳转解码 {seek_time * 1000:6.3f}ms/帧  '
+              f'加载 {imu_count} 条 IMU {imu_time * 1000:8.2f}ms')
+
+    if tmp_dir:
+        shutil.rmtree(tmp_dir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from record_convert import LidarData, SensorImgData, sensorPointCloudData, shm_img_t, LIDAR_MAX_POINTS, RIGHT_CAMERA
+from decode_prefetch import DecodePrefetcher
+
+def make_lidar_payload(points):
+    cloud = sensorPointCloudData()
+    cloud.width = points
+    cloud.height = 1
+    return bytes(cloud)
+
+def decode_img(data):
+    return SensorImgData.get_sensor_img_data(data, cameras=(RIGHT_CAMERA,))
+
+# 按固定间隔取帧, 统计每次取帧被解码阻塞的时间, 即播放时的抖动
+def bench_paced(decode_func, payload, frames, interval, depth, workers):
+    prefetcher = DecodePrefetcher(decode_func, depth, workers)
+    data = memoryview(payload)
+    next_frame = 0
+    waits = []
+    try:
+        start = time.perf_counter()
+        for i in range(frames):
+            while next_frame < frames and not prefetcher.is_full():
+                prefetcher.submit(next_frame, next_frame * interval, data)
+                next_frame += 1
+            target = start + i * interval
+            delay = target - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            t0 = time.perf_counter()
+            prefetcher.take()
+            waits.append(time.perf_counter() - t0)
+        stats = prefetcher.get_stats()
+    finally:
+        prefetcher.close()
+    waits = np.asarray(waits) * 1000
+    return waits.mean(), np.percentile(waits, 99), waits.max(), stats
+
+def main():
+    parser = argparse.ArgumentParser(description='对比同步解码和预解码时取帧的阻塞时间')
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--interval-ms', type=float, default=20.0)
+    parser.add_argument('--depth', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    cases = [
+        ('lidar', LidarData.get_lidar_points_np, make_lidar_payload(LIDAR_MAX_POINTS)),
+        ('image', decode_img, bytes(shm_img_t())),
+    ]
+    interval = args.interval_ms / 1000
+    for name, decode_func, payload in cases:
+        for depth, workers in ((1, 0), (args.depth, args.workers)):
+            mean_ms, p99_ms, max_ms, stats = bench_paced(decode_func, payload, args.frames, interval, depth, workers)
+            print(f'{name:>6} depth={depth:<3} workers={workers:<2} 取帧阻塞 mean {mean_ms:7.3f} ms  '
+                  f'p99 {p99_ms:7.3f} ms  max {max_ms:7.3f} ms  解码 {stats["decode_mean_ms"]:7.3f} ms')
+
+if __name__ == '__main__':
+    main()
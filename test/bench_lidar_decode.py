@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from record_convert import LidarData, sensorPointCloudData
+
+# 构造一帧点云负载, 布局与录制文件中的 lidar_data 一致
+def make_lidar_payload(width, stamp=1.0):
+    cloud = sensorPointCloudData()
+    cloud.stamp = stamp
+    cloud.height = 1
+    cloud.width = width
+    cloud.is_dense = 1
+    rng = np.random.default_rng(0)
+    xyz = rng.uniform(-50, 50, size=(width, 3)).astype(np.float32)
+    for i in range(width):
+        point = cloud.data[i]
+        point.timestamp = stamp + i * 1e-6
+        point.intensity = i % 256
+        point.ring = i % 32
+        point.x, point.y, point.z = xyz[i]
+    return memoryview(bytes(cloud))
+
+def bench(func, payload, repeat):
+    func(payload)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(payload)
+    return (time.perf_counter() - start) / repeat
+
+def ctypes_path(payload):
+    st, points, intensities = LidarData.get_lidar_points(payload)
+    points = np.array(points)
+    colors = np.ones_like(points) * 0.5
+    colors[:, 2] = intensities
+    return points, colors, st
+
+def main():
+    parser = argparse.ArgumentParser(description='对比 ctypes 逐点解析与 numpy 结构化类型解析的点云解码耗时')
+    parser.add_argument('--points', type=int, nargs='+', default=[1000, 10000, 30000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    for width in args.points:
+        payload = make_lidar_payload(width)
+
+        # 校验两条路径结果一致
+        old_points, old_colors, old_st = ctypes_path(payload)
+        new_points, new_colors, new_st = LidarData.get_lidar_points_np(payload)
+        assert old_st == new_st
+        assert np.allclose(old_points, new_points)
+        assert np.allclose(old_colors, new_colors)
+
+        old_cost = bench(ctypes_path, payload, args.repeat)
+        new_cost = bench(LidarData.get_lidar_points_np, payload, args.repeat)
+        print(f'{width:>6} 点  ctypes: {old_cost * 1000:9.3f} ms  numpy: {new_cost * 1000:9.3f} ms  '
+              f'加速: {old_cost / new_cost:8.1f}x')
+
+if __name__ == '__main__':
+    main()
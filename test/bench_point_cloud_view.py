@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from PySide6.QtWidgets import QApplication
+import pyqtgraph.opengl as gl
+from sensor_view import SensorPointCloudView
+
+# 原实现: 每帧清空视图并重新创建散点图元, 仅作为对比基准
+def legacy_update(view, grid, points, colors):
+    view.clear()
+    view.addItem(grid)
+    scatter = gl.GLScatterPlotItem(pos=points, color=colors, size=0.5, pxMode=True)
+    view.addItem(scatter)
+
+def run_frames(app, widget, update, frames):
+    costs = []
+    for points, colors in frames:
+        start = time.perf_counter()
+        update(points, colors)
+        widget.repaint()
+        app.processEvents()
+        costs.append(time.perf_counter() - start)
+    costs = np.asarray(costs[1:]) * 1000
+    return costs.mean(), np.percentile(costs, 99)
+
+def main():
+    parser = argparse.ArgumentParser(description='对比点云视图每帧重建图元与复用图元的帧耗时')
+    parser.add_argument('--points', type=int, default=30000)
+    parser.add_argument('--frames', type=int, default=200)
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(args.frames):
+        # 每帧点数略有波动, 与实际雷达数据接近
+        count = int(args.points * rng.uniform(0.95, 1.0))
+        points = rng.uniform(-50, 50, size=(count, 3)).astype(np.float32)
+        colors = np.full((count, 3), 0.5, dtype=np.float32)
+        frames.append((points, colors))
+
+    legacy_view = gl.GLViewWidget()
+    legacy_grid = gl.GLGridItem()
+    legacy_view.resize(640, 480)
+    legacy_view.show()
+    mean, p99 = run_frames(app, legacy_view,
+                           lambda points, colors: legacy_update(legacy_view, legacy_grid, points, colors), frames)
+    print(f'重建图元: 平均 {mean:.3f} ms  P99 {p99:.3f} ms')
+
+    sensor_view = SensorPointCloudView()
+    sensor_view.view.resize(640, 480)
+    sensor_view.view.show()
+    mean, p99 = run_frames(app, sensor_view.view,
+                           lambda points, colors: sensor_view.update_point_cloud(points, colors, 0.0), frames)
+    print(f'复用图元: 平均 {mean:.3f} ms  P99 {p99:.3f} ms  (视图内统计 {sensor_view.get_frame_time_ms():.3f} ms)')
+
+if __name__ == '__main__':
+    main()
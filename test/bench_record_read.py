@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+import struct
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from record_convert import RecordHeader, RecordReader, sensorPointCloudData, imuMetaData, LIDAR_TOPIC, IMU_TOPIC
+
+def write_record(f, topic_name, timestamp, payload):
+    f.write(topic_name.encode('utf-8') + b'\x00' + struct.pack('<dI', timestamp, len(payload)) + payload)
+
+# 生成测试用的录制文件, 每帧点云后跟若干条 IMU 记录
+def make_record_file(filename, frames, imu_per_frame):
+    lidar_payload = bytes(sensorPointCloudData())
+    imu_payload = bytes(imuMetaData())
+    with open(filename, 'wb') as f:
+        for i in range(frames):
+            write_record(f, LIDAR_TOPIC, i * 0.1, lidar_payload)
+            for j in range(imu_per_frame):
+                write_record(f, IMU_TOPIC, i * 0.1 + j * 0.1 / imu_per_frame, imu_payload)
+
+# 原实现: 逐字节读取 topic 名称, 仅作为对比基准
+def read_byte_at_a_time(file_handle, name):
+    while True:
+        topic_name_bytes = bytearray()
+        while True:
+            byte = file_handle.read(1)
+            if not byte:
+                return None, None, None
+            if byte == b'\x00':
+                break
+            topic_name_bytes.extend(byte)
+        topic_name = topic_name_bytes.decode('utf-8')
+        timestamp, data_size = struct.unpack('dI', file_handle.read(12))
+        data = memoryview(file_handle.read(data_size))
+        if name == topic_name:
+            return timestamp, data_size, data
+
+def bench_file_handle(filename, read_func, topic_name):
+    count = 0
+    with open(filename, 'rb') as f:
+        while True:
+            _, _, data = read_func(f, topic_name)
+            if data is None:
+                return count
+            count += 1
+
+def bench_reader(filename, topic_name):
+    count = 0
+    with RecordReader(filename) as reader:
+        for _ in reader.records(topic_name):
+            count += 1
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description='对比 .record 文件读取方式的吞吐')
+    parser.add_argument('--file', help='已有的 .record 文件, 不指定时生成临时文件')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--imu-per-frame', type=int, default=20)
+    args = parser.parse_args()
+
+    filename = args.file
+    if not filename:
+        filename = os.path.join(tempfile.mkdtemp(), 'bench.record')
+        make_record_file(filename, args.frames, args.imu_per_frame)
+    size_mb = os.path.getsize(filename) / (1 << 20)
+    print(f'文件: {filename} ({size_mb:.1f} MB)')
+
+    cases = [
+        ('逐字节读取', lambda topic: bench_file_handle(filename, read_byte_at_a_time, topic)),
+        ('RecordHeader', lambda topic: bench_file_handle(filename, RecordHeader.read_record_head_a_data, topic)),
+        ('RecordReader(mmap)', lambda topic: bench_reader(filename, topic)),
+    ]
+    for topic_name in (LIDAR_TOPIC, IMU_TOPIC):
+        for name, func in cases:
+            start = time.perf_counter()
+            count = func(topic_name)
+            cost = time.perf_counter() - start
+            print(f'{topic_name:>10} {name:<20} {count:>7} 条  {cost * 1000:9.1f} ms  {size_mb / cost:9.1f} MB/s')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import os
+import sys
+import time
+import struct
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from record_convert import (RecordReader, sensorPointCloudData, shm_img_t, imuMetaData, sensor_point_dtype,
+                            LIDAR_TOPIC, IMG_TOPIC, IMU_TOPIC, LIDAR_DATA_OFFSET, LIDAR_HEAD_STRUCT,
+                            NV12_OFFSETS, NV12_SIZE, IMG_HEIGHT, IMG_WIDTH)
+from record_chunked import convert_to_v2, convert_to_v1, open_record_reader
+
+def write_record(f, topic_name, timestamp, payload):
+    f.write(topic_name.encode('utf-8') + b'\x00' + struct.pack('<dI', timestamp, len(payload)) + payload)
+
+def make_lidar_payload(rng, timestamp):
+    # 点数随帧变化, 坐标按线号和方位角分布并带噪声, 压缩效果接近实际数据
+    payload = bytearray(sensorPointCloudData())
+    width = int(rng.integers(8000, 20000))
+    LIDAR_HEAD_STRUCT.pack_into(payload, 0, timestamp, 1, width)
+    cloud = np.frombuffer(payload, dtype=sensor_point_dtype, count=width, offset=LIDAR_DATA_OFFSET)
+    ring = np.arange(width) % 32
+    angle = np.linspace(0, 2 * np.pi, width)
+    distance = 10 + rng.normal(0, 0.05, width)
+    cloud['xyz'][:, 0] = distance * np.cos(angle)
+    cloud['xyz'][:, 1] = distance * np.sin(angle)
+    cloud['xyz'][:, 2] = (ring - 16) * 0.1
+    cloud['ring'] = ring
+    cloud['intensity'] = rng.integers(0, 256, width)
+    cloud['timestamp'] = timestamp + np.arange(width) * 1e-6
+    return bytes(payload)
+
+def make_img_payload(rng, frame_no):
+    payload = bytearray(shm_img_t())
+    x = (np.arange(IMG_WIDTH) + frame_no * 4) % 256
+    base = np.broadcast_to(x, (IMG_HEIGHT * 3 // 2, IMG_WIDTH))
+    for offset in NV12_OFFSETS.values():
+        noise = rng.integers(0, 8, base.shape)
+        nv12 = np.frombuffer(payload, dtype=np.uint8, count=NV12_SIZE, offset=offset)
+        nv12[:] = ((base + noise) % 256).astype(np.uint8).ravel()
+    return bytes(payload)
+
+# 生成 v1 测试文件: 点云 10Hz, 双目图像 30Hz, IMU 200Hz
+def make_record_file(filename, seconds):
+    rng = np.random.default_rng(0)
+    imu_payload = bytes(imuMetaData())
+    with open(filename, 'wb') as f:
+        for i in range(int(seconds * 200)):
+            timestamp = i / 200
+            if i % 20 == 0:
+                write_record(f, LIDAR_TOPIC, timestamp, make_lidar_payload(rng, timestamp))
+            if i % 7 == 0:
+                write_record(f, IMG_TOPIC, timestamp, make_img_payload(rng, i // 7))
+            write_record(f, IMU_TOPIC, timestamp, imu_payload)
+
+def bench_read(filename):
+    # 顺序读取全部记录
+    t0 = time.perf_counter()
+    total = 0
+    with open_record_reader(filename) as reader:
+        for _, _, data in reader.records():
+            total += len(data)
+    return total, time.perf_counter() - t0
+
+def bench_seek(filename, count, rng):
+    # 随机读取点云帧, 模拟拖动时间轴
+    with open_record_reader(filename) as reader:
+        heads = [(offset, size) for topic_name, _, offset, size in reader.scan() if topic_name == LIDAR_TOPIC]
+        t0 = time.perf_counter()
+        for i in rng.integers(0, len(heads), count):
+            reader.read_at(*heads[i])
+        return (time.perf_counter() - t0) / count
+
+def main():
+    parser = argparse.ArgumentParser(description='对比 v1 与 v2 (分块压缩) 录制文件的大小和读写速度')
+    parser.add_argument('--file', help='已有的 v1 .record 文件, 不指定时生成临时文件')
+    parser.add_argument('--seconds', type=float, default=10.0, help='生成的录制时长')
+    parser.add_argument('--seeks', type=int, default=50)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    filename = args.file
+    if not filename:
+        filename = os.path.join(tmp_dir, 'v1.record')
+        make_record_file(filename, args.seconds)
+    v1_size = os.path.getsize(filename)
+    print(f'v1: {filename} {v1_size / (1 << 20):.1f}MB')
+
+    total, read_time = bench_read(filename)
+    seek_time = bench_seek(filename, args.seeks, np.random.default_rng(1))
+    print(f'{"格式":<12}{"大小":>10}{"比例":>8}{"写入MB/s":>10}{"读取MB/s":>10}{"跳转ms":>8}')
+    print(f'{"v1":<12}{v1_size / (1 << 20):>8.1f}MB{1:>8.1%}{"-":>10}'
+          f'{total / read_time / (1 << 20):>10.0f}{seek_time * 1000:>8.2f}')
+    # 读写速度按 v1 数据量计算
+    for codec, level in (('none', 0), ('zlib', 1), ('zlib', 3), ('zlib', 6), ('lzma', 1)):
+        v2_filename = os.path.join(tmp_dir, f'v2_{codec}{level}.record')
+        t0 = time.perf_counter()
+        convert_to_v2(filename, v2_filename, codec, level)
+        write_time = time.perf_counter() - t0
+        v2_size = os.path.getsize(v2_filename)
+        _, read_time = bench_read(v2_filename)
+        seek_time = bench_seek(v2_filename, args.seeks, np.random.default_rng(1))
+        print(f'{f"{codec}-{level}":<12}{v2_size / (1 << 20):>8.1f}MB{v2_size / v1_size:>8.1%}'
+              f'{v1_size / write_time / (1 << 20):>10.0f}{v1_size / read_time / (1 << 20):>10.0f}{seek_time * 1000:>8.2f}')
+
+    # 转回 v1 后与原文件逐条比较
+    v1_again = os.path.join(tmp_dir, 'v1_again.record')
+    convert_to_v1(os.path.join(tmp_dir, 'v2_zlib3.record'), v1_again)
+    with RecordReader(filename) as a, RecordReader(v1_again) as b:
+        same = all(ra[:2] == rb[:2] and bytes(ra[2]) == bytes(rb[2]) for ra, rb in zip(a.records(), b.records()))
+    print(f'v1 -> v2 -> v1: {"一致" if same else "不一致"} '
+          f'(未使用的点补零, 原文件中该区域非零时会不一致)')
+
+    for name in os.listdir(tmp_dir):
+        os.remove(os.path.join(tmp_dir, name))
+    os.rmdir(tmp_dir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from record_convert import sensorPointCloudData, shm_img_t, imuMetaData, LIDAR_TOPIC, IMG_TOPIC, IMU_TOPIC
+from record_index import RecordIndex
+from record_writer import RecordWriter
+
+# 模拟接收线程: 按传感器频率交替写入点云、双目图像和 IMU, 统计写入速度和丢弃数量
+def main():
+    parser = argparse.ArgumentParser(description='测试录制写入的吞吐量')
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--speed', type=float, default=1.0, help='相对传感器实际频率的倍数, 0 表示不限速')
+    parser.add_argument('--queue-mb', type=int, default=256)
+    parser.add_argument('--output', default=None, help='录制文件, 默认写到临时目录')
+    args = parser.parse_args()
+
+    # (topic, 数据, 频率)
+    sources = [
+        (LIDAR_TOPIC, bytes(sensorPointCloudData()), 10.0),
+        (IMG_TOPIC, bytes(shm_img_t()), 30.0),
+        (IMU_TOPIC, bytes(imuMetaData()), 200.0),
+    ]
+    output = args.output or os.path.join(tempfile.mkdtemp(), 'bench.record')
+    writer = RecordWriter(output, max_queue_bytes=args.queue_mb << 20)
+    next_time = [0.0] * len(sources)
+    sent = 0
+    start = time.perf_counter()
+    while True:
+        elapsed = time.perf_counter() - start
+        if elapsed >= args.seconds:
+            break
+        i = min(range(len(sources)), key=next_time.__getitem__)
+        topic_name, payload, rate = sources[i]
+        if args.speed > 0:
+            delay = next_time[i] / args.speed - elapsed
+            if delay > 0:
+                time.sleep(delay)
+        writer.write(topic_name, start + next_time[i], memoryview(payload))
+        next_time[i] += 1.0 / rate
+        sent += 1
+    t0 = time.perf_counter()
+    stats = writer.close()
+    close_ms = (time.perf_counter() - t0) * 1000
+
+    index = RecordIndex.load(output)
+    counts = {topic_name: len(topic['offset']) for topic_name, topic in index.topics.items()} if index else {}
+    print(f'文件: {output} ({os.path.getsize(output) / (1 << 20):.1f}MB)')
+    print(f'发送 {sent} 条, 写入 {stats["written"]} 条, 丢弃 {stats["dropped"]} 条')
+    print(f'平均写入速度 {stats["mean_rate_mb_s"]:.1f}MB/s, 关闭耗时 {close_ms:.1f}ms')
+    print(f'索引: {counts}')
+    if not args.output:
+        os.remove(output)
+        if index:
+            os.remove(RecordIndex.index_path(output))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+import os
+import sys
+import json
+import time
+import shutil
+import struct
+import argparse
+import platform
+import tempfile
+import numpy as np
+
+# 没有显示器和 GPU 的机器上使用 Qt offscreen 平台和软件 OpenGL, 需在导入 Qt 之前设置
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+os.environ.setdefault('QT_OPENGL', 'software')
+os.environ.setdefault('LIBGL_ALWAYS_SOFTWARE', '1')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from PySide6.QtWidgets import QApplication
+from record_convert import (RecordReader, LidarData, ImuData, SensorImgData, sensorPointCloudData, imuMetaData,
+                            shm_img_t, sensor_point_dtype, LIDAR_TOPIC, IMU_TOPIC, IMG_TOPIC, RIGHT_CAMERA,
+                            LIDAR_HEAD_STRUCT, LIDAR_DATA_OFFSET, NV12_OFFSETS, NV12_SIZE, IMG_HEIGHT, IMG_WIDTH,
+                            IMG_TIMESTAMP_OFFSET, IMG_TIMESTAMP_STRUCT)
+from thread_task import LocalPlyPubTask, LocalImuPubTask
+from view_play_state import PlayStateEnum
+from sensor_view import SensorPointCloudView, SensorImageView
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+# 点云视图的更新耗时取决于有没有可用的 OpenGL 上下文
+GL_METRICS = ('pointcloud_update_mean', 'pointcloud_update_p99')
+
+def write_record(f, topic_name, timestamp, payload):
+    f.write(topic_name.encode('utf-8') + b'\x00' + struct.pack('<dI', timestamp, len(payload)) + payload)
+
+def make_lidar_payload(rng, points, timestamp):
+    payload = bytearray(sensorPointCloudData())
+    LIDAR_HEAD_STRUCT.pack_into(payload, 0, timestamp, 1, points)
+    cloud = np.frombuffer(payload, dtype=sensor_point_dtype, count=points, offset=LIDAR_DATA_OFFSET)
+    cloud['xyz'] = rng.uniform(-50, 50, size=(points, 3))
+    cloud['intensity'] = np.arange(points) % 256
+    cloud['ring'] = np.arange(points) % 32
+    cloud['timestamp'] = timestamp
+    return payload
+
+def make_img_payload(frame_no, timestamp):
+    payload = bytearray(shm_img_t())
+    x = ((np.arange(IMG_WIDTH) + frame_no * 8) % 256).astype(np.uint8)
+    for offset in NV12_OFFSETS.values():
+        nv12 = np.frombuffer(payload, dtype=np.uint8, count=NV12_SIZE, offset=offset)
+        nv12.reshape(IMG_HEIGHT * 3 // 2, IMG_WIDTH)[:] = x
+    IMG_TIMESTAMP_STRUCT.pack_into(payload, IMG_TIMESTAMP_OFFSET, timestamp)
+    return payload
+
+# 按 ctypes 布局生成合成录制文件, 各 topic 按各自频率交错写入
+def make_record_file(filename, seconds, points, lidar_rate, imu_rate, image_rate):
+    rng = np.random.default_rng(0)
+    # 点云和图像预先生成几帧轮流使用, 避免生成文件本身耗时过长
+    lidar_payloads = [make_lidar_payload(rng, points, 0.0) for _ in range(4)]
+    img_payloads = [make_img_payload(i, 0.0) for i in range(4)]
+    imu_payload = bytearray(imuMetaData())
+    events = []
+    for topic_name, rate in ((LIDAR_TOPIC, lidar_rate), (IMU_TOPIC, imu_rate), (IMG_TOPIC, image_rate)):
+        if rate > 0:
+            events += [(i / rate, topic_name, i) for i in range(int(seconds * rate))]
+    events.sort()
+    with open(filename, 'wb') as f:
+        for timestamp, topic_name, i in events:
+            if topic_name == LIDAR_TOPIC:
+                payload = lidar_payloads[i % len(lidar_payloads)]
+                LIDAR_HEAD_STRUCT.pack_into(payload, 0, timestamp, 1, points)
+            elif topic_name == IMG_TOPIC:
+                payload = img_payloads[i % len(img_payloads)]
+                IMG_TIMESTAMP_STRUCT.pack_into(payload, IMG_TIMESTAMP_OFFSET, timestamp)
+            else:
+                payload = imu_payload
+                struct.pack_into('<d', payload, imuMetaData.stamp.offset, timestamp)
+            write_record(f, topic_name, timestamp, payload)
+
+class BenchResults:
+    """收集指标, 每个指标记录数值、单位以及越大越好还是越小越好"""
+    def __init__(self):
+        self.metrics = {}
+        self.info = {}
+
+    def add(self, name, value, unit, higher_is_better):
+        self.metrics[name] = {'value': float(value), 'unit': unit, 'higher_is_better': higher_is_better}
+        print(f'  {name:<32}{value:>12.3f} {unit}')
+
+def bench_scan(results, filename):
+    # 顺序遍历全部记录并读取每条记录的全部数据 (mmap 的每一页都要读到), 取三次中最快的一次
+    file_size = os.path.getsize(filename)
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        with RecordReader(filename) as reader:
+            for _, _, data in reader.records():
+                np.frombuffer(data, dtype=np.uint8).sum()
+        best = min(best, time.perf_counter() - start)
+    results.add('record_scan', file_size / best / (1 << 20), 'MB/s', True)
+
+def bench_decode(results, filename, max_frames):
+    decoders = [
+        (LIDAR_TOPIC, 'lidar_decode', LidarData.get_lidar_points_np),
+        (IMU_TOPIC, 'imu_decode', ImuData.get_imu_data),
+        (IMG_TOPIC, 'image_decode', lambda data: SensorImgData.get_sensor_img_data(data, cameras=(RIGHT_CAMERA,))),
+    ]
+    with RecordReader(filename) as reader:
+        for topic_name, name, decode_func in decoders:
+            payloads = [data for _, (_, _, data) in zip(range(max_frames), reader.records(topic_name, offset=0))]
+            if not payloads:
+                continue
+            decode_func(payloads[0])
+            start = time.perf_counter()
+            for data in payloads:
+                decode_func(data)
+            results.add(name, len(payloads) / (time.perf_counter() - start), 'frame/s', True)
+            del payloads
+
+def bench_playback(results, app, filename, duration):
+    # 点云和 IMU 同时按录制时间戳实时回放, 统计发送时刻相对回放时钟的误差
+    tasks = {'lidar': LocalPlyPubTask(filename), 'imu': LocalImuPubTask(filename)}
+    for task in tasks.values():
+        task.set_play_state(PlayStateEnum.PLAYING)
+        task.start()
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        app.processEvents()
+        time.sleep(0.01)
+    for task in tasks.values():
+        task.set_play_state(PlayStateEnum.TERMINATE)
+        task.stop()
+        task.wait()
+    for name, task in tasks.items():
+        stats = task.get_lateness_stats()
+        if not stats.get('count'):
+            continue
+        results.add(f'{name}_pacing_mean', stats['mean_ms'], 'ms', False)
+        results.add(f'{name}_pacing_p99', stats['p99_ms'], 'ms', False)
+
+def time_updates(app, widget, update, frames):
+    costs = []
+    for frame in frames:
+        start = time.perf_counter()
+        update(*frame)
+        widget.repaint()
+        app.processEvents()
+        costs.append(time.perf_counter() - start)
+    return np.asarray(costs[1:]) * 1000
+
+def bench_render(results, app, points, frames):
+    rng = np.random.default_rng(0)
+    lidar_frames = []
+    for _ in range(frames):
+        xyz = rng.uniform(-50, 50, size=(points, 3)).astype(np.float32)
+        lidar_frames.append((xyz, np.full((points, 3), 0.5, dtype=np.float32), 0.0))
+    view = SensorPointCloudView()
+    view.view.resize(640, 480)
+    view.view.show()
+    costs = time_updates(app, view.view, view.update_point_cloud, lidar_frames)
+    # 没有可用的 OpenGL 上下文时只统计数据上传前的部分, 与有上下文的结果不能直接比较
+    results.info['gl_context'] = view.view.isValid()
+    results.add('pointcloud_update_mean', costs.mean(), 'ms', False)
+    results.add('pointcloud_update_p99', np.percentile(costs, 99), 'ms', False)
+    view.view.close()
+
+    img_frames = []
+    for i in range(frames):
+        _, right_img, st = SensorImgData.get_sensor_img_data(make_img_payload(i, i / 30), cameras=(RIGHT_CAMERA,))
+        img_frames.append((right_img, RIGHT_CAMERA, st))
+    view = SensorImageView()
+    view.view.resize(640, 480)
+    view.view.show()
+    costs = time_updates(app, view.view, view.update_image, img_frames)
+    results.add('image_update_mean', costs.mean(), 'ms', False)
+    results.add('image_update_p99', np.percentile(costs, 99), 'ms', False)
+    view.view.close()
+
+def compare_baseline(metrics, baseline, default_threshold, info):
+    # 比基线差超过阈值 (相对比例) 的指标视为性能退化
+    regressions = []
+    thresholds = baseline.get('thresholds', {})
+    gl_context = baseline.get('machine', {}).get('gl_context')
+    for name, base in baseline.get('metrics', {}).items():
+        current = metrics.get(name)
+        if current is None or base['value'] <= 0:
+            continue
+        if name in GL_METRICS and gl_context != info.get('gl_context'):
+            print(f'  {name:<32}跳过: OpenGL 上下文与基线不同 (基线 {gl_context}, 本次 {info.get("gl_context")})')
+            continue
+        threshold = thresholds.get(name, default_threshold)
+        ratio = current['value'] / base['value']
+        worse = (1 - ratio) if base['higher_is_better'] else (ratio - 1)
+        status = '退化' if worse > threshold else 'ok'
+        print(f'  {name:<32}{base["value"]:>10.3f} -> {current["value"]:>10.3f} {current["unit"]:<8}'
+              f'{-worse:>+8.1%}  {status}')
+        if worse > threshold:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='无界面的性能基准: 录制文件扫描、解码、回放节奏和视图更新')
+    parser.add_argument('--seconds', type=float, default=10.0, help='合成录制文件的时长')
+    parser.add_argument('--points', type=int, default=20000, help='每帧点云的点数')
+    parser.add_argument('--lidar-rate', type=float, default=10.0)
+    parser.add_argument('--imu-rate', type=float, default=200.0)
+    parser.add_argument('--image-rate', type=float, default=10.0, help='双目图像帧率, 0 表示不生成图像')
+    parser.add_argument('--decode-frames', type=int, default=100, help='每个 topic 最多解码的帧数')
+    parser.add_argument('--playback-seconds', type=float, default=3.0)
+    parser.add_argument('--render-frames', type=int, default=50)
+    parser.add_argument('--output', default='bench_results.json', help='结果 JSON 文件')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='基线 JSON 文件')
+    parser.add_argument('--threshold', type=float, default=0.3, help='基线中未单独设置阈值的指标允许的退化比例')
+    parser.add_argument('--update-baseline', action='store_true', help='用本次结果覆盖基线')
+    parser.add_argument('--skip', nargs='*', default=[], choices=['scan', 'decode', 'playback', 'render'])
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    results = BenchResults()
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(tmp_dir, 'bench.record')
+        make_record_file(filename, args.seconds, args.points, args.lidar_rate, args.imu_rate, args.image_rate)
+        print(f'合成录制文件: {os.path.getsize(filename) / (1 << 20):.1f}MB, {args.seconds}s')
+        if 'scan' not in args.skip:
+            bench_scan(results, filename)
+        if 'decode' not in args.skip:
+            bench_decode(results, filename, args.decode_frames)
+        if 'playback' not in args.skip:
+            bench_playback(results, app, filename, args.playback_seconds)
+        if 'render' not in args.skip:
+            bench_render(results, app, args.points, args.render_frames)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    report = {
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                    'cpu_count': os.cpu_count(), 'qpa': os.environ.get('QT_QPA_PLATFORM'), **results.info},
+        'config': {key: value for key, value in vars(args).items()
+                   if key not in ('output', 'baseline', 'update_baseline', 'threshold', 'skip')},
+        'metrics': results.metrics,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f'结果已写入 {args.output}')
+
+    if args.update_baseline:
+        # 保留已有基线中单独设置的阈值
+        thresholds = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                thresholds = json.load(f).get('thresholds', {})
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(dict(report, thresholds=thresholds), f, indent=2, ensure_ascii=False)
+        print(f'基线已更新 {args.baseline}')
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f'基线不存在: {args.baseline}, 使用 --update-baseline 生成')
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('config') != report['config']:
+        print('注意: 本次参数与基线生成时不同, 比较结果仅供参考')
+    print('与基线比较:')
+    regressions = compare_baseline(results.metrics, baseline, args.threshold, results.info)
+    if regressions:
+        print(f'性能退化: {", ".join(regressions)}')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
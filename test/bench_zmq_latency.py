@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import struct
+import argparse
+import threading
+import numpy as np
+import zmq
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from thread_task import ZmqService
+
+STAMP_STRUCT = struct.Struct('<d')
+
+# 本地 PUB, 每条消息开头写入发送时刻
+def publisher(port, rate, duration, payload_size, ready):
+    context = zmq.Context.instance()
+    sock = context.socket(zmq.PUB)
+    sock.setsockopt(zmq.SNDHWM, 0)
+    sock.bind(f'tcp://127.0.0.1:{port}')
+    ready.wait()
+    time.sleep(0.5)
+    payload = bytearray(payload_size)
+    interval = 1.0 / rate
+    start = time.perf_counter()
+    count = int(rate * duration)
+    for i in range(count):
+        target = start + i * interval
+        while time.perf_counter() < target:
+            pass
+        STAMP_STRUCT.pack_into(payload, 0, time.perf_counter())
+        sock.send(payload)
+    time.sleep(0.2)
+    sock.send(b'')
+    sock.close()
+
+# 原实现: NOBLOCK 接收, 没有数据时 sleep 1ms
+def receive_legacy(service, latencies):
+    while True:
+        try:
+            data = service.receive_data()
+        except zmq.Again:
+            time.sleep(0.001)
+            continue
+        if not data:
+            return
+        latencies.append(time.perf_counter() - STAMP_STRUCT.unpack_from(data)[0])
+
+def receive_poller(service, latencies):
+    while True:
+        for data in service.receive_batch():
+            if not len(data):
+                return
+            latencies.append(time.perf_counter() - STAMP_STRUCT.unpack_from(data)[0])
+
+def run_case(name, receive_func, port, args):
+    service = ZmqService('127.0.0.1', port, rcvhwm=0)
+    service.connect()
+    latencies = []
+    cpu = []
+    ready = threading.Event()
+
+    def receiver():
+        ready.set()
+        start = time.thread_time()
+        receive_func(service, latencies)
+        cpu.append(time.thread_time() - start)
+
+    pub = threading.Thread(target=publisher, args=(port, args.rate, args.duration, args.payload_size, ready))
+    recv = threading.Thread(target=receiver)
+    pub.start()
+    recv.start()
+    pub.join()
+    recv.join()
+    service.cleanup()
+
+    lat = np.asarray(latencies) * 1e6
+    print(f'{name:<18} 收到 {len(lat):>6} 条  延迟 us: P50 {np.percentile(lat, 50):8.1f}  '
+          f'P99 {np.percentile(lat, 99):8.1f}  最大 {lat.max():8.1f}  接收线程 CPU {cpu[0]:.3f} s')
+
+def main():
+    parser = argparse.ArgumentParser(description='对比 NOBLOCK + sleep 与 Poller 两种 ZMQ 接收方式的延迟')
+    parser.add_argument('--port', type=int, default=15555)
+    parser.add_argument('--rate', type=float, default=1000.0)
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--payload-size', type=int, default=80)
+    args = parser.parse_args()
+
+    run_case('NOBLOCK + sleep', receive_legacy, args.port, args)
+    run_case('Poller', receive_poller, args.port + 1, args)
+
+if __name__ == '__main__':
+    main()
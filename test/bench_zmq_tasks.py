@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from thread_task import ZmqPlyPubTask, ZmqImgPubTask, ZmqImuPubTask, FrameMailbox, DeliveryPolicy
+from view_play_state import PlayStateEnum
+from zmq_sensor_publisher import SensorPublisher
+
+TASKS = {'lidar': ZmqPlyPubTask, 'imu': ZmqImuPubTask, 'img': ZmqImgPubTask}
+
+# 发布端在独立进程中运行, 不与接收线程争用 GIL; 统计期间实际发送的条数通过 sent_queue 返回
+def run_publisher(host, ports, rates, lidar_points, warmup, duration, ready, sent_queue):
+    publisher = SensorPublisher(host, ports, rates, lidar_points)
+    ready.set()
+    try:
+        publisher.run(warmup, report_interval=warmup + 1)
+        for stream in publisher.streams:
+            stream.sent = stream.sent_bytes = 0
+        publisher.run(duration, report_interval=duration + 1)
+        sent_queue.put({stream.name: stream.sent for stream in publisher.streams})
+    finally:
+        publisher.close()
+
+def run_step(args, ports, rates):
+    tasks = {}
+    for name, task_class in TASKS.items():
+        if rates[name] <= 0:
+            continue
+        task = task_class(args.host, ports[name])
+        task.set_mailbox(FrameMailbox(DeliveryPolicy[args.policy.upper()], 1))
+        task.set_play_state(PlayStateEnum.PLAYING)
+        task.start()
+        tasks[name] = task
+    # 接收线程和 ZMQ 上下文已在运行, 不能 fork
+    context = multiprocessing.get_context('spawn')
+    ready = context.Event()
+    sent_queue = context.Queue()
+    publisher = context.Process(target=run_publisher, args=(args.host, ports, rates, args.lidar_points, args.warmup,
+                                                            args.step, ready, sent_queue))
+    publisher.start()
+    # 子进程启动后开始计时, 预热期间的连接建立、首帧等统计不计入结果
+    ready.wait()
+    end_time = time.monotonic() + args.warmup + args.step
+    time.sleep(args.warmup)
+    for task in tasks.values():
+        task.stream_stats.reset()
+    elapsed = end_time - time.monotonic()
+    # 先取结果再 join, 避免子进程等待队列数据被读走而无法退出
+    sent = sent_queue.get()
+    publisher.join()
+    time.sleep(0.2)
+    results = {name: dict(task.get_stream_stats(), elapsed=elapsed, sent=sent.get(name, 0))
+               for name, task in tasks.items()}
+    for task in tasks.values():
+        task.set_play_state(PlayStateEnum.TERMINATE)
+        task.stop()
+        task.wait()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='逐步提高模拟传感器的发送频率, 测试 ZMQ 接收任务的延迟和丢帧')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--base-port', type=int, default=15555, help='点云、IMU、图像依次使用该端口和之后两个端口')
+    parser.add_argument('--lidar-rate', type=float, default=10.0, help='第一级的点云频率, 0 表示不测试')
+    parser.add_argument('--imu-rate', type=float, default=200.0, help='第一级的 IMU 频率, 0 表示不测试')
+    parser.add_argument('--img-rate', type=float, default=30.0, help='第一级的图像频率, 0 表示不测试')
+    parser.add_argument('--lidar-points', type=int, default=20000)
+    parser.add_argument('--steps', type=int, default=5, help='测试级数, 每级频率乘以 --factor')
+    parser.add_argument('--factor', type=float, default=2.0)
+    parser.add_argument('--step', type=float, default=5.0, help='每级统计时长 (秒)')
+    parser.add_argument('--warmup', type=float, default=1.0)
+    parser.add_argument('--policy', choices=['drop_oldest', 'latest_only'], default='drop_oldest',
+                        help='drop_oldest 时每条消息都解码; latest_only 与界面默认设置相同, 只解码每批最新一帧, '
+                             '此时接收端开启 CONFLATE, 序号跳变分不清网络丢帧和主动合并, 丢帧列为合并的条数')
+    parser.add_argument('--max-loss', type=float, default=0.01, help='丢帧率不超过该值时视为跟得上')
+    parser.add_argument('--min-send-ratio', type=float, default=0.95,
+                        help='发送端实际频率低于设定频率的该比例时, 这一级受发送端限制, 不计入接收端的最高频率')
+    args = parser.parse_args()
+
+    ports = {'lidar': args.base_port, 'imu': args.base_port + 1, 'img': args.base_port + 2}
+    base_rates = {'lidar': args.lidar_rate, 'imu': args.imu_rate, 'img': args.img_rate}
+    max_rates = {}
+    print(f'{"数据流":<8}{"频率Hz":>10}{"发送Hz":>10}{"收到":>8}{"丢帧":>8}{"丢帧率":>8}{"P50ms":>9}{"P90ms":>9}{"P99ms":>9}{"最大ms":>9}')
+    for i in range(args.steps):
+        rates = {name: rate * args.factor ** i for name, rate in base_rates.items()}
+        for name, stats in run_step(args, ports, rates).items():
+            # 以发送端实际发送的条数为准; 发送端达不到设定频率时这一级测不出接收端的上限
+            actual = stats['sent'] / stats['elapsed']
+            publisher_limited = actual < rates[name] * args.min_send_ratio
+            lost = stats['lost'] if stats['loss_measured'] else stats['conflated']
+            print(f'{name:<8}{rates[name]:>10.1f}{actual:>10.1f}{stats["received"]:>8}{lost:>8}{stats["loss_rate"]:>8.1%}'
+                  f'{stats["p50_ms"]:>9.2f}{stats["p90_ms"]:>9.2f}{stats["p99_ms"]:>9.2f}{stats["max_ms"]:>9.2f}'
+                  + ('  受发送端限制' if publisher_limited else ''))
+            if stats['received'] and stats['loss_rate'] <= args.max_loss and not publisher_limited:
+                max_rates[name] = actual
+    print('丢帧率不超过 {:.1%} 且不受发送端限制的最高频率: '.format(args.max_loss) +
+          ', '.join(f'{name} {max_rates.get(name, 0):.1f}Hz' for name, rate in base_rates.items() if rate > 0))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+import os
+import sys
+import time
+import struct
+import argparse
+from collections import defaultdict
+import zmq
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from record_convert import (sensorPointCloudData, imuMetaData, shm_img_t, LIDAR_TOPIC, IMU_TOPIC, IMG_TOPIC,
+                            IMG_TIMESTAMP_OFFSET)
+from record_chunked import open_record_reader, expand_payload
+from playback_clock import PlaybackClock
+
+# 与 zmq_sensor_publisher.py 的默认端口一致
+DEFAULT_PORTS = {LIDAR_TOPIC: 5555, IMU_TOPIC: 5556, IMG_TOPIC: 5557}
+
+# 各 topic 结构体中 stamp 字段的偏移, --restamp 时改写为发送时刻
+STAMP_STRUCT = struct.Struct('<d')
+STAMP_OFFSETS = {
+    LIDAR_TOPIC: (sensorPointCloudData.stamp.offset,),
+    IMU_TOPIC: (imuMetaData.stamp.offset,),
+    IMG_TOPIC: (IMG_TIMESTAMP_OFFSET, IMG_TIMESTAMP_OFFSET + shm_img_t.right_img.offset - shm_img_t.left_img.offset)
+}
+
+class RecordReplayPublisher:
+    """
+    把 .record 文件中的数据按录制时间戳重新发布到本地 ZMQ PUB socket, 复现车端的网络数据
+
+    通过 open_record_reader 逐条读取 (v1 为 mmap, v2 按数据块解压), 不把整个文件读入内存.
+    默认每个 topic 绑定 ports 中对应的端口, 每条消息就是一个结构体; topic_port 不为空时
+    所有 topic 共用该端口, 消息分两帧 [topic, 数据]. 发送时刻由 PlaybackClock 按 speed 计算,
+    firehose 时不等待, 以最快速度发送
+    """
+    def __init__(self, filename, host, ports, topic_port=None, topics=None, speed=1.0, firehose=False,
+                 restamp=False, sndhwm=100):
+        self.filename = filename
+        self.context = zmq.Context()
+        self.topic_frame = topic_port is not None
+        self.firehose = firehose
+        self.restamp = restamp
+        self.clock = PlaybackClock(speed)
+        self.sockets = {}
+        # topic -> socket, 不在其中的 topic 不发送; topics 为空时按 topic 分帧发送全部 topic
+        self.topic_sockets = {}
+        if self.topic_frame:
+            socket = self._bind(host, topic_port, sndhwm)
+            if topics:
+                self.topic_sockets = {topic_name: socket for topic_name in topics}
+            else:
+                self.topic_sockets = defaultdict(lambda: socket)
+        else:
+            for topic_name, port in ports.items():
+                if not topics or topic_name in topics:
+                    self.topic_sockets[topic_name] = self.sockets.get(port) or self._bind(host, port, sndhwm)
+        self.sent = defaultdict(int)
+        self.sent_bytes = defaultdict(int)
+        self.skipped = 0
+
+    def _bind(self, host, port, sndhwm):
+        socket = self.context.socket(zmq.PUB)
+        socket.setsockopt(zmq.SNDHWM, sndhwm)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.bind(f'tcp://{host}:{port}')
+        self.sockets[port] = socket
+        return socket
+
+    def close(self):
+        for socket in self.sockets.values():
+            socket.close()
+        self.context.term()
+
+    def send(self, topic_name, data):
+        socket = self.topic_sockets.get(topic_name)
+        if socket is None:
+            self.skipped += 1
+            return
+        # v2 文件中的点云只保存了有效点, 补齐为车端发送的完整结构体
+        data = expand_payload(topic_name, data)
+        offsets = STAMP_OFFSETS.get(topic_name, ()) if self.restamp else ()
+        if offsets:
+            data = bytearray(data)
+            stamp = time.time()
+            for offset in offsets:
+                STAMP_STRUCT.pack_into(data, offset, stamp)
+        if self.topic_frame:
+            socket.send_multipart([topic_name.encode('utf-8'), data])
+        else:
+            socket.send(data)
+        self.sent[topic_name] += 1
+        self.sent_bytes[topic_name] += len(data)
+
+    def replay(self, report_interval=1.0):
+        # 从头到尾回放一遍, 每遍重新设置时钟起点
+        clock = self.clock
+        clock.reset()
+        last_report = time.monotonic()
+        with open_record_reader(self.filename) as reader:
+            for topic_name, timestamp, data in reader.records(offset=0):
+                if not self.firehose:
+                    clock.ensure_started(timestamp)
+                    delay = clock.delay_until(timestamp)
+                    if delay > clock.resolution:
+                        time.sleep(delay)
+                    clock.record_sent(timestamp)
+                self.send(topic_name, data)
+                now = time.monotonic()
+                if now - last_report >= report_interval:
+                    self.report(now - last_report)
+                    last_report = now
+
+    def run(self, loops=1, report_interval=1.0):
+        # loops 为 0 时循环回放
+        count = 0
+        while loops <= 0 or count < loops:
+            self.replay(report_interval)
+            count += 1
+            print(f'第 {count} 遍回放结束', flush=True)
+
+    def report(self, elapsed):
+        items = [f'{topic_name} {self.sent[topic_name] / elapsed:.1f}Hz '
+                 f'{self.sent_bytes[topic_name] / elapsed / (1 << 20):.1f}MB/s' for topic_name in sorted(self.sent)]
+        if not self.firehose:
+            lateness = self.clock.get_lateness_stats()
+            items.append(f'迟到 p99 {lateness["p99_ms"]:.1f}ms')
+        print(' | '.join(items), flush=True)
+        self.sent.clear()
+        self.sent_bytes.clear()
+
+def parse_port(text):
+    topic_name, _, port = text.rpartition('=')
+    if not topic_name:
+        raise argparse.ArgumentTypeError(f'格式应为 topic=端口: {text}')
+    return topic_name, int(port)
+
+def main():
+    parser = argparse.ArgumentParser(description='按录制时间戳把 .record 文件重新发布到本地 ZMQ PUB socket')
+    parser.add_argument('file', help='v1 或 v2 (分块压缩) 录制文件')
+    parser.add_argument('--host', default='127.0.0.1', help='绑定地址, 0.0.0.0 时其他机器也可以连接')
+    parser.add_argument('--port', type=parse_port, action='append', default=[], metavar='TOPIC=PORT',
+                        help='指定 topic 的端口, 可重复; 默认 ' +
+                             ', '.join(f'{name}={port}' for name, port in DEFAULT_PORTS.items()))
+    parser.add_argument('--topics', nargs='+', help='只发送这些 topic')
+    parser.add_argument('--topic-port', type=int, help='所有 topic 共用该端口, 消息分两帧 [topic, 数据]')
+    parser.add_argument('--speed', type=float, default=1.0, help='回放倍速')
+    parser.add_argument('--firehose', action='store_true', help='忽略时间戳, 以最快速度发送; 此时帧间隔不均匀, 接收端按间隔估计的点云丢帧不准确')
+    parser.add_argument('--loop', type=int, default=1, help='回放遍数, 0 表示一直循环')
+    parser.add_argument('--restamp', action='store_true',
+                        help='把结构体中的 stamp 改写为发送时刻, 接收端据此统计端到端延迟')
+    parser.add_argument('--wait', type=float, default=1.0, help='绑定端口后等待订阅端连接的时间 (秒)')
+    parser.add_argument('--sndhwm', type=int, default=100, help='每个连接的发送队列上限 (消息数)')
+    args = parser.parse_args()
+
+    ports = dict(DEFAULT_PORTS)
+    ports.update(args.port)
+    publisher = RecordReplayPublisher(args.file, args.host, ports, args.topic_port, args.topics, args.speed,
+                                      args.firehose, args.restamp, args.sndhwm)
+    time.sleep(args.wait)
+    try:
+        publisher.run(args.loop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if publisher.skipped:
+            print(f'没有对应端口, 未发送的记录 {publisher.skipped} 条')
+        publisher.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+import ctypes
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from record_convert import (shm_img_t, IMG_HEIGHT, IMG_WIDTH, NV12_SIZE, NV12_OFFSETS,
+                            IMG_TIMESTAMP_OFFSET, IMG_TIMESTAMP_STRUCT)
+from shm_source import ShmFrameWriter
+
+# 模拟共享内存相机: 按 shm_img_t 布局写入双目 NV12 图像, 亮度条纹随帧号移动
+def fill_frame(payload, frame_no, timestamp):
+    x = (np.arange(IMG_WIDTH, dtype=np.uint16) + frame_no * 8) % 256
+    for camera, offset in NV12_OFFSETS.items():
+        nv12 = np.frombuffer(payload, dtype=np.uint8, count=NV12_SIZE, offset=offset)
+        nv12 = nv12.reshape(IMG_HEIGHT * 3 // 2, IMG_WIDTH)
+        nv12[:IMG_HEIGHT] = x.astype(np.uint8)
+        nv12[IMG_HEIGHT:] = 128 + camera * 32
+    IMG_TIMESTAMP_STRUCT.pack_into(payload, IMG_TIMESTAMP_OFFSET, timestamp)
+
+def main():
+    parser = argparse.ArgumentParser(description='向共享内存写入模拟的双目图像')
+    parser.add_argument('--name', default='sensor_img', help='共享内存名称')
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--frames', type=int, default=0, help='写入的帧数, 0 表示一直写入')
+    args = parser.parse_args()
+
+    writer = ShmFrameWriter(args.name, ctypes.sizeof(shm_img_t))
+    print(f'共享内存 {args.name}: {ctypes.sizeof(shm_img_t)} 字节, {args.fps} fps, Ctrl+C 结束')
+    interval = 1.0 / args.fps
+    start = time.monotonic()
+    frame_no = 0
+    try:
+        while not args.frames or frame_no < args.frames:
+            with writer.frame() as payload:
+                fill_frame(payload, frame_no, time.time())
+            frame_no += 1
+            delay = start + frame_no * interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+        print(f'共写入 {frame_no} 帧')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from thread_task import FrameMailbox, DeliveryPolicy
+
+def drain(mailbox):
+    frames = []
+    frame = mailbox.take()
+    while frame is not None:
+        frames.append(frame)
+        frame = mailbox.take()
+    return frames
+
+def check_one_notification_per_drain(policy, capacity):
+    # 界面取空邮箱之前, 无论放入多少帧都只通知一次
+    mailbox = FrameMailbox(policy, capacity)
+    for round_no in range(3):
+        notified = [mailbox.put((round_no, i)) for i in range(5)]
+        assert notified == [True, False, False, False, False]
+        frames = drain(mailbox)
+        assert frames == [(round_no, i) for i in range(5 - mailbox.capacity, 5)]
+    assert mailbox.get_stats() == {'delivered': 3 * mailbox.capacity, 'dropped': 3 * (5 - mailbox.capacity),
+                                   'pending': 0}
+
+def test_latest_only_notifies_once_per_drain():
+    check_one_notification_per_drain(DeliveryPolicy.LATEST_ONLY, 1)
+
+def test_drop_oldest_notifies_once_per_drain():
+    check_one_notification_per_drain(DeliveryPolicy.DROP_OLDEST, 3)
@@ -0,0 +1,29 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from thread_task import LocalImuPubTask
+from view_play_state import PlayStateEnum
+
+def test_state_change_before_wait_is_not_lost():
+    # 播放线程看到暂停之后、开始等待之前恢复了播放, 事件已被消费时也不能一直等下去
+    task = LocalImuPubTask('unused.record')
+    task.set_play_state(PlayStateEnum.PAUSED)
+    task.set_play_state(PlayStateEnum.PLAYING)
+    task.state_event.clear()
+    waiter = threading.Thread(target=task.wait_state_change, args=(PlayStateEnum.PAUSED,), daemon=True)
+    waiter.start()
+    waiter.join(1.0)
+    assert not waiter.is_alive()
+
+def test_wait_returns_on_stop():
+    task = LocalImuPubTask('unused.record')
+    task.set_play_state(PlayStateEnum.PAUSED)
+    waiter = threading.Thread(target=task.wait_state_change, args=(PlayStateEnum.PAUSED,), daemon=True)
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()
+    task.stop()
+    waiter.join(1.0)
+    assert not waiter.is_alive()
@@ -0,0 +1,42 @@
+import os
+import sys
+import struct
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from record_demux import RecordDemux
+
+def write_record(f, topic_name, timestamp, payload):
+    f.write(topic_name.encode('utf-8') + b'\x00' + struct.pack('<dI', timestamp, len(payload)) + payload)
+
+def test_sparse_and_dense_topics_lose_no_records(tmp_path):
+    # 稀疏 topic 每 100 条记录一帧, 交替读取时密集 topic 的记录一条都不能丢
+    filename = str(tmp_path / 'demux.record')
+    with open(filename, 'wb') as f:
+        for i in range(2000):
+            if i % 100 == 0:
+                write_record(f, 'sparse', i / 1000, b'S' * 16)
+            write_record(f, 'dense', i / 1000, struct.pack('<I', i))
+    sparse = RecordDemux.subscribe(filename, 'sparse')
+    dense = RecordDemux.subscribe(filename, 'dense')
+    sparse_count = 0
+    dense_values = []
+    while sparse.next()[1] is not None:
+        sparse_count += 1
+        for _ in range(10):
+            _, data = dense.next()
+            dense_values.append(struct.unpack('<I', data)[0])
+    timestamp, data = dense.next()
+    while data is not None:
+        dense_values.append(struct.unpack('<I', data)[0])
+        timestamp, data = dense.next()
+    assert sparse_count == 20
+    assert dense_values == list(range(2000))
+
+    # 跳转只影响发起跳转的订阅者
+    dense.seek_timestamp(1.5)
+    assert dense.frame_no == 1500 and sparse.frame_no == 20
+    # 与 RecordIndex.find_frame 一样跳到最接近的帧, 而不是之后的第一帧
+    sparse.seek_timestamp(0.149)
+    assert sparse.frame_no == 1 == sparse.index.find_frame('sparse', 0.149)
+    sparse.close()
+    dense.close()
@@ -0,0 +1,115 @@
+import os
+import sys
+import gc
+import struct
+import numpy as np
+import pytest
+from PySide6.QtGui import QImage
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from record_convert import (RecordReader, RecordHeader, SensorImgData, RECORD_TOPIC_MAX_LEN, IMG_HEIGHT, IMG_WIDTH,
+                            LIDAR_TOPIC, IMU_TOPIC, LIDAR_HEAD_STRUCT, LIDAR_DATA_OFFSET, imuMetaData)
+from record_chunked import ChunkedRecordWriter
+from record_index import RecordIndex
+from record_demux import RecordDemux
+from record_columnar import ColumnarCache
+
+def write_record(f, topic_name, timestamp, payload):
+    f.write(topic_name.encode('utf-8') + b'\x00' + struct.pack('<dI', timestamp, len(payload)) + payload)
+
+def test_zero_length_payload_is_not_end_of_file(tmp_path):
+    filename = str(tmp_path / 'empty.record')
+    with open(filename, 'wb') as f:
+        write_record(f, 'imu', 0.0, b'')
+        write_record(f, 'imu', 1.0, b'1234')
+    with RecordReader(filename) as reader:
+        assert [(timestamp, bytes(data)) for _, timestamp, data in reader.records()] == [(0.0, b''), (1.0, b'1234')]
+    with open(filename, 'rb') as f:
+        timestamp, data_size, data = RecordHeader.read_record_head_a_data(f, 'imu')
+        assert data is not None and data_size == 0
+
+def test_oversized_topic_raises(tmp_path):
+    # topic 超过上限时不能当作文件结束, 否则后面的记录会被悄悄丢掉
+    filename = str(tmp_path / 'oversized.record')
+    with open(filename, 'wb') as f:
+        write_record(f, 'imu', 0.0, b'1234')
+        write_record(f, 't' * (RECORD_TOPIC_MAX_LEN + 1), 1.0, b'1234')
+        write_record(f, 'imu', 2.0, b'1234')
+    with RecordReader(filename) as reader:
+        with pytest.raises(ValueError):
+            list(reader.scan())
+    with open(filename, 'rb') as f:
+        with pytest.raises(ValueError):
+            list(RecordHeader.scan_records(f))
+
+def test_truncated_topic_ends_scan(tmp_path):
+    # 录制中断时文件在 topic 中间结束, 之前的记录仍可读取
+    filename = str(tmp_path / 'truncated.record')
+    with open(filename, 'wb') as f:
+        write_record(f, 'imu', 0.0, b'1234')
+        f.write(b'im')
+    with RecordReader(filename) as reader:
+        assert [timestamp for _, timestamp, _, _ in reader.scan()] == [0.0]
+    with open(filename, 'rb') as f:
+        assert [timestamp for _, timestamp, _, _ in RecordHeader.scan_records(f)] == [0.0]
+
+def test_shared_image_copy_survives_next_conversion():
+    # QPixmap、跨线程信号等持有的是隐式共享的浅拷贝, Python 对象释放后数据也不能被改写
+    first = np.full((IMG_HEIGHT * 3 // 2, IMG_WIDTH), 16, dtype=np.uint8)
+    second = np.full((IMG_HEIGHT * 3 // 2, IMG_WIDTH), 235, dtype=np.uint8)
+    image = SensorImgData.convert_nv12(first)
+    shallow = QImage(image)
+    expected = shallow.pixel(0, 0)
+    del image
+    gc.collect()
+    for _ in range(8):
+        SensorImgData.convert_nv12(second)
+    assert shallow.pixel(0, 0) == expected
+
+def test_chunked_index_comes_from_footer(tmp_path):
+    # v2 文件尾部已有索引, 不扫描也不生成 .idx
+    filename = str(tmp_path / 'chunked.record')
+    with ChunkedRecordWriter(filename, chunk_size=256) as writer:
+        for i in range(100):
+            writer.write('imu' if i % 4 else 'other', i / 100, struct.pack('<I', i))
+    subscription = RecordDemux.subscribe(filename, 'imu')
+    values = []
+    timestamp, data = subscription.next()
+    while data is not None:
+        values.append(struct.unpack('<I', data)[0])
+        timestamp, data = subscription.next()
+    subscription.close()
+    assert values == [i for i in range(100) if i % 4]
+    index = RecordIndex.load_or_build(filename)
+    assert index.frame_count('other') == 25 and index.find_frame('other', 0.41) == 10
+    assert not os.path.exists(RecordIndex.index_path(filename))
+
+def test_columnar_cache_with_empty_lidar_frames(tmp_path):
+    # 所有点云帧都没有点时, 点列是 (0, 3) 的数组, 缓存仍能生成和读取
+    filename = str(tmp_path / 'empty_lidar.record')
+    with open(filename, 'wb') as f:
+        for i in range(3):
+            payload = LIDAR_HEAD_STRUCT.pack(10.0 + i, 1, 0) + bytes(LIDAR_DATA_OFFSET - LIDAR_HEAD_STRUCT.size)
+            write_record(f, LIDAR_TOPIC, i * 0.1, payload)
+    cache = ColumnarCache.build(filename)
+    assert cache is not None and cache.frame_count(LIDAR_TOPIC) == 3
+    cursor = cache.cursor(LIDAR_TOPIC)
+    cursor.seek_timestamp(0.12)
+    timestamp, data = cursor.next()
+    points, colors, stamp = cache.get_decoder(LIDAR_TOPIC)(data)
+    assert timestamp == pytest.approx(0.1) and stamp == 11.0
+    assert points.shape == (0, 3) and len(colors) == 0
+    assert cursor.next()[0] == pytest.approx(0.2) and cursor.next() == (None, None)
+
+def test_stale_columnar_cache_is_ignored(tmp_path):
+    # 录制文件在生成缓存后被追加, meta.npy 中的大小和修改时间不再匹配
+    filename = str(tmp_path / 'stale.record')
+    imu_payload = bytes(imuMetaData())
+    with open(filename, 'wb') as f:
+        write_record(f, IMU_TOPIC, 0.0, imu_payload)
+    assert ColumnarCache.build(filename) is not None
+    assert ColumnarCache.load(filename) is not None
+    with open(filename, 'ab') as f:
+        write_record(f, IMU_TOPIC, 0.01, imu_payload)
+    assert ColumnarCache.load(filename) is None
+    assert ColumnarCache.build(filename).frame_count(IMU_TOPIC) == 2
@@ -0,0 +1,48 @@
+import os
+import sys
+import gc
+import numpy as np
+from PySide6.QtGui import QImage
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shm_ring import SharedFrameRing
+
+def make_image(value):
+    image = QImage(64, 32, QImage.Format_RGB888)
+    image.fill(value)
+    return image
+
+def test_image_copy_survives_slot_reuse():
+    # 图像的浅拷贝在 Python 之外, 槽位交还复用后也不能被改写
+    ring = SharedFrameRing(1, 1 << 16)
+    released = []
+    try:
+        layout = ring.write_frame(0, (make_image(0xff0000), 1.0))
+        image, st = ring.read_frame(0, layout, released.append)
+        shallow = QImage(image)
+        del image
+        gc.collect()
+        assert released == [0]
+        ring.write_frame(0, (make_image(0x00ff00), 2.0))
+        assert shallow.pixel(0, 0) & 0xffffff == 0xff0000 and st == 1.0
+    finally:
+        ring.close()
+        ring.unlink()
+
+def test_slot_held_until_arrays_released():
+    ring = SharedFrameRing(1, 1 << 16)
+    released = []
+    try:
+        points = np.arange(30, dtype=np.float32).reshape(10, 3)
+        layout = ring.write_frame(0, (points, 1.0))
+        frame = ring.read_frame(0, layout, released.append)
+        view = frame[0][:, :2]
+        del frame
+        gc.collect()
+        assert released == []
+        del view
+        gc.collect()
+        assert released == [0]
+    finally:
+        ring.close()
+        ring.unlink()
@@ -0,0 +1,25 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stream_stats import StreamStats
+
+def test_skipped_messages_are_not_loss():
+    # 每批只解码最新一帧时, 其余消息也要计入, 否则序号跳变会被算成丢帧
+    stats = StreamStats()
+    for seq in range(100):
+        stats.add(seq * 0.01, seq, receive_time=seq * 0.01 + 0.001, decoded=seq % 10 == 9)
+    result = stats.get_stats()
+    assert result['received'] == 100
+    assert result['lost'] == 0 and result['loss_rate'] == 0.0
+    assert result['skipped'] == 90
+
+def test_conflated_gaps_are_counted_apart_from_loss():
+    stats = StreamStats()
+    stats.set_conflate(True)
+    for seq in range(0, 100, 5):
+        stats.add(seq * 0.01, seq)
+    result = stats.get_stats()
+    assert not result['loss_measured']
+    assert result['lost'] == 0
+    assert result['conflated'] == 19 * 4
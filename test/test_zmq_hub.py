@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+import struct
+import zmq
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from zmq_hub import ZmqHub
+from thread_task import ZmqImuPubTask
+from view_play_state import PlayStateEnum
+
+def test_framed_and_unframed_views_use_separate_endpoints():
+    addr = 'tcp://127.0.0.1:15999'
+    framed = ZmqHub.acquire(addr, framed=True)
+    framed_again = ZmqHub.acquire(addr, framed=True)
+    unframed = ZmqHub.acquire(addr)
+    try:
+        assert framed == framed_again
+        assert framed != unframed
+        assert ZmqHub.get_ref_count(addr, framed=True) == 2
+        assert ZmqHub.get_ref_count(addr) == 1
+    finally:
+        ZmqHub.release(addr, framed=True)
+        ZmqHub.release(addr, framed=True)
+        ZmqHub.release(addr)
+    assert ZmqHub.get_ref_count(addr, framed=True) == 0
+    assert ZmqHub.get_ref_count(addr) == 0
+
+class ListRecorder:
+    def __init__(self):
+        self.records = []
+
+    def write(self, topic_name, timestamp, data):
+        self.records.append((topic_name, timestamp, bytes(data)))
+        return True
+
+def test_endpoint_records_each_message_once():
+    # 两个订阅者录制同一 topic, 每条消息只写一次, 各自带收到时的时间戳
+    addr = 'tcp://127.0.0.1:15998'
+    pub = ZmqHub.context().socket(zmq.PUB)
+    pub.bind(addr)
+    ZmqHub.acquire(addr, framed=True)
+    ZmqHub.acquire(addr, framed=True)
+    recorder = ListRecorder()
+    try:
+        ZmqHub.set_recorder(addr, True, 'view1', recorder, 'imu')
+        ZmqHub.set_recorder(addr, True, 'view2', recorder, 'imu')
+        time.sleep(0.5)
+        for i in range(20):
+            pub.send_multipart([b'imu', struct.pack('<I', i)])
+            pub.send_multipart([b'other', b'x'])
+            time.sleep(0.002)
+        deadline = time.monotonic() + 2
+        while len(recorder.records) < 20 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        ZmqHub.set_recorder(addr, True, 'view1', None)
+        ZmqHub.set_recorder(addr, True, 'view2', None)
+    finally:
+        ZmqHub.release(addr, framed=True)
+        ZmqHub.release(addr, framed=True)
+        pub.close(linger=0)
+    assert [struct.unpack('<I', data)[0] for _, _, data in recorder.records] == list(range(20))
+    assert all(topic_name == 'imu' for topic_name, _, _ in recorder.records)
+    timestamps = [timestamp for _, timestamp, _ in recorder.records]
+    assert len(set(timestamps)) == 20 and timestamps == sorted(timestamps)
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+def test_imu_task_releases_endpoint_when_stopped():
+    # 任务结束时释放共享连接, 不依赖垃圾回收
+    addr = 'tcp://127.0.0.1:15997'
+    task = ZmqImuPubTask('127.0.0.1', 15997)
+    task.set_play_state(PlayStateEnum.PLAYING)
+    task.start()
+    try:
+        assert wait_for(lambda: ZmqHub.get_ref_count(addr) == 1)
+    finally:
+        task.stop()
+        task.wait()
+    assert ZmqHub.get_ref_count(addr) == 0
+
+def test_stopped_task_stops_recording_on_shared_endpoint():
+    # 录制的任务结束后, 即使其他视图仍在使用该连接, 也不再往 RecordWriter 写入
+    addr = 'tcp://127.0.0.1:15996'
+    recorded = ZmqImuPubTask('127.0.0.1', 15996)
+    recorded.set_recorder(ListRecorder(), 'dds_imu')
+    other = ZmqImuPubTask('127.0.0.1', 15996)
+    for task in (recorded, other):
+        task.set_play_state(PlayStateEnum.PLAYING)
+        task.start()
+    try:
+        assert wait_for(lambda: ZmqHub.get_ref_count(addr) == 2)
+        assert ZmqHub.get_record_topics(addr) == ['dds_imu']
+        recorded.stop()
+        recorded.wait()
+        assert ZmqHub.get_ref_count(addr) == 1
+        assert ZmqHub.get_record_topics(addr) == []
+    finally:
+        for task in (recorded, other):
+            task.stop()
+            task.wait()
+    assert ZmqHub.get_ref_count(addr) == 0
@@ -0,0 +1,213 @@
+import os
+import sys
+import math
+import time
+import argparse
+import numpy as np
+import zmq
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from record_convert import (sensorPointCloudData, imuMetaData, shm_img_t, sensor_point_dtype, LIDAR_TOPIC,
+                            IMU_TOPIC, IMG_TOPIC, LIDAR_DATA_OFFSET, LIDAR_MAX_POINTS, NV12_OFFSETS, NV12_SIZE,
+                            IMG_HEIGHT, IMG_WIDTH)
+
+class LidarSource:
+    """点云: 按线号和方位角生成 points 个点, 每次发送只改写 stamp 和每个点的时间戳"""
+    topic = LIDAR_TOPIC
+
+    def __init__(self, points):
+        self.payload = bytearray(sensorPointCloudData())
+        self.cloud = sensorPointCloudData.from_buffer(self.payload)
+        points = min(points, LIDAR_MAX_POINTS)
+        self.cloud.height = 1
+        self.cloud.width = points
+        self.points = np.frombuffer(self.payload, dtype=sensor_point_dtype, count=points, offset=LIDAR_DATA_OFFSET)
+        rng = np.random.default_rng(0)
+        ring = np.arange(points) % 32
+        angle = np.linspace(0, 2 * np.pi, points)
+        distance = rng.uniform(2, 50, points)
+        self.points['xyz'][:, 0] = distance * np.cos(angle)
+        self.points['xyz'][:, 1] = distance * np.sin(angle)
+        self.points['xyz'][:, 2] = (ring - 16) * 0.1
+        self.points['ring'] = ring
+        self.points['intensity'] = rng.integers(0, 256, points)
+        self.point_offsets = np.arange(points) * 1e-6
+
+    def make(self, seq, stamp):
+        self.cloud.stamp = stamp
+        self.points['timestamp'] = stamp + self.point_offsets
+        return self.payload
+
+class ImuSource:
+    """IMU: id 为发送序号, 加速度和角速度为正弦曲线"""
+    topic = IMU_TOPIC
+
+    def __init__(self):
+        self.payload = bytearray(imuMetaData())
+        self.imu = imuMetaData.from_buffer(self.payload)
+        self.imu.temp = 40.0
+
+    def make(self, seq, stamp):
+        imu = self.imu
+        phase = seq * 0.01
+        imu.ax, imu.ay, imu.az = math.sin(phase), math.sin(phase + 2), 9.8 + 0.1 * math.sin(phase * 3)
+        imu.gx, imu.gy, imu.gz = 0.1 * math.sin(phase), 0.1 * math.sin(phase + 1), 0.1 * math.sin(phase + 2)
+        imu.stamp = stamp
+        imu.id = seq & 0xFFFFFFFF
+        return self.payload
+
+class ImgSource:
+    """双目图像: NV12 渐变图, frame_id 为发送序号, 两个相机的 time_stamp 都是发送时刻"""
+    topic = IMG_TOPIC
+
+    def __init__(self):
+        self.payload = bytearray(shm_img_t())
+        self.img = shm_img_t.from_buffer(self.payload)
+        x = np.arange(IMG_WIDTH) % 256
+        base = np.broadcast_to(x, (IMG_HEIGHT * 3 // 2, IMG_WIDTH)).astype(np.uint8)
+        for offset in NV12_OFFSETS.values():
+            np.frombuffer(self.payload, dtype=np.uint8, count=NV12_SIZE, offset=offset)[:] = base.ravel()
+
+    def make(self, seq, stamp):
+        for img_data in (self.img.left_img, self.img.right_img):
+            info = img_data.hb_vio_buffer.img_info
+            info.frame_id = seq & 0xFFFFFFFF
+            info.time_stamp = stamp
+        return self.payload
+
+class Stream:
+    def __init__(self, name, source, rate, socket):
+        self.name = name
+        self.source = source
+        self.rate = rate
+        self.socket = socket
+        self.seq = 0
+        self.next_time = None
+        self.sent = 0
+        self.sent_bytes = 0
+
+class SensorPublisher:
+    """
+    本地的模拟传感器发布端, 不需要车端硬件即可测试 ZmqPlyPubTask、ZmqImgPubTask 和 ZmqImuPubTask
+
+    每个数据流按设定频率发送与车端相同的结构体, stamp 字段填写发送时刻的 time.time(),
+    接收端据此统计端到端延迟和丢帧. 默认每个数据流绑定一个端口, 每条消息就是一个结构体;
+    topic_port 不为空时所有数据流共用该端口, 消息分两帧 [topic, 数据]
+    """
+    def __init__(self, host, ports, rates, lidar_points=20000, topic_port=None, sndhwm=100):
+        self.context = zmq.Context()
+        self.sockets = []
+        self.topic_frame = topic_port is not None
+        sources = {'lidar': lambda: LidarSource(lidar_points), 'imu': ImuSource, 'img': ImgSource}
+        shared_socket = self._bind(host, topic_port, sndhwm) if self.topic_frame else None
+        self.streams = []
+        for name, make_source in sources.items():
+            if rates.get(name, 0) <= 0 or (not self.topic_frame and not ports.get(name)):
+                continue
+            socket = shared_socket or self._bind(host, ports[name], sndhwm)
+            self.streams.append(Stream(name, make_source(), rates[name], socket))
+
+    def _bind(self, host, port, sndhwm):
+        socket = self.context.socket(zmq.PUB)
+        socket.setsockopt(zmq.SNDHWM, sndhwm)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.bind(f'tcp://{host}:{port}')
+        self.sockets.append(socket)
+        return socket
+
+    def close(self):
+        for socket in self.sockets:
+            socket.close()
+        self.context.term()
+
+    def scale_rates(self, factor):
+        for stream in self.streams:
+            stream.rate *= factor
+
+    def send(self, stream):
+        stamp = time.time()
+        payload = stream.source.make(stream.seq, stamp)
+        # 接收端跟不上时 PUB socket 直接丢弃超出 SNDHWM 的消息, 不会阻塞也不会报错,
+        # 发送端看不到这些丢弃, 丢帧只能由接收端按序号统计
+        if self.topic_frame:
+            stream.socket.send_multipart([stream.source.topic.encode('utf-8'), payload])
+        else:
+            stream.socket.send(payload)
+        stream.sent += 1
+        stream.sent_bytes += len(payload)
+        stream.seq += 1
+
+    def run(self, duration=0.0, ramp_interval=0.0, ramp_factor=1.5, report_interval=1.0):
+        # 单线程按各数据流的发送时刻依次发送; 落后超过一个周期时不补发, 从当前时刻重新计时
+        now = time.monotonic()
+        end = now + duration if duration > 0 else None
+        next_ramp = now + ramp_interval if ramp_interval > 0 else None
+        next_report = now + report_interval
+        last_report = now
+        for stream in self.streams:
+            stream.next_time = now
+        self.report_rates()
+        while end is None or now < end:
+            stream = min(self.streams, key=lambda s: s.next_time)
+            delay = stream.next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.send(stream)
+            now = time.monotonic()
+            period = 1.0 / stream.rate
+            stream.next_time += period
+            if stream.next_time < now - period:
+                stream.next_time = now
+            if now >= next_report:
+                self.report(now - last_report)
+                last_report = now
+                next_report = now + report_interval
+            if next_ramp is not None and now >= next_ramp:
+                self.scale_rates(ramp_factor)
+                self.report_rates()
+                next_ramp = now + ramp_interval
+
+    def report_rates(self):
+        print('设定频率: ' + ', '.join(f'{s.name} {s.rate:.1f}Hz' for s in self.streams), flush=True)
+
+    def report(self, elapsed):
+        items = []
+        for stream in self.streams:
+            items.append(f'{stream.name} {stream.sent / elapsed:.1f}Hz {stream.sent_bytes / elapsed / (1 << 20):.1f}MB/s')
+            stream.sent = stream.sent_bytes = 0
+        print(' | '.join(items), flush=True)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='模拟车端传感器, 在本地 PUB socket 上发送点云、IMU 和双目图像')
+    parser.add_argument('--host', default='127.0.0.1', help='绑定地址, 0.0.0.0 时其他机器也可以连接')
+    parser.add_argument('--lidar-port', type=int, default=5555)
+    parser.add_argument('--imu-port', type=int, default=5556)
+    parser.add_argument('--img-port', type=int, default=5557)
+    parser.add_argument('--topic-port', type=int, help='所有数据流共用该端口, 消息分两帧 [topic, 数据]')
+    parser.add_argument('--lidar-rate', type=float, default=10.0, help='点云频率, 0 表示不发送')
+    parser.add_argument('--imu-rate', type=float, default=200.0, help='IMU 频率, 0 表示不发送')
+    parser.add_argument('--img-rate', type=float, default=30.0, help='图像频率, 0 表示不发送')
+    parser.add_argument('--lidar-points', type=int, default=20000, help=f'每帧点数, 最多 {LIDAR_MAX_POINTS}')
+    parser.add_argument('--duration', type=float, default=0.0, help='发送时长 (秒), 0 表示一直发送')
+    parser.add_argument('--ramp', type=float, default=0.0, help='每隔多少秒把所有频率乘以 --ramp-factor, 用于找出接收端的上限')
+    parser.add_argument('--ramp-factor', type=float, default=1.5)
+    parser.add_argument('--sndhwm', type=int, default=100, help='每个连接的发送队列上限 (消息数)')
+    return parser
+
+def main():
+    args = build_parser().parse_args()
+    ports = {'lidar': args.lidar_port, 'imu': args.imu_port, 'img': args.img_port}
+    rates = {'lidar': args.lidar_rate, 'imu': args.imu_rate, 'img': args.img_rate}
+    publisher = SensorPublisher(args.host, ports, rates, args.lidar_points, args.topic_port, args.sndhwm)
+    if not publisher.streams:
+        print('没有需要发送的数据流')
+        return
+    try:
+        publisher.run(args.duration, args.ramp, args.ramp_factor)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        publisher.close()
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,23 @@
+import os
+import sys
+import time
+import argparse
 import threading
-from thread_task import ZmqService, start_zmq_service
 from typing import List
-import time
-import zmq
 from datetime import datetime
 
-def start_zmq_service(service: ZmqService):
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from thread_task import ZmqService
+
+def start_zmq_service(service: ZmqService, stop_event: threading.Event):
     service.connect()
     message_count = 0
     last_time = time.time()
-    while True:
+    while not stop_event.is_set():
         try:
+            message_count += len(service.receive_batch())
             current_time = time.time()
-            data = service.receive_data()
-            message_count += 1
-            
+
             # 每秒计算一次频率
             if current_time - last_time >= 1.0:
                 hz = message_count / (current_time - last_time)
@@ -22,40 +25,39 @@ def start_zmq_service(service: ZmqService):
                       f"{service.zmq_host}:{service.zmq_port} 接收频率: {hz:.2f}Hz")
                 message_count = 0
                 last_time = current_time
-        except zmq.Again:
-            time.sleep(0.001)
-            # break
         except Exception as e:
             print(f"未知错误: {e}")
             break
+    service.cleanup()
+
+def main():
+    parser = argparse.ArgumentParser(description='统计各端口的 ZMQ 消息接收频率')
+    parser.add_argument('--host', default='127.0.0.1', help='车端地址, 默认连接本机的 zmq_sensor_publisher.py')
+    parser.add_argument('--ports', type=int, nargs='+', default=[5555, 5556, 5557])
+    args = parser.parse_args()
+
+    # 每个端口一个 ZmqService 和一个接收线程
+    stop_event = threading.Event()
+    threads: List[threading.Thread] = []
+    for port in args.ports:
+        thread = threading.Thread(target=start_zmq_service, args=(ZmqService(args.host, port), stop_event))
+        thread.daemon = True  # 设置为守护线程
+        thread.start()
+        threads.append(thread)
+
+    # 主线程保持运行
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n正在关闭服务...")
+        stop_event.set()
+
+        # 等待所有线程结束
+        for thread in threads:
+            thread.join()
+
+        print("所有服务已关闭")
 
-# # 创建3个ZmqService实例
-services = [
-    ZmqService("9.199.50.87", 5555),
-    ZmqService("9.199.50.87", 5556)
-    # ZmqService("9.199.50.87", 5558)
-]
-
-# 创建并启动线程
-threads: List[threading.Thread] = []
-for service in services:
-    thread = threading.Thread(target=start_zmq_service, args=(service,))
-    thread.daemon = True  # 设置为守护线程
-    thread.start()
-    threads.append(thread)
-
-# 主线程保持运行
-try:
-    while True:
-        time.sleep(1)
-except KeyboardInterrupt:
-    print("\n正在关闭服务...")
-    # 清理资源
-    for service in services:
-        service.cleanup()
-
-    # 等待所有线程结束
-    for thread in threads:
-        thread.join()
-    
-    print("所有服务已关闭")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -3,25 +3,133 @@ from PySide6.QtWidgets import (QApplication, QMainWindow, QVBoxLayout,
                              QWidget, QPushButton, QFileDialog)
 from PySide6.QtCore import QThread, Signal, QTimer
 from queue import Queue
-from record_convert import RecordHeader, LidarData, SensorImgData, ImuData
+from record_convert import LidarData, SensorImgData, ImuData, LIDAR_TOPIC, IMU_TOPIC, IMG_TOPIC, RIGHT_CAMERA
+from record_demux import RecordDemux
+from record_columnar import ColumnarCache
 import numpy as np
 import pyqtgraph.opengl as gl
 import time
+import math
+import socket
+import threading
+from enum import Enum
+from collections import deque
 from view_play_state import PlayStateEnum
+from playback_clock import PlaybackClock
+from frame_cache import FrameCache
+from decode_prefetch import DecodePrefetcher
+from shm_source import ShmFrameReader
 import open3d as o3d
 import zmq
 from logger_manager import LoggerManager
+from zmq_hub import ZmqHub
+from stream_stats import StreamStats
+
+# 发布线程向界面投递数据的策略
+class DeliveryPolicy(Enum):
+    DROP_OLDEST = 0  # 队列满时丢弃最旧的一帧
+    LATEST_ONLY = 1  # 只保留最新的一帧
+    BLOCK = 2        # 队列满时阻塞发布线程
+
+class FrameMailbox:
+    """
+    发布线程和界面之间的有界邮箱
+
+    发布线程 put 数据, 界面线程 take 数据, 只在邮箱由空变为非空时通知界面,
+    所以 Qt 事件队列里最多只有一个待处理的通知, 界面跟不上时按策略丢帧或阻塞
+    """
+    def __init__(self, policy=DeliveryPolicy.LATEST_ONLY, capacity=1):
+        self.policy = policy
+        self.capacity = 1 if policy == DeliveryPolicy.LATEST_ONLY else max(1, capacity)
+        self.frames = deque()
+        self.cond = threading.Condition()
+        self.closed = False
+        self.delivered_count = 0
+        self.dropped_count = 0
+
+    def put(self, frame) -> bool:
+        # 返回 True 表示邮箱之前为空, 需要通知界面
+        with self.cond:
+            if self.policy == DeliveryPolicy.BLOCK:
+                while len(self.frames) >= self.capacity and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return False
+            # 在丢弃之前判断: 替换或挤掉未取走的帧时, 之前的通知还没有处理, 不需要再通知
+            was_empty = not self.frames
+            if self.policy != DeliveryPolicy.BLOCK and len(self.frames) >= self.capacity:
+                self.frames.popleft()
+                self.dropped_count += 1
+            self.frames.append(frame)
+            return was_empty
+
+    def take(self):
+        with self.cond:
+            if not self.frames:
+                return None
+            frame = self.frames.popleft()
+            self.delivered_count += 1
+            self.cond.notify()
+            return frame
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def get_stats(self):
+        with self.cond:
+            return {
+                'delivered': self.delivered_count,
+                'dropped': self.dropped_count,
+                'pending': len(self.frames)
+            }
 
 class BasePubTask(QThread):
-    data_ready = Signal(object, object, object)
+    # 数据已放入邮箱, 由界面线程从邮箱取出
+    data_ready = Signal()
     task_finished = Signal()
     def __init__(self):
         super().__init__()
         self._is_running = True
+        self.mailbox = FrameMailbox()
         self.last_ply_count = 0
         self.speed = 1.0
         self.play_state = PlayStateEnum.PAUSED
         self.logger = None
+        self.cursor = None
+        self.pending_seek = None
+        self.pending_step = 0
+        # 文件回放: 按回放时钟发送, 已读取但未到发送时刻的帧暂存在 pending_frame
+        self.clock = PlaybackClock(self.speed)
+        self.own_clock = True
+        self.reverse_clock = PlaybackClock(-self.speed)
+        self.pending_frame = None
+        # 最近发送的帧号, cursor_synced 表示顺序读取的位置紧接在它之后
+        self.frame_no = -1
+        self.cursor_synced = True
+        self.frame_cache = FrameCache(32)
+        # 把光标读出的数据解码为帧, 从列式缓存读取时换成缓存对应的转换函数
+        self.record_decoder = self._decode_record
+        # 预解码: 光标前方 prefetch_depth 帧由 decode_workers 个线程并行解码
+        self.prefetch_depth = 8
+        self.decode_workers = 2
+        self.prefetcher = None
+        self.read_finished = False
+        # 迟到超过 max_lateness 的帧不解码直接丢弃, 用于只显示最新一帧的视图
+        self.drop_late_frames = False
+        self.max_lateness = 0.05
+        self.late_dropped = 0
+        # 跟随主时钟时单独暂停后恢复, 期间落后于主时钟的帧直接跳过, 不一次性补发
+        self.catching_up = False
+        self.zmq_service = None
+        # 网络数据: 每帧解码后按消息中的 stamp 统计端到端延迟和丢帧
+        self.stream_stats = StreamStats()
+        # 录制: 由 ZmqHub 的共享连接把 record_topic 的原始消息写入 RecordWriter
+        self.recorder = None
+        self.record_topic = None
+        # 播放状态变化或停止时置位, 暂停等待不需要轮询
+        self.state_event = threading.Event()
 
     def run(self):
         try:
@@ -36,13 +144,294 @@ class BasePubTask(QThread):
 
     def stop(self):
         self._is_running = False
+        self.mailbox.close()
+        self._notify_state_change()
+
+    def _notify_state_change(self):
+        self.state_event.set()
+        if self.zmq_service:
+            self.zmq_service.wakeup()
+
+    def wait_state_change(self, state, timeout=None):
+        # state 为调用方看到的播放状态. 先清除事件再检查: 清除之前的变化在检查时已经可以看到,
+        # 之后的变化会重新置位事件, 不会在等待之前被清除掉
+        self.state_event.clear()
+        if (not self._is_running or self.play_state != state or self.pending_seek is not None
+                or self.pending_step != 0):
+            return
+        self.state_event.wait(timeout)
+
+    def set_mailbox(self, mailbox):
+        self.mailbox = mailbox
+
+    def publish(self, *frame):
+        if self.mailbox.put(frame):
+            self.data_ready.emit()
+
+    def get_delivery_stats(self):
+        return self.mailbox.get_stats()
 
     def set_play_state(self, play_state):
         self.logger.info(f'设置播放状态: {play_state}')
+        if play_state == PlayStateEnum.REVERSE:
+            self.reverse_clock.reset()
+        # 共享的主时钟只由主窗口暂停和恢复
+        if self.own_clock:
+            if play_state == PlayStateEnum.PLAYING:
+                self.clock.resume()
+            else:
+                self.clock.pause()
+        elif play_state == PlayStateEnum.PLAYING and self.play_state != PlayStateEnum.PLAYING:
+            self.catching_up = True
         self.play_state = play_state
+        self._notify_state_change()
 
     def set_speed(self, speed):
         self.speed = speed
+        # 主时钟的倍速由主窗口设置, 这里只调整自己的时钟
+        if self.own_clock:
+            self.clock.set_speed(speed)
+        self.reverse_clock.set_speed(-speed)
+        self._notify_state_change()
+
+    def set_clock(self, clock):
+        # 跟随外部的主时钟播放, 需在任务启动前设置
+        self.clock = clock
+        self.own_clock = False
+        self.speed = clock.speed
+        self.reverse_clock.set_speed(-clock.speed)
+
+    def get_lateness_stats(self):
+        return dict(self.clock.get_lateness_stats(), dropped=self.late_dropped)
+
+    def get_position(self):
+        # 返回 (最近发送的帧号, 总帧数), 尚未打开文件时返回 None
+        if self.cursor is None:
+            return None
+        return self.frame_no, self.cursor.frame_count()
+
+    def get_cache_stats(self):
+        return self.frame_cache.get_stats()
+
+    def set_prefetch(self, depth, workers):
+        # 需在任务启动前设置
+        self.prefetch_depth = depth
+        self.decode_workers = workers
+
+    def get_prefetch_stats(self):
+        prefetcher = self.prefetcher
+        return prefetcher.get_stats() if prefetcher is not None else {}
+
+    def set_recorder(self, recorder, record_topic=None):
+        # recorder 为 None 时停止录制; 录制由共享连接完成, 与本任务的播放状态无关
+        self.recorder = recorder
+        self.record_topic = record_topic
+        if self.zmq_service:
+            self.zmq_service.set_recorder(recorder, record_topic)
+
+    def get_stream_stats(self):
+        return self.stream_stats.get_stats()
+
+    def _connect_zmq(self):
+        self.stream_stats.reset()
+        self.zmq_service.connect(conflate=self.mailbox.policy == DeliveryPolicy.LATEST_ONLY)
+        self.stream_stats.set_conflate(self.zmq_service.conflate)
+
+    # 跳转和单步请求在播放线程中执行, 这里只记录目标
+    def seek_frame(self, frame_no):
+        self.pending_seek = ('frame', frame_no)
+        self._notify_state_change()
+
+    def seek_timestamp(self, timestamp):
+        self.pending_seek = ('timestamp', timestamp)
+        self._notify_state_change()
+
+    def step_frame(self, delta):
+        self.pending_step += delta
+        self._notify_state_change()
+
+    def _apply_pending_seek(self):
+        pending_seek, self.pending_seek = self.pending_seek, None
+        pending_step, self.pending_step = self.pending_step, 0
+        if self.cursor is None or (pending_seek is None and pending_step == 0):
+            return
+        frame_count = self.cursor.frame_count()
+        if frame_count == 0:
+            return
+        if pending_seek is not None:
+            seek_type, target = pending_seek
+            if seek_type == 'timestamp':
+                target = self.cursor.index.find_frame(self.cursor.topic_name, target)
+        else:
+            target = self.frame_no + pending_step
+        target = max(0, min(target, frame_count - 1))
+
+        # 通过索引直接定位目标帧, 不需要读取之前的帧
+        self.pending_frame = None
+        self.cursor_synced = False
+        self.reverse_clock.reset()
+        self.logger.info(f'跳转到第 {target} 帧')
+        if self.play_state == PlayStateEnum.PLAYING:
+            self.frame_no = target - 1
+        elif self.play_state == PlayStateEnum.REVERSE:
+            self.frame_no = target + 1
+        else:
+            self._show_frame(target)
+
+    def _open_record_cursor(self, topic_name):
+        # 有列式缓存时直接在缓存上按帧读取, 否则订阅同一文件的共享读取流
+        cache = ColumnarCache.load(self.filename)
+        if cache is not None and cache.has_topic(topic_name):
+            self.logger.info(f'使用列式缓存: {ColumnarCache.cache_path(self.filename)}')
+            self.record_decoder = cache.get_decoder(topic_name)
+            return cache.cursor(topic_name)
+        self.record_decoder = self._decode_record
+        return RecordDemux.subscribe(self.filename, topic_name)
+
+    def _show_frame(self, frame_no):
+        # 随机读取并立即发送指定帧, 用于暂停时的跳转和单步
+        timestamp, data = self.cursor.read(frame_no)
+        frame = self._decode_frame(frame_no, data)
+        self.frame_no = frame_no
+        self._emit_record(timestamp, frame)
+
+    def _decode_frame(self, frame_no, data):
+        frame = self.frame_cache.get(frame_no)
+        if frame is None:
+            frame = self.record_decoder(data)
+            self.frame_cache.put(frame_no, frame)
+        return frame
+
+    def _is_late(self, timestamp, clock):
+        return (self.drop_late_frames or self.catching_up) and clock.delay_until(timestamp) < -self.max_lateness
+
+    def _wait_until(self, timestamp, clock=None) -> bool:
+        # 等到 timestamp 的发送时刻, 期间播放状态变化、调速、跳转或停止时提前返回 False
+        clock = clock or self.clock
+        clock.ensure_started(timestamp)
+        delay = clock.delay_until(timestamp)
+        # 主时钟暂停时一直等到状态变化
+        timeout = None if math.isinf(delay) else delay
+        if delay > clock.resolution and self.state_event.wait(timeout):
+            self.state_event.clear()
+            return False
+        clock.record_sent(timestamp)
+        return True
+
+    def _process_record_frames(self):
+        self.prefetcher = DecodePrefetcher(self.record_decoder, self.prefetch_depth, self.decode_workers)
+        self.clock.attach()
+        try:
+            while self._is_running:
+                self._apply_pending_seek()
+                if self.play_state == PlayStateEnum.PLAYING:
+                    if not self._process_record_frame():
+                        break
+                elif self.play_state == PlayStateEnum.REVERSE:
+                    if not self._process_reverse_frame():
+                        break
+                elif self.play_state == PlayStateEnum.PAUSED:
+                    self.wait_state_change(PlayStateEnum.PAUSED)
+                else:
+                    break
+        finally:
+            self.clock.detach()
+            self.prefetcher.close()
+        self.logger.info(f'回放时间误差统计: {self.get_lateness_stats()}')
+        self.logger.info(f'解码缓存统计: {self.get_cache_stats()}')
+        self.logger.info(f'预解码统计: {self.get_prefetch_stats()}')
+
+    def _process_record_frame(self) -> bool:
+        try:
+            if self.pending_frame is not None and self._is_late(self.pending_frame[1], self.clock):
+                self.frame_no = self.pending_frame[0]
+                self.pending_frame = None
+                self.late_dropped += 1
+            if self.pending_frame is None:
+                resync = not self.cursor_synced
+                if resync:
+                    # 单步、倒放或跳转之后从下一帧开始顺序读取, 丢弃之前预解码的帧
+                    self.cursor.seek(self.frame_no + 1)
+                    self.cursor_synced = True
+                    self.prefetcher.clear()
+                    self.read_finished = False
+                self._fill_prefetch(check_late=not resync)
+                head = self.prefetcher.peek()
+                if head is None:
+                    self.logger.info('文件读取完成')
+                    return False
+                frame_no, timestamp = head
+                if resync:
+                    # 回放时间移到新位置, 跟随同一主时钟的其他视图一起跳转
+                    self.clock.rebase(timestamp)
+                # 落后于时钟的帧直接跳过, 显示最接近当前时间的帧
+                if self._is_late(timestamp, self.clock):
+                    self.prefetcher.drop()
+                    self.frame_no = frame_no
+                    self.late_dropped += 1
+                    return True
+                self.catching_up = False
+                self.pending_frame = self.prefetcher.take()
+                self.frame_cache.put(frame_no, self.pending_frame[2])
+
+            # 帧率控制: 按回放时钟计算发送时刻, 解码在预解码线程中完成
+            frame_no, timestamp, frame = self.pending_frame
+            if not self._wait_until(timestamp):
+                return True
+            self.pending_frame = None
+            self.frame_no = frame_no
+            self._emit_record(timestamp, frame)
+            return True
+        except Exception as e:
+            self.logger.error(f'数据处理错误: {e}')
+            return False
+
+    def _fill_prefetch(self, check_late=True):
+        # 保持光标前方有 prefetch_depth 帧正在解码或已解码
+        while not self.read_finished and not self.prefetcher.is_full():
+            timestamp, data = self.cursor.next()
+            # 数据长度为 0 的记录也是有效记录, 只有 None 表示读完
+            if data is None:
+                self.read_finished = True
+                break
+            frame_no = self.cursor.frame_no - 1
+            # 读取时已经迟到的帧先不解码, 取帧时多半会被跳过
+            decode = not (check_late and self._is_late(timestamp, self.clock))
+            self.prefetcher.submit(frame_no, timestamp, data, self.frame_cache.get(frame_no), decode)
+
+    def _process_reverse_frame(self) -> bool:
+        # 倒放: 按索引随机读取上一帧, 由 reverse_clock 按递减的时间戳控制节奏
+        try:
+            if self.pending_frame is not None:
+                self.pending_frame = None
+                self.cursor_synced = False
+            frame_no = self.frame_no - 1
+            if frame_no < 0:
+                # 已到文件开头, 等待新的播放状态
+                self.wait_state_change(PlayStateEnum.REVERSE)
+                return True
+            timestamp, data = self.cursor.read(frame_no)
+            self.reverse_clock.ensure_started(timestamp)
+            self.cursor_synced = False
+            if self._is_late(timestamp, self.reverse_clock):
+                self.frame_no = frame_no
+                self.late_dropped += 1
+                return True
+            frame = self._decode_frame(frame_no, data)
+            if not self._wait_until(timestamp, self.reverse_clock):
+                return True
+            self.frame_no = frame_no
+            self._emit_record(timestamp, frame)
+            return True
+        except Exception as e:
+            self.logger.error(f'数据处理错误: {e}')
+            return False
+
+    def _decode_record(self, data):
+        raise NotImplementedError
+
+    def _emit_record(self, timestamp, frame):
+        self.publish(*frame)
 
 class BasePlyPubTask(BasePubTask):
     def __init__(self):
@@ -50,7 +439,7 @@ class BasePlyPubTask(BasePubTask):
 
     def save_point_cloud(self, points, filename):
         pcd = o3d.geometry.PointCloud()
-        pcd.points = o3d.utility.Vector3dVector(points)
+        pcd.points = o3d.utility.Vector3dVector(np.asarray(points, dtype=np.float64))
         self.logger.info(f'保存异常点云文件: {filename}')
         o3d.io.write_point_cloud(filename, pcd)
 
@@ -66,54 +455,155 @@ class BaseImgPubTask(BasePubTask):
     def __init__(self):
         super().__init__()
 
+    def _decode_record(self, data):
+        # 只显示右目图像, 左目不做转换
+        _, right_img, st = SensorImgData.get_sensor_img_data(data, cameras=(RIGHT_CAMERA,))
+        return right_img, RIGHT_CAMERA, st
+
 class ZmqService:
-    def __init__(self, zmq_host: str, zmq_port: str):
+    def __init__(self, zmq_host: str, zmq_port: str, rcvhwm: int = 100, topic: str = None):
         self.logger = LoggerManager.get_logger(self.__class__.__name__)
         self.zmq_host = zmq_host
         self.zmq_port = zmq_port
-        self.context = zmq.Context()
+        # topic 为空时每条消息就是一个结构体; 否则消息分两帧 [topic, 数据], 只订阅该 topic
+        self.topic = topic
+        self.topic_bytes = topic.encode('utf-8') if topic else b''
+        self.rcvhwm = rcvhwm
+        self.addr = f'tcp://{zmq_host}:{zmq_port}'
+        # 共享进程内的 ZMQ 上下文, 同一地址的网络连接由 ZmqHub 统一管理
+        self.context = ZmqHub.context()
+        self.hub_acquired = False
+        self.inproc_addr = None
+        self.recorder = None
+        self.record_topic = None
+        self.closed = False
         self.zmq_socket = None
+        # 是否开启了 CONFLATE, 开启后 zmq 在接收端丢弃旧消息
+        self.conflate = False
+        self.poller = zmq.Poller()
+        # 其他线程通过 wakeup 写入 socketpair 唤醒 poll, 用于及时响应停止和暂停
+        self.wakeup_reader, self.wakeup_writer = socket.socketpair()
+        self.wakeup_reader.setblocking(False)
+        self.poller.register(self.wakeup_reader, zmq.POLLIN)
 
     def __del__(self):
         self.cleanup()
 
     def cleanup(self):
         if self.zmq_socket:
-            self.zmq_socket.close()
+            self.poller.unregister(self.zmq_socket)
+            self.zmq_socket.close(linger=0)
             self.zmq_socket = None
-        if self.context:
-            self.context.term()
-            self.context = None
-
-    def connect(self):
+        if self.hub_acquired:
+            ZmqHub.set_recorder(self.addr, bool(self.topic), self, None)
+            ZmqHub.release(self.addr, bool(self.topic))
+            self.hub_acquired = False
+        if not self.closed:
+            self.poller.unregister(self.wakeup_reader)
+            self.wakeup_reader.close()
+            self.wakeup_writer.close()
+            self.closed = True
+
+    def connect(self, conflate: bool = False):
         try:
-            self.zmq_socket = self.context.socket(zmq.SUB)
-            addr = f'tcp://{self.zmq_host}:{self.zmq_port}'
-            self.zmq_socket.connect(addr)
-            self.zmq_socket.setsockopt_string(zmq.SUBSCRIBE, '')
-            self.logger.info(f'已连接到ZMQ服务器: {addr}')
+            # 连接到共享连接在进程内的转发地址, 同一远端只有一条网络连接
+            self.inproc_addr = ZmqHub.acquire(self.addr, bool(self.topic))
+            self.hub_acquired = True
+            if self.recorder is not None:
+                ZmqHub.set_recorder(self.addr, bool(self.topic), self, self.recorder, self.record_topic)
+            self._open_socket(conflate)
         except zmq.ZMQError as e:
             self.logger.error(f'ZMQ连接错误: {e}')
             raise
 
+    def set_recorder(self, recorder, record_topic=None):
+        # 连接建立之前设置的录制在 connect 时生效
+        self.recorder = recorder
+        self.record_topic = record_topic
+        if self.hub_acquired:
+            ZmqHub.set_recorder(self.addr, bool(self.topic), self, recorder, record_topic)
+
+    def _open_socket(self, conflate):
+        inproc_addr = self.inproc_addr
+        self.zmq_socket = self.context.socket(zmq.SUB)
+        # 接收队列上限, 界面只要最新一帧时由 zmq 直接丢弃旧消息; 两者都需在 connect 之前设置
+        self.zmq_socket.setsockopt(zmq.RCVHWM, self.rcvhwm)
+        # CONFLATE 不支持多帧消息, 按 topic 分帧时由邮箱负责只保留最新一帧
+        self.conflate = conflate and not self.topic
+        if self.conflate:
+            self.zmq_socket.setsockopt(zmq.CONFLATE, 1)
+        self.zmq_socket.connect(inproc_addr)
+        # 按 topic 前缀过滤, 订阅关系经共享连接同步到发布端, 不需要的 topic 不会经过网络
+        self.zmq_socket.setsockopt(zmq.SUBSCRIBE, self.topic_bytes)
+        self.poller.register(self.zmq_socket, zmq.POLLIN)
+        self.logger.info(f'已连接到ZMQ服务器: {self.addr} ({inproc_addr}), topic: {self.topic}, conflate: {conflate}')
+
     def receive_data(self) -> bytes:
+        while self.topic:
+            data = self._receive_topic_data()
+            if data is not None:
+                return data
         return self.zmq_socket.recv(flags=zmq.NOBLOCK)
 
+    def _receive_topic_data(self):
+        # 前缀匹配之外再比较完整的 topic, 帧格式不对或 topic 不一致时返回 None
+        frames = self.zmq_socket.recv_multipart(flags=zmq.NOBLOCK, copy=False)
+        if len(frames) != 2 or frames[0].bytes != self.topic_bytes:
+            return None
+        return frames[1].buffer
+
+    def receive_batch(self, timeout_ms: int = 100, max_count: int = 1000) -> list:
+        # 阻塞等待直到有消息、被唤醒或超时, 然后一次取完已到达的消息
+        messages = []
+        events = dict(self.poller.poll(timeout_ms))
+        if self.wakeup_reader in events:
+            self._drain_wakeup()
+        if self.zmq_socket in events:
+            while len(messages) < max_count:
+                try:
+                    if self.topic:
+                        data = self._receive_topic_data()
+                        if data is not None:
+                            messages.append(data)
+                    else:
+                        messages.append(self.zmq_socket.recv(flags=zmq.NOBLOCK, copy=False).buffer)
+                except zmq.Again:
+                    break
+        return messages
+
+    def wakeup(self):
+        try:
+            self.wakeup_writer.send(b'\x00')
+        except (BlockingIOError, OSError):
+            # 缓冲区已满说明已有未处理的唤醒
+            pass
+
+    def _drain_wakeup(self):
+        try:
+            while self.wakeup_reader.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
 class LocalPlyPubTask(BasePlyPubTask):
     def __init__(self, filename, speed=1.0):
         super().__init__()
         self.logger = LoggerManager.get_logger(self.__class__.__name__)
         self.filename = filename
-        self.last_timestamp = 0.0
-        self.speed = speed
+        self.set_speed(speed)
+        self.drop_late_frames = True
 
     def _run_impl(self):
         try:
             if self.filename and (self.filename.endswith('.pcd') or self.filename.endswith('.ply')):
                 self.load_point_cloud_file(self.filename)
             elif self.filename and self.filename.endswith('.record'):
-                with open(self.filename, 'rb') as f:
-                    self._process_file_data(f)
+                # 有列式缓存时读缓存, 否则同一文件的多个视图共用一个读取流
+                self.cursor = self._open_record_cursor(LIDAR_TOPIC)
+                try:
+                    self._process_record_frames()
+                finally:
+                    self.cursor.close()
             self.logger.info('结束文件数据处理')
         except FileNotFoundError:
             self.logger.error(f'文件不存在: {self.filename}')
@@ -128,69 +618,48 @@ class LocalPlyPubTask(BasePlyPubTask):
         else:
             colors = np.ones_like(points) * 0.5
         colors[:, 2] = 1.0
-        self.data_ready.emit(points, colors)
+        self.publish(points, colors, None)
 
-    def _process_file_data(self, file_handler):
-        while self._is_running:
-            if self.play_state == PlayStateEnum.PLAYING:
-                if not self._process_single_frame(file_handler):
-                    break
-            elif self.play_state == PlayStateEnum.PAUSED:
-                time.sleep(0.05)
-            else:
-                break
+    def _decode_record(self, data):
+        return LidarData.get_lidar_points_np(data)
 
-    def _process_single_frame(self, file_handler) -> bool:
-        try:
-            # 读取数据
-            timestamp, _, data = RecordHeader.read_record_head_a_data(file_handler, 'lidar_data')
-            if not data:
-                self.logger.info('文件读取完成')
-                return False
-
-            # 处理点云数据
-            points, colors, st = LidarData.get_lidar_points_np(data)
-
-            # 帧率控制
-            sleep_time = min(self.last_timestamp, timestamp - self.last_timestamp)
-            time.sleep(sleep_time / self.speed)
-            self.last_timestamp = timestamp
-
-            # 发送数据并检查异常
-            self.data_ready.emit(points, colors, st)
-            self.check_point_cloud_anomaly(points, timestamp)
-            return True
-        except Exception as e:
-            self.logger.error(f'数据处理错误: {e}')
-            return False
+    def _emit_record(self, timestamp, frame):
+        points, colors, st = frame
+        # 发送数据并检查异常
+        self.publish(points, colors, st)
+        self.check_point_cloud_anomaly(points, timestamp)
 
 class ZmqPlyPubTask(BasePlyPubTask):
-    def __init__(self, zmq_host: str, zmq_port: str):
+    def __init__(self, zmq_host: str, zmq_port: str, topic: str = None):
         super().__init__()
         self.logger = LoggerManager.get_logger(self.__class__.__name__)
-        self.zmq_service = ZmqService(zmq_host, zmq_port)
+        self.zmq_service = ZmqService(zmq_host, zmq_port, topic=topic)
 
     def __del__(self):
         self.zmq_service.cleanup()
 
     def _run_impl(self):
         try:
-            self.zmq_service.connect()
+            self._connect_zmq()
 
             while self._is_running:
                 if self.play_state == PlayStateEnum.PLAYING:
-                    try:
-                        data = self.zmq_service.receive_data()
+                    messages = self.zmq_service.receive_batch()
+                    # 界面只要最新一帧时, 同一批中较旧的点云不再解码, 只按消息头计入统计
+                    if messages and self.mailbox.policy == DeliveryPolicy.LATEST_ONLY:
+                        for data in messages[:-1]:
+                            self.stream_stats.add(LidarData.get_lidar_stamp(data), decoded=False)
+                        messages = messages[-1:]
+                    for data in messages:
                         points, colors, st = LidarData.get_lidar_points_np(data)
-                        self.data_ready.emit(points, colors, st)
+                        self.stream_stats.add(st)
+                        self.publish(points, colors, st)
                         self.check_point_cloud_anomaly(points, time.time())
-                    except zmq.Again:
-                        time.sleep(0.001)
                 elif self.play_state == PlayStateEnum.PAUSED:
-                    time.sleep(0.05)
+                    self.wait_state_change(PlayStateEnum.PAUSED)
                 else:
                     break
-            self.logger.info('结束ZMQ数据接收')
+            self.logger.info(f'结束ZMQ数据接收, 网络数据统计: {self.get_stream_stats()}')
         except zmq.ZMQError as e:
             self.logger.error(f'ZMQ连接错误: {e}')
         finally:
@@ -198,33 +667,37 @@ class ZmqPlyPubTask(BasePlyPubTask):
             self.zmq_service.cleanup()
 
 class ZmqImgPubTask(BaseImgPubTask):
-    def __init__(self, zmq_host: str, zmq_port: str):
+    def __init__(self, zmq_host: str, zmq_port: str, topic: str = None):
         super().__init__()
         self.logger = LoggerManager.get_logger(self.__class__.__name__)
-        self.zmq_service = ZmqService(zmq_host, zmq_port)
+        self.zmq_service = ZmqService(zmq_host, zmq_port, topic=topic)
 
     def __del__(self):
         self.zmq_service.cleanup()
 
     def _run_impl(self):
         try:
-            self.zmq_service.connect()
+            self._connect_zmq()
 
             while self._is_running:
                 if self.play_state == PlayStateEnum.PLAYING:
-                    try:
-                        data = self.zmq_service.receive_data()
-                        # 打印数据长度
-                        self.logger.info(f'接收到的数据长度: {len(data)}')
-                        left_img, right_img, st = SensorImgData.get_sensor_img_data(data)
-                        self.data_ready.emit(right_img, 1, st)
-                    except zmq.Again:
-                        time.sleep(0.001)
+                    messages = self.zmq_service.receive_batch()
+                    # 界面只要最新一帧时, 同一批中较旧的图像不再解码, 只按消息头计入统计
+                    if messages and self.mailbox.policy == DeliveryPolicy.LATEST_ONLY:
+                        for data in messages[:-1]:
+                            self.stream_stats.add(SensorImgData.get_img_timestamp(data),
+                                                  SensorImgData.get_img_frame_id(data), decoded=False)
+                        messages = messages[-1:]
+                    for data in messages:
+                        # 只显示右目图像, 左目不做转换
+                        _, right_img, st = SensorImgData.get_sensor_img_data(data, cameras=(RIGHT_CAMERA,))
+                        self.stream_stats.add(st, SensorImgData.get_img_frame_id(data))
+                        self.publish(right_img, RIGHT_CAMERA, st)
                 elif self.play_state == PlayStateEnum.PAUSED:
-                    time.sleep(0.05)
+                    self.wait_state_change(PlayStateEnum.PAUSED)
                 else:
                     break
-            self.logger.info('结束ZMQ数据接收')
+            self.logger.info(f'结束ZMQ数据接收, 网络数据统计: {self.get_stream_stats()}')
         except zmq.ZMQError as e:
             self.logger.error(f'ZMQ连接错误: {e}')
         finally:
@@ -236,77 +709,110 @@ class LocalImgPubTask(BaseImgPubTask):
         super().__init__()
         self.logger = LoggerManager.get_logger(self.__class__.__name__)
         self.filename = filename
-        self.last_timestamp = 0.0
-        self.speed = speed
+        self.set_speed(speed)
+        self.drop_late_frames = True
+        # 双目图像帧较大, 预解码深度小一些
+        self.set_prefetch(4, 2)
+
+    def _run_impl(self):
+        try:
+            self.cursor = self._open_record_cursor(IMG_TOPIC)
+            try:
+                self._process_record_frames()
+            finally:
+                self.cursor.close()
+        except Exception as e:
+            self.logger.error(f'图像数据处理错误: {e}')
+
+class ShmImgPubTask(BaseImgPubTask):
+    def __init__(self, shm_name: str, poll_interval: float = 0.002):
+        super().__init__()
+        self.logger = LoggerManager.get_logger(self.__class__.__name__)
+        self.shm_name = shm_name
+        self.poll_interval = poll_interval
+
+    def _run_impl(self):
+        try:
+            shm_reader = ShmFrameReader(self.shm_name)
+        except FileNotFoundError:
+            self.logger.error(f'共享内存不存在: {self.shm_name}')
+            return
+        self.logger.info(f'已连接共享内存: {self.shm_name}, 数据长度 {shm_reader.payload_size}')
+        try:
+            while self._is_running:
+                if self.play_state == PlayStateEnum.PLAYING:
+                    # 直接在共享内存上解码, 没有新帧时短暂等待, 期间响应暂停和停止
+                    frame = shm_reader.read(self._decode_record)
+                    if frame is None:
+                        self.wait_state_change(PlayStateEnum.PLAYING, self.poll_interval)
+                        continue
+                    self.publish(*frame)
+                elif self.play_state == PlayStateEnum.PAUSED:
+                    self.wait_state_change(PlayStateEnum.PAUSED)
+                else:
+                    break
+        finally:
+            self.logger.info(f'断开共享内存: {self.shm_name}, 读到被改写的帧 {shm_reader.torn_count} 次')
+            shm_reader.close()
 
 class LocalImuPubTask(BasePubTask):
     def __init__(self, filename):
         super().__init__()
         self.logger = LoggerManager.get_logger(self.__class__.__name__)
         self.filename = filename
-        self.last_timestamp = 0.0
+        # 单个样本解码很快, 不缓存, 在播放线程中直接解码
+        self.frame_cache = FrameCache(0)
+        self.set_prefetch(64, 0)
 
     def _run_impl(self):
         try:
-            with open(self.filename, 'rb') as f:
-                while self._is_running:
-                    if self.play_state == PlayStateEnum.PLAYING:
-
-                        timestamp, data_size, data = RecordHeader.read_record_head_a_data(f, 'dds_imu')
-                        if not data:
-                            self.logger.info('文件读取完成')
-                        ax, ay, az, gx, gy, gz, stamp = ImuData.get_imu_data(data)
-                        acc = [ax, ay, az]
-                        gyro = [gx, gy, gz]
-
-                        # 帧率控制
-
-                        # if self.last_timestamp > 0:
-                        #     sleep_time = (stamp - self.last_timestamp) / self.speed
-                        #     if sleep_time > 0:
-                        #         time.sleep(sleep_time)
-                        # self.last_timestamp = stamp
-
-                        sleep_time = min(self.last_timestamp, timestamp - self.last_timestamp)
-                        time.sleep(sleep_time / self.speed)
-                        self.last_timestamp = timestamp
-
-                        self.data_ready.emit(acc, gyro, stamp)
-                    elif self.play_state == PlayStateEnum.PAUSED:
-                        time.sleep(0.05)
-                    else:
-                        break
+            self.cursor = self._open_record_cursor(IMU_TOPIC)
+            try:
+                self._process_record_frames()
+            finally:
+                self.cursor.close()
         except Exception as e:
             self.logger.error(f'IMU数据处理错误: {e}')
         finally:
             self.task_finished.emit()
 
+    def _decode_record(self, data):
+        ax, ay, az, gx, gy, gz, stamp = ImuData.get_imu_data(data)
+        acc = [ax, ay, az]
+        gyro = [gx, gy, gz]
+        return acc, gyro, stamp
+
 class ZmqImuPubTask(BasePubTask):
-    def __init__(self, zmq_host: str, zmq_port: str):
+    def __init__(self, zmq_host: str, zmq_port: str, topic: str = None):
         super().__init__()
         self.logger = LoggerManager.get_logger(self.__class__.__name__)
-        self.zmq_service = ZmqService(zmq_host, zmq_port)
+        self.zmq_service = ZmqService(zmq_host, zmq_port, topic=topic)
+
+    def __del__(self):
+        self.zmq_service.cleanup()
 
     def _run_impl(self):
         try:
-            self.zmq_service.connect()
+            self._connect_zmq()
             while self._is_running:
                 if self.play_state == PlayStateEnum.PLAYING:
-                    try:
-                        data = self.zmq_service.receive_data()
-
+                    for data in self.zmq_service.receive_batch():
                         ax, ay, az, gx, gy, gz, stamp = ImuData.get_imu_data(data)
+                        self.stream_stats.add(stamp, ImuData.get_imu_id(data))
                         acc = [ax, ay, az]
                         gyro = [gx, gy, gz]
-                        self.data_ready.emit(acc, gyro, stamp)
-                    except zmq.Again:
-                        time.sleep(0.001)
+                        self.publish(acc, gyro, stamp)
                 elif self.play_state == PlayStateEnum.PAUSED:
-                    time.sleep(0.05)
+                    self.wait_state_change(PlayStateEnum.PAUSED)
                 else:
                     break
+            self.logger.info(f'结束ZMQ数据接收, 网络数据统计: {self.get_stream_stats()}')
+        except zmq.ZMQError as e:
+            self.logger.error(f'ZMQ连接错误: {e}')
         except Exception as e:
             self.logger.error(f'IMU数据处理错误: {e}')
         finally:
-            self.task_finished.emit()
+            # 最后一个视图断开时共享连接随之关闭, 录制也一起解除
+            self.logger.info('正在清理ZMQ连接...')
+            self.zmq_service.cleanup()
 
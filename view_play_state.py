@@ -5,6 +5,7 @@ class PlayStateEnum(Enum):
     PLAYING = 1
     PAUSED = 2
     TERMINATE = 3
+    REVERSE = 4
 
 class PlayState():
     state_enum = None
@@ -14,6 +15,9 @@ class PlayState():
     def end_action(self, state_machine):
         raise NotImplementedError
 
+    def reverse_control(self, state_machine):
+        state_machine.set_state(ReversePlayingState())
+
 class PlayingState(PlayState):
     state_enum = PlayStateEnum.PLAYING
     def play_control(self, state_machine):
@@ -39,6 +43,17 @@ class TerminateState(PlayState):
     def end_action(self, state_machine):
         state_machine.set_state(PausedState())
 
+class ReversePlayingState(PlayState):
+    state_enum = PlayStateEnum.REVERSE
+    def play_control(self, state_machine):
+        state_machine.set_state(PausedState())
+
+    def end_action(self, state_machine):
+        state_machine.set_state(TerminateState())
+
+    def reverse_control(self, state_machine):
+        state_machine.set_state(PlayingState())
+
 class PlayStateMachine:
     def __init__(self):
         self.state = PausedState()
@@ -51,3 +66,6 @@ class PlayStateMachine:
 
     def end_action(self):
         self.state.end_action(self)
+
+    def reverse_control(self):
+        self.state.reverse_control(self)
@@ -3,36 +3,58 @@ import os
 import numpy as np
 import open3d as o3d
 from PySide6.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QGridLayout, 
-                             QWidget, QPushButton, QFileDialog, QMenu, QLabel, QSizePolicy)
+                             QWidget, QPushButton, QFileDialog, QMenu, QLabel, QSizePolicy, QSlider, QCheckBox,
+                             QInputDialog)
 from PySide6.QtCore import QThread, Signal, QTimer, QPoint, Slot
 from pyqtgraph.Qt import QtCore
 import pyqtgraph.opengl as gl
 from record_convert import RecordHeader, LidarData
 from queue import Queue
-from view_play_state import PlayingState, PausedState, TerminateState, PlayStateEnum
+from view_play_state import PlayingState, PausedState, TerminateState, ReversePlayingState, PlayStateEnum
 from UiModule.network_dialog import NetworkDialog
 from sensor_view import SensorViewManager
+from render_scheduler import RenderScheduler
 from logger_manager import LoggerManager
 
 class WindowView(QWidget):
+    # 跟随主时钟时, 本视图的倍速菜单请求主窗口统一调速
+    speed_requested = Signal(float, str)
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.view_manager = SensorViewManager()
+        self.master_clock = None
         self.central_widget = QWidget()
         self.central_widget.setContentsMargins(0, 0, 0, 0)
         self.central_layout = QVBoxLayout(self.central_widget)
         self.central_layout.setContentsMargins(0, 0, 0, 0)
         self.view_layout = QVBoxLayout()
         toolbar_layout = QHBoxLayout()
+        timeline_layout = QHBoxLayout()
 
         self.central_layout.addLayout(toolbar_layout)
+        self.central_layout.addLayout(timeline_layout)
         self.central_layout.addLayout(self.view_layout)
 
+        self.init_render_scheduler()
         self.init_toolbar(toolbar_layout)
+        self.init_timeline(timeline_layout)
         self.init_3d_view(self.view_layout)
 
         self.view_manager.set_teriminate_cb(self.view_terminte)
 
+    # 初始化绘制调度, 所有视图按统一的最大帧率刷新
+    def init_render_scheduler(self):
+        self.render_scheduler = RenderScheduler(max_fps=30)
+        for view in self.view_manager.get_views():
+            self.render_scheduler.register(view)
+        self.render_scheduler.start()
+
+        # 每秒刷新一次当前视图的绘制统计
+        self.render_stats_timer = QTimer()
+        self.render_stats_timer.timeout.connect(self.update_render_stats)
+        self.render_stats_timer.start(1000)
+
     def get_widget(self):
         return self.central_widget
 
@@ -43,6 +65,7 @@ class WindowView(QWidget):
         self.init_network_control(toolbar_layout)
         self.init_play_control(toolbar_layout)
         self.init_speed_control(toolbar_layout)
+        self.init_render_control(toolbar_layout)
 
     # 添加视图类型按钮
     def init_view_type_button(self, toolbar_layout):
@@ -61,12 +84,18 @@ class WindowView(QWidget):
         toolbar_layout.addWidget(self.load_button)
         self.load_button.clicked.connect(self.open_local_file)
 
+        # 勾选后本地文件在独立进程中读取和解码, 对之后打开的文件生效
+        self.process_checkbox = QCheckBox("独立进程")
+        toolbar_layout.addWidget(self.process_checkbox)
+        self.process_checkbox.toggled.connect(self.set_process_mode)
+
     # 初始化播放控制
     def init_play_control(self, toolbar_layout):
         self.state_text_mapping = {
             PlayingState: {"state": PlayStateEnum.PLAYING, "button": "暂停"},
             PausedState: {"state": PlayStateEnum.PAUSED, "button": "播放"},
-            TerminateState: {"state": PlayStateEnum.TERMINATE, "button": "播放"}
+            TerminateState: {"state": PlayStateEnum.TERMINATE, "button": "播放"},
+            ReversePlayingState: {"state": PlayStateEnum.REVERSE, "button": "暂停"}
         }
         self.init_play_button(toolbar_layout, self.view_manager.get_current_view().get_current_state())
         self.init_terminte_button(toolbar_layout)
@@ -95,7 +124,46 @@ class WindowView(QWidget):
         for label, factor in speed_options:
             action = self.speed_menu.addAction(label)
             action.setData(factor)
-            action.triggered.connect(lambda checked, l=label, s=factor: self.set_speed(s, l))
+            action.triggered.connect(lambda checked, l=label, s=factor: self.request_speed(s, l))
+
+    # 添加最大刷新帧率控制和绘制统计
+    def init_render_control(self, toolbar_layout):
+        self.fps_button = QPushButton(f"{self.render_scheduler.get_max_fps()} FPS")
+        toolbar_layout.addWidget(self.fps_button)
+        self.fps_button.clicked.connect(self.show_fps_menu)
+        self.fps_menu = QMenu(self)
+        for fps in [15, 30, 60]:
+            action = self.fps_menu.addAction(f"{fps} FPS")
+            action.triggered.connect(lambda checked, f=fps: self.set_max_fps(f))
+        self.render_stats_label = QLabel()
+        toolbar_layout.addWidget(self.render_stats_label)
+
+    # 初始化时间轴: 拖动跳转, 单步和倒放, 只对本地文件有效
+    def init_timeline(self, timeline_layout):
+        self.step_back_button = QPushButton("<")
+        timeline_layout.addWidget(self.step_back_button)
+        self.step_back_button.clicked.connect(lambda: self.step_frame(-1))
+
+        self.reverse_button = QPushButton("倒放")
+        timeline_layout.addWidget(self.reverse_button)
+        self.reverse_button.clicked.connect(self.view_reverse)
+
+        self.step_forward_button = QPushButton(">")
+        timeline_layout.addWidget(self.step_forward_button)
+        self.step_forward_button.clicked.connect(lambda: self.step_frame(1))
+
+        self.timeline_slider = QSlider(QtCore.Qt.Horizontal)
+        self.timeline_slider.setRange(0, 0)
+        timeline_layout.addWidget(self.timeline_slider)
+        self.timeline_slider.valueChanged.connect(self.seek_frame)
+
+        self.timeline_label = QLabel("0/0")
+        timeline_layout.addWidget(self.timeline_label)
+
+        # 按播放位置刷新时间轴, 拖动时不更新
+        self.timeline_timer = QTimer()
+        self.timeline_timer.timeout.connect(self.update_timeline)
+        self.timeline_timer.start(100)
 
     # 添加网络连接, 有ip地址和端口号
     def init_network_control(self, toolbar_layout):
@@ -103,6 +171,10 @@ class WindowView(QWidget):
         toolbar_layout.addWidget(self.network_button)
         self.network_button.clicked.connect(self.show_network_dialog)
 
+        self.shm_button = QPushButton("共享内存")
+        toolbar_layout.addWidget(self.shm_button)
+        self.shm_button.clicked.connect(self.show_shm_dialog)
+
     # 打开本地文件
     def open_local_file(self):
         data_directory = os.path.join(os.getcwd(), "data")
@@ -119,6 +191,10 @@ class WindowView(QWidget):
             state_text = self.state_text_mapping[type(new_state)]["button"]
             self.play_button.setText(state_text)
 
+    def set_process_mode(self, enabled):
+        for view in self.view_manager.get_views():
+            view.set_process_mode(enabled and view.process_task_name is not None)
+
     def set_view_type(self, view_type):
         self.view_manager.get_current_view().get_view().hide()
         self.view_layout.removeWidget(self.view_manager.get_current_view().get_view())
@@ -143,8 +219,20 @@ class WindowView(QWidget):
         dialog.connect_requested.connect(self.connect_to_server)
         dialog.exec()
 
-    def connect_to_server(self, ip_address, port):
-        self.view_manager.get_current_view().start_connect_network(ip_address, port)
+    def connect_to_server(self, ip_address, port, use_topic_frame=False):
+        self.view_manager.get_current_view().start_connect_network(ip_address, port, use_topic_frame)
+        new_state = self.view_manager.get_current_view().get_current_state()
+        state_text = self.state_text_mapping[type(new_state)]["button"]
+        self.play_button.setText(state_text)
+
+    # 输入本机共享内存数据源的名称
+    def show_shm_dialog(self):
+        shm_name, ok = QInputDialog.getText(self, "共享内存", "共享内存名称:", text="sensor_img")
+        if ok and shm_name:
+            self.connect_to_shm(shm_name)
+
+    def connect_to_shm(self, shm_name):
+        self.view_manager.get_current_view().start_connect_shm(shm_name)
         new_state = self.view_manager.get_current_view().get_current_state()
         state_text = self.state_text_mapping[type(new_state)]["button"]
         self.play_button.setText(state_text)
@@ -165,7 +253,7 @@ class WindowView(QWidget):
         current_state = self.view_manager.get_current_view().get_current_state().state_enum
         success = False
 
-        if current_state == PlayStateEnum.PLAYING:
+        if current_state in (PlayStateEnum.PLAYING, PlayStateEnum.REVERSE):
             success = self.view_manager.get_current_view().pause()
         elif current_state == PlayStateEnum.PAUSED:
             success = self.view_manager.get_current_view().playing()
@@ -177,10 +265,89 @@ class WindowView(QWidget):
             state_text = self.state_text_mapping[type(new_state)]["button"]
             self.play_button.setText(state_text)
 
+    def view_reverse(self):
+        if self.view_manager.get_current_view().reverse():
+            new_state = self.view_manager.get_current_view().get_current_state()
+            state_text = self.state_text_mapping[type(new_state)]["button"]
+            self.play_button.setText(state_text)
+
+    def seek_frame(self, frame_no):
+        self.view_manager.get_current_view().seek_frame(frame_no)
+
+    def step_frame(self, delta):
+        self.view_manager.get_current_view().step_frame(delta)
+
+    def update_timeline(self):
+        if self.timeline_slider.isSliderDown():
+            return
+        position = self.view_manager.get_current_view().get_position()
+        frame_no, frame_count = position if position else (0, 0)
+        frame_no = max(0, frame_no)
+        # 程序更新滑块位置时不触发跳转
+        self.timeline_slider.blockSignals(True)
+        self.timeline_slider.setRange(0, max(0, frame_count - 1))
+        self.timeline_slider.setValue(frame_no)
+        self.timeline_slider.blockSignals(False)
+        self.timeline_label.setText(f"{frame_no + 1 if frame_count else 0}/{frame_count}")
+
+    def show_fps_menu(self):
+        self.fps_menu.exec(self.fps_button.mapToGlobal(QPoint(0, self.fps_button.height())))
+
+    def set_max_fps(self, fps):
+        self.fps_button.setText(f"{fps} FPS")
+        self.render_scheduler.set_max_fps(fps)
+
+    def update_render_stats(self):
+        view = self.view_manager.get_current_view()
+        stats = view.get_render_stats()
+        text = f"{stats['fps']} fps / 跳过 {stats['skipped']}"
+        stream_stats = view.get_stream_stats()
+        if stream_stats and stream_stats['received']:
+            text += f" / 延迟 p50 {stream_stats['p50_ms']:.1f}ms p99 {stream_stats['p99_ms']:.1f}ms"
+            # 开启 CONFLATE 时序号跳变包含主动合并的消息, 不显示为丢帧
+            if stream_stats['loss_measured']:
+                text += f" / 丢帧 {stream_stats['loss_rate']:.1%}"
+            else:
+                text += f" / 合并 {stream_stats['conflated']}"
+        self.render_stats_label.setText(text)
+
+    def request_speed(self, factor, text):
+        # 主时钟由所有视图共用, 不能只改本视图的倍速
+        if self.master_clock is not None:
+            self.speed_requested.emit(factor, text)
+        else:
+            self.set_speed(factor, text)
+
     def set_speed(self, factor, text):
         self.speed_button.setText(text)
         self.view_manager.get_current_view().set_speed(factor)
 
+    # 以下由主窗口的统一播放控制调用
+    def set_master_clock(self, master_clock):
+        self.master_clock = master_clock
+        self.view_manager.set_master_clock(master_clock)
+
+    def set_recorder(self, recorder):
+        self.view_manager.set_recorder(recorder)
+
+    def play_view(self):
+        if self.view_manager.get_current_view().get_current_state().state_enum != PlayStateEnum.PLAYING:
+            self.view_control()
+
+    def pause_view(self):
+        if self.view_manager.get_current_view().get_current_state().state_enum == PlayStateEnum.PLAYING:
+            self.view_control()
+
+    # 移除视图时结束所有发布任务, 释放共享的文件和网络连接
+    def release(self):
+        self.timeline_timer.stop()
+        self.render_stats_timer.stop()
+        self.render_scheduler.stop()
+        self.view_manager.terminate_all()
+
     def closeEvent(self, event):
+        self.timeline_timer.stop()
+        self.render_stats_timer.stop()
+        self.render_scheduler.stop()
         self.view_terminte()
         event.accept()
\ No newline at end of file
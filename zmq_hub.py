@@ -0,0 +1,174 @@
+import time
+import threading
+import zmq
+from logger_manager import LoggerManager
+
+class ZmqEndpoint:
+    """
+    一个远端地址对应的共享连接
+
+    XSUB 连接远端, XPUB 绑定到进程内的 inproc 地址, 两者之间由 zmq.proxy 转发.
+    每个订阅者在 inproc 地址上各自建一个 SUB, 进程内转发不拷贝消息,
+    订阅关系经 XPUB/XSUB 自动同步到远端.
+    录制也在连接上进行: 由一个录制线程单独订阅需要录制的 topic, 每条消息在收到时取时间戳写入,
+    同一 topic 无论有几个视图都只写一次, 也不受视图暂停和只保留最新一帧的影响
+    """
+    def __init__(self, context, addr, inproc_addr, rcvhwm, framed):
+        self.context = context
+        self.addr = addr
+        self.inproc_addr = inproc_addr
+        self.framed = framed
+        self.ref_count = 0
+        # 录制: 订阅者 -> (RecordWriter, topic), 录制的 topic 变化时重启录制线程
+        self.record_owners = {}
+        self.record_targets = {}
+        self.record_thread = None
+        self.record_stop = None
+        self.frontend = context.socket(zmq.XSUB)
+        self.frontend.setsockopt(zmq.RCVHWM, rcvhwm)
+        self.frontend.connect(addr)
+        self.backend = context.socket(zmq.XPUB)
+        self.backend.bind(inproc_addr)
+        # 通过控制通道通知转发线程退出
+        control_addr = inproc_addr + '-control'
+        self.control = context.socket(zmq.PAIR)
+        self.control.bind(control_addr)
+        self.control_peer = context.socket(zmq.PAIR)
+        self.control_peer.connect(control_addr)
+        self.thread = threading.Thread(target=self._run, name=f'ZmqEndpoint-{addr}', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            zmq.proxy_steerable(self.frontend, self.backend, None, self.control_peer)
+        except zmq.ContextTerminated:
+            pass
+
+    def set_recorder(self, owner, recorder, topic_name):
+        # recorder 为 None 时取消 owner 的录制; 调用方需持有 ZmqHub._lock
+        if recorder is None:
+            self.record_owners.pop(owner, None)
+        else:
+            self.record_owners[owner] = (recorder, topic_name)
+        targets = {topic_name: recorder for recorder, topic_name in self.record_owners.values()}
+        if targets == self.record_targets:
+            return
+        self._stop_record_thread()
+        self.record_targets = targets
+        if targets:
+            self.record_stop = threading.Event()
+            self.record_thread = threading.Thread(target=self._record, args=(targets, self.record_stop),
+                                                  name=f'ZmqRecord-{self.addr}', daemon=True)
+            self.record_thread.start()
+
+    def _stop_record_thread(self):
+        if self.record_thread is not None:
+            self.record_stop.set()
+            self.record_thread.join()
+            self.record_thread = None
+
+    def _record(self, targets, stop_event):
+        # 分帧时按第一帧的 topic 分别写入; 不分帧时一个地址只有一种数据, 全部写入同一个 topic
+        sock = self.context.socket(zmq.SUB)
+        sock.setsockopt(zmq.RCVHWM, 0)
+        sock.connect(self.inproc_addr)
+        topic_recorders = {topic_name.encode('utf-8'): (topic_name, recorder) for topic_name, recorder in targets.items()}
+        if self.framed:
+            for topic_bytes in topic_recorders:
+                sock.setsockopt(zmq.SUBSCRIBE, topic_bytes)
+        else:
+            sock.setsockopt(zmq.SUBSCRIBE, b'')
+            topic_name, recorder = next(iter(topic_recorders.values()))
+        try:
+            while not stop_event.is_set():
+                if not sock.poll(50):
+                    continue
+                while True:
+                    try:
+                        frames = sock.recv_multipart(flags=zmq.NOBLOCK, copy=False)
+                    except zmq.Again:
+                        break
+                    timestamp = time.time()
+                    if self.framed:
+                        if len(frames) != 2 or frames[0].bytes not in topic_recorders:
+                            continue
+                        topic_name, recorder = topic_recorders[frames[0].bytes]
+                    recorder.write(topic_name, timestamp, frames[-1].buffer)
+        finally:
+            sock.close(linger=0)
+
+    def close(self):
+        self._stop_record_thread()
+        self.control.send(b'TERMINATE')
+        self.thread.join()
+        for sock in (self.frontend, self.backend, self.control, self.control_peer):
+            sock.close(linger=0)
+
+class ZmqHub:
+    """
+    进程内共享的 ZMQ 上下文和连接
+
+    同一个远端地址只建立一条网络连接, 由所有订阅该地址的视图共享, 按引用计数管理,
+    最后一个视图断开时关闭连接. 按 topic 分帧 ([topic, 数据]) 和不分帧的视图消息格式不同,
+    同一地址的两种视图各用一条连接, 互不收到对方格式的消息
+    """
+    _lock = threading.Lock()
+    _endpoints = {}
+    _next_id = 0
+    rcvhwm = 1000
+
+    @staticmethod
+    def context():
+        return zmq.Context.instance()
+
+    @classmethod
+    def acquire(cls, addr, framed=False) -> str:
+        # 返回该地址在进程内的 inproc 转发地址, framed 表示消息按 [topic, 数据] 分帧
+        logger = LoggerManager.get_logger(cls.__name__)
+        key = (addr, framed)
+        with cls._lock:
+            endpoint = cls._endpoints.get(key)
+            if endpoint is None:
+                inproc_addr = f'inproc://zmq-hub-{cls._next_id}'
+                cls._next_id += 1
+                endpoint = ZmqEndpoint(cls.context(), addr, inproc_addr, cls.rcvhwm, framed)
+                cls._endpoints[key] = endpoint
+                logger.info(f'建立共享连接: {addr} -> {inproc_addr}, 分帧: {framed}')
+            endpoint.ref_count += 1
+            return endpoint.inproc_addr
+
+    @classmethod
+    def release(cls, addr, framed=False):
+        logger = LoggerManager.get_logger(cls.__name__)
+        key = (addr, framed)
+        with cls._lock:
+            endpoint = cls._endpoints.get(key)
+            if endpoint is None:
+                return
+            endpoint.ref_count -= 1
+            if endpoint.ref_count > 0:
+                return
+            del cls._endpoints[key]
+            endpoint.close()
+            logger.info(f'关闭共享连接: {addr}, 分帧: {framed}')
+
+    @classmethod
+    def set_recorder(cls, addr, framed, owner, recorder, topic_name=None):
+        # 把 owner 订阅的 topic 录制到 recorder, recorder 为 None 时取消; 多个 owner 录制同一 topic 只写一次
+        with cls._lock:
+            endpoint = cls._endpoints.get((addr, framed))
+            if endpoint is not None:
+                endpoint.set_recorder(owner, recorder, topic_name)
+
+    @classmethod
+    def get_ref_count(cls, addr, framed=False) -> int:
+        with cls._lock:
+            endpoint = cls._endpoints.get((addr, framed))
+            return endpoint.ref_count if endpoint else 0
+
+    @classmethod
+    def get_record_topics(cls, addr, framed=False) -> list:
+        # 该连接上正在录制的 topic
+        with cls._lock:
+            endpoint = cls._endpoints.get((addr, framed))
+            return sorted(endpoint.record_targets) if endpoint else []